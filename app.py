@@ -1,17 +1,26 @@
+import os
 import argparse
-import utils  # This loads vars, do not remove
+import utils
 
-import scrapper
-import preprocessing
-import model
 
+def run_data_pipeline(resume=False):
+    # Imported on use, so each subcommand only loads the dependencies it needs
+    import scrapper
+    import preprocessing
 
-def run_data_pipeline():
-    scrapper.run_scrapper()
+    if os.getenv('PIPELINE_MODE') == 'streaming':
+        # Pages are cleaned and chunked as they are fetched
+        preprocessing.run_streaming_pipeline(resume=resume)
+        return
+
+    # Only pages whose content changed since they were last preprocessed are cleaned and chunked again
+    scrapper.run_scrapper(resume=resume)
     preprocessing.run_cleaner()
 
 
 if __name__ == "__main__":
+    utils.import_settings()  # This loads vars, do not remove
+
     # Set up argument parsing
     parser = argparse.ArgumentParser(description="RAG Chatbot System")
 
@@ -21,6 +30,8 @@ if __name__ == "__main__":
                        help="Rerun the data pipeline (scrapping and preprocessing)")
     group.add_argument("--chatbot", action="store_true",
                        help="Start the RAG chatbot")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted crawl from its checkpoint (with --pipeline)")
 
     # Parse arguments
     args = parser.parse_args()
@@ -28,8 +39,9 @@ if __name__ == "__main__":
     # Execute the selected option
     if args.pipeline:
         print("Running data pipeline...")
-        run_data_pipeline()
+        run_data_pipeline(resume=args.resume)
         print("Data pipeline completed successfully!")
     elif args.chatbot:
         print("Starting RAG chatbot...")
+        import model
         model.run_rag_claude()
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Cold start of the chatbots' retrieval bundle.
+
+Builds a bundle of --chunks synthetic chunks with random vectors, then, in
+a fresh interpreter, times importing embeddings.bundle, opening the bundle
+and answering a first query (a vector search plus reading the retrieved
+chunks). This is everything the chatbots do at startup and on their first
+retrieval, apart from loading the query encoder. With --budget the exit
+status is non-zero when the open takes longer.
+
+Usage:
+    python -m benchmarks.bench_bundle --chunks 50000 --mode float16 --budget 1.0
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+from embeddings.bundle import RetrievalBundle
+from embeddings.quantized import MODES
+from preprocessing.chunkstore import ChunkStore, chunk_record, write_chunk_file
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS = "visa status travel employment authorization students scholars sevis fee office global services".split()
+
+COLD_START = """
+import time, json
+start = time.perf_counter()
+from embeddings.bundle import RetrievalBundle
+imported = time.perf_counter()
+bundle = RetrievalBundle({path!r})
+opened = time.perf_counter()
+distances, rows = bundle.vectors.search(bundle.vectors.full[:1] if bundle.vectors.full is not None
+                                        else [[0.0] * {dim}], k=10, rescore=50)
+texts = [bundle.chunks[int(row)]['text'] for row in rows[0]]
+queried = time.perf_counter()
+print(json.dumps([imported - start, opened - imported, queried - opened]))
+"""
+
+
+def build_bundle(path, chunks, dim, mode, seed=0):
+    rng = np.random.default_rng(seed)
+    chunk_dir = os.path.join(path, 'chunks')
+    os.makedirs(chunk_dir)
+    for page in range(0, chunks, 100):
+        records = [chunk_record(f"page{page}.html", f"https://example.edu/page{page}", i,
+                                " ".join(rng.choice(WORDS, 60)), 60) for i in range(min(100, chunks - page))]
+        write_chunk_file(os.path.join(chunk_dir, f"chunked_page{page}.jsonl"), records)
+    ChunkStore.build(chunk_dir, threshold=1.01)  # Random texts are not worth deduplicating
+
+    def embed(texts):
+        vectors = rng.normal(size=(len(texts), dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return RetrievalBundle.build(os.path.join(path, 'bundle'), os.path.join(chunk_dir, 'chunks.jsonl'), embed,
+                                 model_name="random", mode=mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the retrieval bundle")
+    parser.add_argument("--chunks", type=int, default=20000, help="Number of synthetic chunks")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimensions")
+    parser.add_argument("--mode", choices=MODES, default="float16", help="Vector storage mode")
+    parser.add_argument("--budget", type=float, help="Fail when opening the bundle takes longer (seconds)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle = build_bundle(tmp, args.chunks, args.dim, args.mode)
+        size = sum(bundle.meta['files'].values())
+        bundle.close()
+
+        result = subprocess.run([sys.executable, '-c', COLD_START.format(path=bundle.path, dim=args.dim)],
+                                capture_output=True, text=True, cwd=PROJECT_ROOT)
+        if result.returncode != 0:
+            sys.exit(f"Cold start failed: {result.stderr.strip().splitlines()[-1]}")
+        imported, opened, queried = json.loads(result.stdout.strip().splitlines()[-1])
+
+    print(f"Bundle of {args.chunks} chunks ({args.mode} vectors, {size / 2 ** 20:.1f} MB on disk)")
+    print(f"{'import':<16}{imported * 1000:>10.1f} ms")
+    print(f"{'open':<16}{opened * 1000:>10.1f} ms")
+    print(f"{'first query':<16}{queried * 1000:>10.1f} ms")
+    if args.budget is not None and opened > args.budget:
+        print(f"Opening the bundle took {opened:.2f}s, over the {args.budget:.2f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
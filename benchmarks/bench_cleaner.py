@@ -0,0 +1,75 @@
+"""
+Benchmark of the single-pass StreamingCleaner against the tree-based cleaner.
+
+Cleans a synthetic corpus of OGS-like pages with the streaming cleaner and
+with clean_soup over every installed parser backend's soup, and reports
+pages/sec, the peak memory allocated while cleaning a page (tracemalloc)
+and whether the output matches the html.parser soup cleaner.
+
+Usage:
+    python -m benchmarks.bench_cleaner --pages 200 --repeat 3
+"""
+import time
+import argparse
+import tracemalloc
+
+from benchmarks.corpus import generate_corpus
+from preprocessing.cleaning import clean_html
+from utils.parsers import get_parser, available_backends
+
+
+def cleaners():
+    """Cleaner name -> function of one page"""
+    variants = {'streaming': clean_html}
+    for backend in available_backends():
+        variants[f'soup ({get_parser(backend).soup_features})'] = \
+            lambda page, parser=get_parser(backend): clean_html(page, parser)
+    return variants
+
+
+def peak_allocation(fn, pages):
+    """Mean and max of the peak memory allocated while cleaning each page, in KiB"""
+    peaks = []
+    tracemalloc.start()
+    for page in pages:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn(page)
+        peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    tracemalloc.stop()
+    return sum(peaks) / len(peaks), max(peaks)
+
+
+def run_benchmark(pages=200, repeat=3):
+    corpus = list(generate_corpus(pages).values())
+    reference = [clean_html(page, get_parser('html.parser')) for page in corpus]
+
+    results = {}
+    for name, fn in cleaners().items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs = [fn(page) for page in corpus]
+            best = min(best, time.perf_counter() - start)
+        mean_peak, max_peak = peak_allocation(fn, corpus)
+        results[name] = (len(corpus) / best, mean_peak, max_peak, outputs == reference)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming HTML cleaner")
+    parser.add_argument("--pages", type=int, default=200, help="Number of synthetic pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.pages, args.repeat)
+    baseline = results['streaming'][0]
+
+    print(f"{'cleaner':<20}{'pages/sec':>12}{'vs streaming':>14}{'peak KiB/page':>15}{'max KiB':>10}  equivalent")
+    for name, (rate, mean_peak, max_peak, equivalent) in results.items():
+        print(f"{name:<20}{rate:>12.1f}{rate / baseline:>13.2f}x{mean_peak:>15.1f}{max_peak:>10.1f}  "
+              f"{'yes' if equivalent else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Offline benchmark of the crawler against the local stand-in site.
+
+Crawls a benchmarks.site.SyntheticSite (served from a separate process) with
+NortheasternScraper and reports throughput, wall time, duplicate fetches
+and peak memory, so crawler changes can be measured reproducibly without
+touching the live OGS site. Each mode is crawled in a fresh process, so
+the peak RSS of one mode does not include the other's.
+
+Usage:
+    python -m benchmarks.bench_crawler --pages 500 --latency 0.05 --jitter 0.02 --mode async
+    python -m benchmarks.bench_crawler --error-rate 0.02 --throttle-rate 0.01 --duplicate-links
+"""
+import io
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.site import SiteConfig, SyntheticSite
+from scrapper.ogs_html import NortheasternScraper
+from scrapper.ratelimit import HostRateLimiter
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, and the peak of the whole process
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def crawl(url, data_dir, mode='async', workers=30, rate=50.0, max_rate=1000.0, discovery='links'):
+    """Crawl url into data_dir; returns the scraper and the wall time"""
+    limiter = HostRateLimiter(rate=rate, max_rate=max_rate, max_concurrency=workers)
+    scraper = NortheasternScraper(url, data_dir, rate_limiter=limiter, discovery=discovery)
+    start = time.perf_counter()
+    try:
+        # The crawler logs every URL; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            if mode == 'async':
+                asyncio.run(scraper.scrape_site_async(max_workers=workers))
+            else:
+                scraper.scrape_site(max_workers=workers)
+    finally:
+        scraper.close()
+    return scraper, time.perf_counter() - start
+
+
+def run_benchmark(config, mode='async', workers=30, rate=50.0, max_rate=1000.0, discovery='links'):
+    with SyntheticSite(config, in_process=False) as site, tempfile.TemporaryDirectory() as data_dir:
+        scraper, wall_time = crawl(site.url, data_dir, mode, workers, rate, max_rate, discovery)
+        stats = site.stats()
+        saved = len(scraper.manifest.entries)
+
+    return {
+        'mode': mode,
+        'pages_saved': saved,
+        'page_requests': stats['page_requests'],
+        'duplicate_fetches': stats['duplicate_fetches'],
+        'statuses': stats['statuses'],
+        'wall_time': wall_time,
+        'pages_per_sec': saved / wall_time,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crawler against a local synthetic site")
+    parser.add_argument("--pages", type=int, default=300, help="Number of pages on the site")
+    parser.add_argument("--fan-out", type=int, default=8, help="Links per page")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response latency (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Uniform latency jitter (seconds)")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Share of slow responses")
+    parser.add_argument("--tail-latency", type=float, default=1.0, help="Latency of slow responses (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After sent with 429 responses")
+    parser.add_argument("--duplicate-links", action="store_true", help="Link to URL variants of pages")
+    parser.add_argument("--mode", choices=["async", "threaded", "both"], default="both", help="Crawl mode")
+    parser.add_argument("--workers", type=int, default=30, help="Concurrent fetches")
+    parser.add_argument("--rate", type=float, default=50.0, help="Initial requests/sec of the rate limiter")
+    parser.add_argument("--max-rate", type=float, default=1000.0, help="Rate limiter ceiling (requests/sec)")
+    parser.add_argument("--discovery", default="links", help="Discovery mode (links, sitemap, sitemap+links)")
+    args = parser.parse_args()
+
+    config = SiteConfig(pages=args.pages, fan_out=args.fan_out, latency=args.latency, jitter=args.jitter,
+                        tail_rate=args.tail_rate, tail_latency=args.tail_latency, error_rate=args.error_rate,
+                        throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+                        duplicate_links=args.duplicate_links, sitemap=args.discovery != 'links')
+    modes = ["async", "threaded"] if args.mode == "both" else [args.mode]
+
+    print(f"{'mode':<10}{'saved':>7}{'requests':>10}{'dup fetches':>13}{'wall (s)':>10}"
+          f"{'pages/sec':>11}{'peak RSS (MB)':>15}  statuses")
+    for mode in modes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            result = executor.submit(run_benchmark, config, mode, args.workers, args.rate, args.max_rate,
+                                     args.discovery).result()
+        print(f"{result['mode']:<10}{result['pages_saved']:>7}{result['page_requests']:>10}"
+              f"{result['duplicate_fetches']:>13}{result['wall_time']:>10.2f}{result['pages_per_sec']:>11.1f}"
+              f"{result['peak_rss_mb']:>15.1f}  {result['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Throughput and parity of the embedding backends.
+
+Embeds a set of chunks with the PyTorch encoder on CPU (the reference),
+PyTorch on the auto-selected device, and ONNX Runtime in float32 and int8,
+and reports chunks/sec, the speedup over the reference and the min/mean
+cosine similarity to the reference vectors. A backend passes the parity
+check when its lowest cosine stays above --tolerance; the exit status is
+non-zero if one fails. Backends whose packages are missing are skipped.
+
+Chunks come from a chunk store (--chunks data/chunked/chunks.jsonl) or
+are generated from the synthetic corpus.
+
+With --workers, CPU throughput is also measured with that many embedding
+worker processes (see embeddings.parallel), against one process using
+every core.
+
+Usage:
+    python -m benchmarks.bench_embeddings --models BAAI/bge-small-en --chunks-count 512
+    python -m benchmarks.bench_embeddings --models BAAI/bge-small-en --workers 2 4 8 16
+"""
+import sys
+import time
+import argparse
+from functools import partial
+
+from benchmarks.corpus import generate_corpus
+from preprocessing.cleaning import clean_html
+from preprocessing.chunking import chunk_cleaned_html
+from preprocessing.chunkstore import ChunkStore
+from embeddings.backends import (TorchEncoder, OnnxEncoder, available_backends, select_device, cosine_parity,
+                                 get_encoder, PARITY_TOLERANCE)
+from embeddings.parallel import ParallelEncoder
+
+MODELS = ['BAAI/bge-small-en', 'sentence-transformers/all-MiniLM-L6-v2']
+
+
+def load_chunks(path=None, count=512):
+    if path:
+        with ChunkStore(path) as store:
+            return store.texts()[:count]
+
+    texts = []
+    for page in generate_corpus(max(count // 2, 1)).values():
+        texts += [chunk['text'] for chunk in chunk_cleaned_html(clean_html(page))]
+    return texts[:count]
+
+
+def encoders(model_name):
+    """Backend label -> factory, for the installed backends"""
+    backends = available_backends(model_name)
+    variants = {}
+    if 'torch' in backends:
+        variants['torch (cpu)'] = lambda: TorchEncoder(model_name, device='cpu')
+        device = select_device()
+        if device != 'cpu':
+            variants[f'torch ({device})'] = lambda: TorchEncoder(model_name, device=device)
+    if 'onnx' in backends:
+        variants['onnx fp32'] = lambda: OnnxEncoder(model_name)
+        variants['onnx int8'] = lambda: OnnxEncoder(model_name, quantize=True)
+    return variants
+
+
+def throughput(encoder, texts, repeat):
+    encoder.encode(texts[:encoder.batch_size])  # Warm up
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        vectors = encoder.encode(texts)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best, vectors
+
+
+def scaling(model_name, texts, workers, repeat):
+    """Print CPU chunks/sec and speedup with each worker count, against a single process"""
+    print(f"{'workers':<16}{'chunks/sec':>12}{'speedup':>10}")
+    single_rate, _ = throughput(get_encoder(model_name, device='cpu'), texts, repeat)
+    print(f"{1:<16}{single_rate:>12.1f}{1:>9.2f}x")
+    for count in workers:
+        with ParallelEncoder(partial(get_encoder, model_name, device='cpu'), count) as encoder:
+            rate, _ = throughput(encoder, texts, repeat)
+        print(f"{count:<16}{rate:>12.1f}{rate / single_rate:>9.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the embedding backends")
+    parser.add_argument("--models", nargs='+', default=MODELS, help="Embedding models to measure")
+    parser.add_argument("--chunks", help="Chunk store to read chunks from (default: synthetic chunks)")
+    parser.add_argument("--chunks-count", type=int, default=512, help="Number of chunks to embed")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per backend (best is kept)")
+    parser.add_argument("--tolerance", type=float, default=PARITY_TOLERANCE,
+                        help="Lowest cosine similarity to the PyTorch CPU vectors a backend may have")
+    parser.add_argument("--workers", type=int, nargs='*', default=[],
+                        help="Embedding worker process counts to measure CPU scaling with")
+    args = parser.parse_args()
+
+    texts = load_chunks(args.chunks, args.chunks_count)
+    print(f"Embedding {len(texts)} chunks")
+
+    failed = False
+    for model_name in args.models:
+        variants = encoders(model_name)
+        if 'torch (cpu)' not in variants:
+            print(f"{model_name}: the PyTorch reference backend is not installed")
+            failed = True
+            continue
+
+        print(f"\n{model_name}")
+        print(f"{'backend':<16}{'chunks/sec':>12}{'speedup':>10}{'min cos':>10}{'mean cos':>10}  parity")
+        reference_rate = reference = None
+        for label, factory in variants.items():
+            rate, vectors = throughput(factory(), texts, args.repeat)
+            if reference is None:
+                reference_rate, reference = rate, vectors
+            min_cos, mean_cos = cosine_parity(reference, vectors)
+            ok = min_cos >= args.tolerance
+            failed |= not ok
+            print(f"{label:<16}{rate:>12.1f}{rate / reference_rate:>9.2f}x{min_cos:>10.4f}{mean_cos:>10.4f}  "
+                  f"{'ok' if ok else 'FAIL'}")
+
+        if args.workers:
+            print()
+            scaling(model_name, texts, args.workers, args.repeat)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
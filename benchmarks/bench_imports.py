@@ -0,0 +1,83 @@
+"""
+Import-time report of the app's startup paths, summarized per subsystem.
+
+Runs each startup in a fresh interpreter under `python -X importtime` and
+adds up the self time of every imported module by its top-level package
+(llama_index, nltk, numpy, the project's own packages, ...), so a new
+heavy import on the pipeline path shows up as its own line. With --budget
+the exit status is non-zero when a startup takes longer.
+
+Usage:
+    python -m benchmarks.bench_imports --startup pipeline --budget 1.0
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+
+# What app.py imports for each subcommand before doing any work
+STARTUPS = {
+    'pipeline': 'import app, scrapper, preprocessing',
+    'chatbot': 'import app, model',
+}
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(statement):
+    """(wall seconds, {top-level package: (self seconds, modules)}) of running statement in a fresh interpreter"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            capture_output=True, text=True, cwd=PROJECT_ROOT)
+    wall_time = time.perf_counter() - start
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError(f"'{statement}' failed: {errors[-1] if errors else result.returncode}")
+
+    subsystems = defaultdict(lambda: [0.0, 0])
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        subsystem = subsystems[name.strip().split('.')[0]]
+        subsystem[0] += int(self_us) / 1e6
+        subsystem[1] += 1
+    return wall_time, {name: tuple(totals) for name, totals in subsystems.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report of the app's startup paths")
+    parser.add_argument("--startup", choices=sorted(STARTUPS) + ['all'], default='all',
+                        help="Startup path to measure")
+    parser.add_argument("--top", type=int, default=15, help="Subsystems to list per startup")
+    parser.add_argument("--budget", type=float, help="Fail if a startup takes longer, in seconds")
+    args = parser.parse_args()
+
+    over_budget = False
+    for name in sorted(STARTUPS) if args.startup == 'all' else [args.startup]:
+        try:
+            wall_time, subsystems = import_times(STARTUPS[name])
+        except RuntimeError as e:
+            print(f"{name}: {e}\n")
+            continue
+
+        imports = sum(seconds for seconds, _ in subsystems.values())
+        print(f"{name}: {wall_time:.2f}s wall, {imports:.2f}s importing "
+              f"{sum(count for _, count in subsystems.values())} modules ({STARTUPS[name]})")
+        print(f"  {'subsystem':<24}{'seconds':>10}{'share':>8}{'modules':>9}")
+        ranked = sorted(subsystems.items(), key=lambda item: item[1][0], reverse=True)
+        for subsystem, (seconds, count) in ranked[:args.top]:
+            print(f"  {subsystem:<24}{seconds:>10.3f}{seconds / imports:>8.0%}{count:>9}")
+        print()
+
+        if args.budget is not None and wall_time > args.budget:
+            print(f"{name} startup exceeds the {args.budget:.2f}s budget\n")
+            over_budget = True
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark of the HTML parser backends in utils.parsers.
+
+Runs the three parsing steps of the data pipeline over a synthetic corpus of
+OGS-like pages with every installed backend, reports pages/sec for each and
+checks that every backend produces the same output as html.parser.
+
+Usage:
+    python -m benchmarks.bench_parsers --pages 200 --repeat 3
+"""
+import time
+import argparse
+
+from benchmarks.corpus import generate_corpus
+from utils.parsers import get_parser, available_backends
+from scrapper.ogs_html import NortheasternScraper
+from preprocessing.cleaning import clean_html
+
+BASE_URL = "https://international.northeastern.edu/ogs/"
+
+
+def build_inputs(pages):
+    """Raw and cleaned HTML for every page, as each pipeline step sees it"""
+    raw = list(generate_corpus(pages).values())
+    cleaned = [clean_html(page, get_parser('html.parser')) for page in raw]
+    return raw, cleaned
+
+
+def steps(parser, raw, cleaned):
+    """Pipeline step name -> (function, inputs)"""
+    scraper = NortheasternScraper(BASE_URL, '/tmp', parser=parser)
+    return {
+        'extract_links': (lambda page: scraper.extract_links(BASE_URL, page), raw),
+        'clean_html': (lambda page: clean_html(page, parser), raw),
+        'text': (parser.text, cleaned),
+    }
+
+
+def run_benchmark(pages=200, repeat=3):
+    raw, cleaned = build_inputs(pages)
+    baseline = {name: [fn(page) for page in inputs]
+                for name, (fn, inputs) in steps(get_parser('html.parser'), raw, cleaned).items()}
+
+    results = []
+    for backend in available_backends():
+        for name, (fn, inputs) in steps(get_parser(backend), raw, cleaned).items():
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                outputs = [fn(page) for page in inputs]
+                best = min(best, time.perf_counter() - start)
+            results.append((name, backend, len(inputs) / best, outputs == baseline[name]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML parser backends")
+    parser.add_argument("--pages", type=int, default=200, help="Number of synthetic pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.pages, args.repeat)
+    baseline = {name: rate for name, backend, rate, _ in results if backend == 'html.parser'}
+
+    print(f"{'step':<24}{'backend':<14}{'pages/sec':>12}{'speedup':>10}  equivalent")
+    for name, backend, rate, equivalent in sorted(results):
+        print(f"{name:<24}{backend:<14}{rate:>12.1f}{rate / baseline[name]:>9.1f}x  {'yes' if equivalent else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Recall and memory of the quantized vector store modes.
+
+Holds out --queries vectors of the corpus as queries, stores the others in
+each mode of embeddings.quantized (float32, float16, int8 and PQ, each also
+with exact re-scoring of the top --rescore candidates), and reports the
+bytes per vector searches read, the store size, recall@k against exact
+float32 search and the search latency.
+
+Vectors are the corpus embeddings from the embedding cache (--model, read
+from --cache-dir), a .npy file (--vectors), or synthetic clustered unit
+vectors when neither is given.
+
+Usage:
+    python -m benchmarks.bench_vectors --model BAAI/bge-small-en --cache-dir data/embedding_cache/ -k 10
+"""
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from embeddings.cache import EmbeddingCache
+from embeddings.quantized import QuantizedVectors, MODES
+
+
+def load_vectors(model=None, cache_dir=None, path=None, count=20000, dim=384, seed=0):
+    if path:
+        return np.load(path).astype(np.float32)
+    if model:
+        with EmbeddingCache(cache_dir, model) as cache:
+            return np.array(cache.matrix)
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(count // 50 + 1, dim))
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.normal(size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall(rows, truth):
+    return float(np.mean([len(set(found) & set(expected)) / len(expected) for found, expected in zip(rows, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall and memory of the vector store modes")
+    parser.add_argument("--model", help="Embedding model whose cached vectors to use")
+    parser.add_argument("--cache-dir", default="data/embedding_cache/", help="Embedding cache directory")
+    parser.add_argument("--vectors", help=".npy file of vectors to use instead")
+    parser.add_argument("--count", type=int, default=20000, help="Number of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Vectors held out as queries")
+    parser.add_argument("-k", type=int, default=10, help="Neighbors retrieved per query")
+    parser.add_argument("--rescore", type=int, default=100, help="Candidates re-scored exactly (0 to skip)")
+    parser.add_argument("--metric", choices=["ip", "l2"], default="ip", help="Similarity the store ranks by")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.model, args.cache_dir, args.vectors, args.count)
+    held_out = np.random.default_rng(0).permutation(len(vectors))[:args.queries]
+    queries, corpus = vectors[held_out], np.delete(vectors, held_out, axis=0)
+    print(f"{len(corpus)} vectors of {corpus.shape[1]} dimensions, {len(queries)} queries, "
+          f"recall@{args.k} against exact float32 search")
+
+    print(f"{'mode':<24}{'bytes/vector':>14}{'size (MB)':>11}{'recall':>9}{'ms/query':>10}")
+    truth = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            store = QuantizedVectors.build(f"{tmp}/{mode}", corpus, mode=mode, metric=args.metric,
+                                           keep_full=bool(args.rescore))
+            if truth is None:
+                _, truth = store.search(queries, args.k)
+            for rescore in [0] + ([args.rescore] if args.rescore else []):
+                start = time.perf_counter()
+                _, rows = store.search(queries, args.k, rescore=rescore)
+                ms = (time.perf_counter() - start) / len(queries) * 1000
+                label = f"{mode} + rescore {rescore}" if rescore else mode
+                print(f"{label:<24}{store.nbytes / len(store):>14.1f}{store.nbytes / 2 ** 20:>11.2f}"
+                      f"{recall(rows, truth):>9.3f}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
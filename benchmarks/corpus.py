@@ -0,0 +1,118 @@
+"""
+Synthetic OGS-like pages for benchmarks and offline tests.
+
+Pages mimic the structure of the OGS site: a navigation menu, a cookie
+banner, a main article with headings, paragraphs, lists and tables about
+immigration topics, inline scripts/styles and a contact footer. Generation
+is deterministic for a given seed.
+"""
+import random
+
+TOPICS = [
+    'F-1 Students', 'J-1 Scholars', 'OPT', 'STEM OPT Extension', 'CPT', 'H-1B', 'Travel Signatures',
+    'Reduced Course Load', 'Transfer In', 'Program Extension', 'SEVIS Fee', 'Change of Status',
+    'Dependents', 'Social Security Number', 'Tax Filing', 'Health Insurance', 'Employment', 'Visa Renewal',
+]
+
+SENTENCES = [
+    "International students must maintain full-time enrollment during each academic term.",
+    "Submit your request through myOGS at least 30 days before the intended start date.",
+    "Your I-20 must carry a valid travel signature when you re-enter the United States.",
+    "Employment authorization is tied to your program of study and degree level.",
+    "Contact OGS at ogs@northeastern.edu or +1-617-373-2310 with any questions.",
+    "Students on a reduced course load must return to full-time enrollment the following term.",
+    "The Department of Homeland Security sets the rules for practical training.",
+    "Processing times vary and may take up to 90 days during peak periods.",
+    "Dependents in F-2 status may not work but can study part time.",
+    "Keep copies of all immigration documents in a safe place.",
+    "Unauthorized employment is a violation of status and may lead to SEVIS termination.",
+    "You can apply up to 90 days before and 60 days after your program end date.",
+    "Health insurance is required for all students and scholars and their dependents.",
+    "Advising appointments are available Monday through Friday from 9am to 5pm.",
+]
+
+NAV_ITEMS = ['Students', 'Scholars', 'Employment', 'Travel', 'Forms & Guides', 'Events', 'Contact']
+
+
+def paragraph(rng, sentences=None):
+    picked = rng.sample(SENTENCES, sentences or rng.randint(1, 5))
+    text = " ".join(picked)
+    # Sprinkle the inline markup and entities real pages contain
+    if rng.random() < 0.4:
+        text = text.replace("OGS", "<strong>OGS</strong>", 1)
+    if rng.random() < 0.3:
+        text = text.replace(" and ", " &amp; ", 1)
+    if rng.random() < 0.3:
+        text += "&nbsp;<span class=\"note\">(updated)</span>"
+    return f"<p class=\"body-text\">{text}</p>"
+
+
+def generate_page(index, rng, page_count, fan_out=8, duplicate_links=False):
+    """
+    One HTML page linking to fan_out other pages of the site ('/page-<n>').
+    With duplicate_links, some links are URL variants (query strings, trailing
+    slashes, fragments) of pages that are already linked.
+    """
+    topic = TOPICS[index % len(TOPICS)]
+    targets = [rng.randrange(page_count) for _ in range(fan_out)]
+    links = [f"/page-{target}" for target in targets]
+    if duplicate_links:
+        links += [f"/page-{target}/?utm_source=nav" for target in targets[:2]]
+        links += [f"/page-{target}#section" for target in targets[2:4]]
+
+    nav = "".join(f"<li class=\"menu-item\"><a href=\"/{item.lower().replace(' & ', '-')}\">{item}</a></li>"
+                  for item in NAV_ITEMS)
+    body_links = "".join(f"<li><a href=\"{link}\" class=\"related\">Related: {TOPICS[i % len(TOPICS)]}</a></li>"
+                         for i, link in enumerate(links))
+
+    sections = []
+    for section in range(rng.randint(2, 5)):
+        parts = [f"<h2 id=\"s{section}\">{topic} &ndash; Part {section + 1}</h2>"]
+        parts += [paragraph(rng) for _ in range(rng.randint(1, 4))]
+        if rng.random() < 0.5:
+            parts.append("<ul>" + "".join(f"<li>{rng.choice(SENTENCES)}</li>" for _ in range(rng.randint(2, 5)))
+                         + "</ul>")
+        if rng.random() < 0.3:
+            rows = "".join(f"<tr><td>{TOPICS[(index + r) % len(TOPICS)]}</td><td>{rng.randint(30, 120)} days</td></tr>"
+                           for r in range(3))
+            parts.append(f"<table class=\"deadlines\"><tbody>{rows}</tbody></table>")
+        sections.append(f"<div class=\"section\">{''.join(parts)}</div>")
+
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="utf-8">
+    <title>{topic} | Office of Global Services</title>
+    <link rel="stylesheet" href="/wp-content/themes/ogs/style.css">
+    <style>.menu-item {{ display: inline; }}</style>
+    <script type="text/javascript">window.dataLayer = window.dataLayer || []; var page = {index};</script>
+</head>
+<body class="page-template page-{index}">
+    <div id="cookie-banner" class="banner">We use cookies to improve your experience. <a href="/privacy">Privacy</a></div>
+    <header class="site-header">
+        <a href="/" class="logo"><img src="/logo.png" alt="Northeastern OGS"></a>
+        <nav class="main-nav"><ul>{nav}</ul></nav>
+    </header>
+    <main id="content">
+        <!-- page {index} -->
+        <article>
+            <h1 class="entry-title">{topic}</h1>
+            {''.join(sections)}
+            <aside><h3>Related pages</h3><ul>{body_links}</ul></aside>
+        </article>
+    </main>
+    <footer class="site-footer">
+        <div class="contact"><p>Office of Global Services, 405 Ell Hall, 360 Huntington Ave, Boston, MA 02115</p>
+        <p>Email <a href="mailto:ogs@northeastern.edu">ogs@northeastern.edu</a> &middot; Phone +1-617-373-2310</p></div>
+    </footer>
+    <script src="/wp-includes/js/jquery.min.js"></script>
+</body>
+</html>
+"""
+
+
+def generate_corpus(page_count=200, seed=0, fan_out=8, duplicate_links=False):
+    """Pages '/page-0' ... '/page-<n-1>' as a dict of path -> HTML"""
+    rng = random.Random(seed)
+    return {f"/page-{index}": generate_page(index, rng, page_count, fan_out, duplicate_links)
+            for index in range(page_count)}
@@ -0,0 +1,202 @@
+"""
+Local stand-in for the OGS site, used by the crawler benchmark and tests.
+
+SyntheticSite serves a deterministic corpus of OGS-like pages (see
+benchmarks.corpus) over HTTP on 127.0.0.1 with configurable size, link
+fan-out, response latency, injected 500/429 errors and duplicate URL
+variants. It counts every request so callers can measure duplicate fetches;
+the counters are served as JSON from /__stats.
+"""
+import re
+import json
+import time
+import random
+import threading
+import multiprocessing
+from collections import Counter
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from benchmarks.corpus import generate_corpus
+
+
+class SiteConfig:
+    """
+    Attributes:
+        pages (int): Number of pages ('/page-0' ... '/page-<n-1>'), plus the home page '/'
+        fan_out (int): Links to other pages on every page
+        latency (float): Mean response latency in seconds
+        jitter (float): Latency varies uniformly by +/- jitter
+        tail_rate (float): Share of responses that take tail_latency instead (slow outliers)
+        tail_latency (float): Latency of the slow outliers
+        error_rate (float): Share of page requests answered with 500
+        broken (set): Pages always answered with 500, e.g. {'/page-2'}; may be changed while serving
+        throttle_rate (float): Share of page requests answered with 429
+        retry_after (int): Retry-After seconds sent with 429 responses
+        duplicate_links (bool): Also link to query-string, trailing-slash and fragment variants
+        sitemap (bool): Serve /sitemap.xml listing every page
+        sitemap_lastmod (str): <lastmod> given for every page in the sitemap, e.g. '2020-01-01'
+        unlisted (list): Pages left out of the sitemap, e.g. ['/page-2']
+        trailing_slash (bool): Serve pages at '/page-3/' like WordPress, linking there and
+            redirecting '/page-3' with a 301
+        seed (int): Seed for the corpus and the injected latency/errors
+    """
+
+    def __init__(self, pages=200, fan_out=8, latency=0.0, jitter=0.0, tail_rate=0.0, tail_latency=1.0,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=1, duplicate_links=False, sitemap=False,
+                 sitemap_lastmod=None, unlisted=(), trailing_slash=False, broken=(), seed=0):
+        self.pages = pages
+        self.fan_out = fan_out
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.error_rate = error_rate
+        self.broken = set(broken)
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.duplicate_links = duplicate_links
+        self.sitemap = sitemap
+        self.sitemap_lastmod = sitemap_lastmod
+        self.unlisted = set(unlisted)
+        self.trailing_slash = trailing_slash
+        self.seed = seed
+
+
+def page_key(path):
+    """Normalize a request path the way a canonicalizing crawler should ('/page-3/?x=1' -> '/page-3')"""
+    return urlparse(path).path.rstrip('/') or '/'
+
+
+def make_handler(config):
+    corpus = generate_corpus(config.pages, config.seed, config.fan_out, config.duplicate_links)
+    home_links = "".join(f'<a href="/page-{i}">Page {i}</a>' for i in range(min(config.fan_out, config.pages)))
+    corpus['/'] = f"<html><body><h1>Office of Global Services</h1>{home_links}</body></html>"
+    if config.trailing_slash:
+        corpus = {key: re.sub(r'href="(/page-\d+)"', r'href="\1/"', page) for key, page in corpus.items()}
+    served_path = (lambda key: key if key == '/' else key + '/') if config.trailing_slash else (lambda key: key)
+
+    rng = random.Random(config.seed)
+    lock = threading.Lock()
+    requests = Counter()
+    statuses = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def send(self, status, body=b'', content_type='text/html', headers=None):
+            with lock:
+                statuses[status] += 1
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            key = page_key(self.path)
+            if key == '/__stats':
+                with lock:
+                    stats = {'requests': dict(requests), 'statuses': {str(k): v for k, v in statuses.items()}}
+                return self.send(200, json.dumps(stats).encode(), 'application/json')
+
+            if key == '/sitemap.xml' and config.sitemap:
+                host = self.headers['Host']
+                lastmod = f"<lastmod>{config.sitemap_lastmod}</lastmod>" if config.sitemap_lastmod else ""
+                urls = "".join(f"<url><loc>http://{host}{served_path(key)}</loc>{lastmod}</url>"
+                               for key in corpus if key not in config.unlisted)
+                body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+                return self.send(200, body.encode(), 'application/xml')
+
+            if key not in corpus:
+                return self.send(404)
+            if config.trailing_slash and urlparse(self.path).path != served_path(key):
+                return self.send(301, headers={'Location': served_path(key)})
+
+            with lock:
+                requests[key] += 1
+                draw, slow, delay = rng.random(), rng.random(), rng.uniform(-config.jitter, config.jitter)
+
+            time.sleep(config.tail_latency if slow < config.tail_rate else max(0.0, config.latency + delay))
+            if draw < config.error_rate or key in config.broken:
+                return self.send(500)
+            if draw < config.error_rate + config.throttle_rate:
+                return self.send(429, headers={'Retry-After': str(config.retry_after)})
+
+            etag = f'"{hash(corpus[key]) & 0xffffffff:x}"'
+            if self.headers.get('If-None-Match') == etag:
+                return self.send(304)
+            return self.send(200, corpus[key].encode('utf-8'), headers={'ETag': etag})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(config, port_queue):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(config))
+    server.daemon_threads = True
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+class SyntheticSite:
+    """
+    Runs the stand-in site in a background thread, or in a separate process
+    (in_process=False) so that benchmarks do not share the GIL with the server.
+
+    Example:
+        >>> with SyntheticSite(SiteConfig(pages=100, latency=0.05)) as site:
+        ...     crawl(site.url)
+        ...     print(site.stats()['duplicate_fetches'])
+    """
+
+    def __init__(self, config=None, in_process=True):
+        self.config = config or SiteConfig()
+        self.in_process = in_process
+        self.url = None
+        self._server = None
+        self._process = None
+
+    def start(self):
+        if self.in_process:
+            self._server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(self.config))
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            port = self._server.server_port
+        else:
+            port_queue = multiprocessing.Queue()
+            self._process = multiprocessing.Process(target=serve, args=(self.config, port_queue), daemon=True)
+            self._process.start()
+            port = port_queue.get(timeout=30)
+        self.url = f"http://127.0.0.1:{port}/"
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._process:
+            self._process.terminate()
+            self._process.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        """Request counters; duplicate_fetches counts repeated requests for the same page"""
+        import requests
+
+        stats = requests.get(self.url + '__stats', timeout=10).json()
+        page_requests = sum(stats['requests'].values())
+        stats['page_requests'] = page_requests
+        stats['distinct_pages'] = len(stats['requests'])
+        stats['duplicate_fetches'] = page_requests - len(stats['requests'])
+        return stats
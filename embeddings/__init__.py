@@ -0,0 +1 @@
+from embeddings.cache import EmbeddingCache
@@ -0,0 +1,234 @@
+import os
+import hashlib
+from importlib.util import find_spec
+import numpy as np
+from embeddings.batching import embed_in_batches, PaddingStats, BATCH_TOKENS, MAX_BATCH
+
+# Pooling each supported model was trained with; other models use mean pooling
+POOLING = {
+    'BAAI/bge-small-en': 'cls',
+    'sentence-transformers/all-MiniLM-L6-v2': 'mean',
+}
+# Prepended to queries, as LlamaIndex's HuggingFaceEmbedding does for BGE models
+QUERY_INSTRUCTIONS = {
+    'BAAI/bge-small-en': "Represent this question for searching relevant passages: ",
+}
+MAX_LENGTH = 512
+# Lowest cosine similarity to the PyTorch embedding an ONNX or int8 embedding may have
+PARITY_TOLERANCE = 0.99
+
+
+def available_backends(model_name=None):
+    """
+    Embedding backends whose packages are installed. ONNX Runtime also needs
+    PyTorch to export the model, unless model_name's graph was exported already.
+    """
+    backends = []
+    if find_spec('torch') and find_spec('transformers'):
+        backends.append('torch')
+    if find_spec('onnxruntime') and find_spec('transformers') and (
+            'torch' in backends or (model_name and os.path.isfile(onnx_graph_path(model_name)))):
+        backends.append('onnx')
+    return backends
+
+
+def select_device(device=None):
+    """
+    Device for the PyTorch backend: EMBEDDING_DEVICE, or with 'auto' the
+    first of cuda, mps and cpu that is available.
+    """
+    device = device or os.getenv('EMBEDDING_DEVICE', 'auto')
+    if device != 'auto':
+        return device
+    if not find_spec('torch'):
+        return 'cpu'
+
+    import torch
+    if torch.cuda.is_available():
+        return 'cuda'
+    if torch.backends.mps.is_available():
+        return 'mps'
+    return 'cpu'
+
+
+def pool(hidden, attention_mask, pooling):
+    """L2-normalized sentence vectors from token states: the [CLS] state or the mean over real tokens"""
+    if pooling == 'cls':
+        vectors = hidden[:, 0]
+    else:
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def cosine_parity(reference, vectors):
+    """(min, mean) cosine similarity between matching rows of two embedding matrices"""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    cosines = (reference * vectors).sum(axis=1)
+    return float(cosines.min()), float(cosines.mean())
+
+
+class Encoder:
+    """
+    Sentence encoder over a Hugging Face model. Subclasses run the model
+    (_forward); batching, pooling and normalization are shared, so every
+    backend produces comparable vectors.
+
+    Texts are batched by token length under a budget of max_tokens token
+    slots (see embeddings.batching), and the padding avoided that way is
+    tallied in `padding`.
+    """
+
+    def __init__(self, model_name, batch_size=MAX_BATCH, max_tokens=BATCH_TOKENS):
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.name = model_name
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.pooling = POOLING.get(model_name, 'mean')
+        self.query_instruction = QUERY_INSTRUCTIONS.get(model_name, '')
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.padding = PaddingStats()
+
+    def _forward(self, texts):
+        """(token states, attention mask) of a batch of texts as numpy arrays"""
+        raise NotImplementedError
+
+    def _encode_batch(self, texts):
+        hidden, attention_mask = self._forward(texts)
+        return pool(hidden.astype(np.float32), attention_mask, self.pooling)
+
+    def encode(self, texts, out=None):
+        """
+        (len(texts), dim) float32 array of normalized embeddings, in input
+        order; written into out when given.
+        """
+        texts = list(texts)
+        if len(texts) == 1 and out is None:
+            return self._encode_batch(texts)
+        # A fast tokenizer pass is cheap next to the model, and tells how to batch the texts
+        lengths = [len(ids) for ids in self.tokenizer(texts, truncation=True, max_length=MAX_LENGTH)['input_ids']]
+        return embed_in_batches(texts, lengths, self._encode_batch, self.padding, self.max_tokens, self.batch_size,
+                                out=out)
+
+
+class TorchEncoder(Encoder):
+    """
+    PyTorch encoder on the selected device, in half precision on CUDA. threads
+    caps the CPU threads torch uses (default: torch's own choice).
+    """
+
+    def __init__(self, model_name, device=None, max_tokens=None, threads=None):
+        import torch
+        from transformers import AutoModel
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.device = select_device(device)
+        # Accelerators take larger batches than the CPU
+        super().__init__(model_name, max_tokens=max_tokens or BATCH_TOKENS * (1 if self.device == 'cpu' else 4))
+        self.model = AutoModel.from_pretrained(model_name).to(self.device).eval()
+        if self.device == 'cuda':
+            self.model.half()
+
+    def _forward(self, texts):
+        import torch
+
+        batch = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors='pt')
+        with torch.inference_mode():
+            hidden = self.model(**batch.to(self.device)).last_hidden_state
+        return hidden.float().cpu().numpy(), batch['attention_mask'].cpu().numpy()
+
+
+def onnx_model_dir(model_name):
+    slug = model_name.split('/')[-1] + '-' + hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(os.getenv('EMBEDDING_CACHE_DIR', 'data/embedding_cache/'), 'onnx', slug)
+
+
+def onnx_graph_path(model_name):
+    return os.path.join(onnx_model_dir(model_name), 'model.onnx')
+
+
+def export_onnx(model_name, quantize=False):
+    """
+    Path of the model's ONNX graph, exported with PyTorch on first use. With
+    quantize, the weights of the exported graph are dynamically quantized to
+    int8, which mostly speeds up the matrix multiplications on CPU.
+    """
+    model_dir = onnx_model_dir(model_name)
+    path = onnx_graph_path(model_name)
+    int8_path = os.path.join(model_dir, 'model.int8.onnx')
+
+    if not os.path.isfile(path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        os.makedirs(model_dir, exist_ok=True)
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = AutoTokenizer.from_pretrained(model_name)(["An example sentence."], return_tensors='pt')
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+        axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+        print(f"Exporting {model_name} to {path}...")
+        torch.onnx.export(model, tuple(sample[name] for name in input_names), path + '.tmp',
+                          input_names=input_names, output_names=['last_hidden_state'],
+                          dynamic_axes=axes, opset_version=14)
+        os.replace(path + '.tmp', path)
+
+    if quantize and not os.path.isfile(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print(f"Quantizing {path} to int8...")
+        quantize_dynamic(path, int8_path + '.tmp', weight_type=QuantType.QInt8)
+        os.replace(int8_path + '.tmp', int8_path)
+
+    return int8_path if quantize else path
+
+
+class OnnxEncoder(Encoder):
+    """ONNX Runtime encoder on CPU, optionally with int8 weights and a cap on its threads"""
+
+    def __init__(self, model_name, quantize=False, max_tokens=None, threads=None):
+        import onnxruntime
+
+        super().__init__(model_name, max_tokens=max_tokens or BATCH_TOKENS)
+        if quantize:
+            # int8 vectors are close to, but not the same as, the float ones; keep them apart in the cache
+            self.name = f"{model_name}:int8"
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or 0  # 0 lets ONNX Runtime use every core
+        self.session = onnxruntime.InferenceSession(export_onnx(model_name, quantize), options,
+                                                    providers=['CPUExecutionProvider'])
+        self.input_names = [graph_input.name for graph_input in self.session.get_inputs()]
+
+    def _forward(self, texts):
+        batch = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors='np')
+        hidden = self.session.run(None, {name: batch[name].astype(np.int64) for name in self.input_names})[0]
+        return hidden, batch['attention_mask']
+
+
+def get_encoder(model_name, backend=None, device=None, quantize=None, threads=None):
+    """
+    Encoder for model_name on the EMBEDDING_BACKEND backend ('torch', 'onnx'
+    or 'auto'). 'auto' uses PyTorch, and ONNX Runtime only when PyTorch is not
+    installed: ONNX's parity with PyTorch (PARITY_TOLERANCE) is checked by
+    benchmarks.bench_embeddings and the ONNX parity test, so it is opted into
+    with EMBEDDING_BACKEND=onnx. EMBEDDING_QUANTIZE=1 selects the int8 ONNX
+    model. threads caps the CPU threads of either backend.
+    """
+    backend = backend or os.getenv('EMBEDDING_BACKEND', 'auto')
+    quantize = os.getenv('EMBEDDING_QUANTIZE') == '1' if quantize is None else quantize
+    available = available_backends(model_name)
+    if backend == 'auto':
+        backend = 'onnx' if available == ['onnx'] else 'torch'
+
+    if backend not in available:
+        raise ImportError(f"The {backend} embedding backend is not installed "
+                          f"(torch needs torch and transformers, onnx needs onnxruntime, transformers and "
+                          f"either torch or an exported graph)")
+    if backend == 'onnx':
+        return OnnxEncoder(model_name, quantize=quantize, threads=threads)
+    return TorchEncoder(model_name, device=device, threads=threads)
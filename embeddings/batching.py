@@ -0,0 +1,82 @@
+import os
+import numpy as np
+
+# Token slots (longest text x texts) a batch may hold, and the most texts it may hold
+BATCH_TOKENS = int(os.getenv('EMBED_BATCH_TOKENS', 8192))
+MAX_BATCH = 256
+# Batch size of the fixed batches the padding report compares against
+FIXED_BATCH = 16
+
+
+def token_batches(lengths, max_tokens=BATCH_TOKENS, max_batch=MAX_BATCH):
+    """
+    Indices of texts grouped into batches by token length, longest first.
+    Texts of similar length share a batch, so little of it is padding, and
+    a batch holds at most max_tokens token slots: its longest text padded
+    across all of its texts. A text longer than max_tokens gets a batch of
+    its own.
+
+    Example:
+        >>> token_batches([5, 300, 7, 280], max_tokens=600)
+        [[1, 3], [2, 0]]
+    """
+    batches, batch = [], []
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        # The first text of a batch is its longest, so it sets the padded length
+        if batch and ((len(batch) + 1) * lengths[batch[0]] > max_tokens or len(batch) == max_batch):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class PaddingStats:
+    """
+    Token slots spent on padding by length-bucketed batches, next to what
+    fixed batches of FIXED_BATCH texts in input order would have spent.
+    """
+
+    def __init__(self):
+        self.tokens = self.slots = self.fixed_slots = 0
+
+    def add(self, lengths, batches):
+        self.tokens += sum(lengths)
+        self.slots += sum(lengths[batch[0]] * len(batch) for batch in batches)
+        self.fixed_slots += sum(max(lengths[start:start + FIXED_BATCH]) * len(lengths[start:start + FIXED_BATCH])
+                                for start in range(0, len(lengths), FIXED_BATCH))
+
+    def merge(self, other):
+        """Add the statistics of another PaddingStats, e.g. from a worker process"""
+        self.tokens += other.tokens
+        self.slots += other.slots
+        self.fixed_slots += other.fixed_slots
+
+    def report(self):
+        if not self.tokens:
+            return
+        padding, fixed_padding = self.slots - self.tokens, self.fixed_slots - self.tokens
+        print(f"Padding: {padding / self.slots:.1%} of {self.slots} token slots, down from "
+              f"{fixed_padding / self.fixed_slots:.1%} with fixed batches of {FIXED_BATCH} "
+              f"({fixed_padding - padding} padding tokens eliminated)")
+
+
+def embed_in_batches(texts, lengths, encode, stats=None, max_tokens=BATCH_TOKENS, max_batch=MAX_BATCH, out=None):
+    """
+    Vectors of texts, in input order, from encode(list of texts) -> array
+    called on token_batches of the texts. lengths are the texts' token counts.
+    With out, a (len(texts), dim) array such as a memory map, the vectors are
+    written into it instead of a new array.
+    """
+    batches = token_batches(lengths, max_tokens, max_batch)
+    vectors = out
+    for batch in batches:
+        encoded = np.asarray(encode([texts[i] for i in batch]))
+        if vectors is None:
+            vectors = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+        vectors[batch] = encoded
+
+    if stats is not None:
+        stats.add(lengths, batches)
+    return vectors if vectors is not None else np.empty((0, 0), dtype=np.float32)
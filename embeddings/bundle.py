@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+from preprocessing.chunkstore import ChunkStore, CHUNK_STORE_NAME
+from embeddings.quantized import QuantizedVectors, VECTOR_MODE
+
+BUNDLE_VERSION = 1
+BUNDLE_NAME = 'bundle.json'
+
+
+def id_hash(chunk_id):
+    """64-bit hash of a chunk ID, the key of the bundle's ID index"""
+    return int.from_bytes(hashlib.blake2b(chunk_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def save_array(path, array):
+    np.save(path + '.tmp.npy', array)
+    os.replace(path + '.tmp.npy', path)
+
+
+class RetrievalBundle:
+    """
+    Everything the chatbots retrieve from, in one versioned directory:
+
+    - chunks.jsonl and chunks.offsets.npy: the chunk store (texts, URLs,
+      headings, links and aliases; see preprocessing.chunkstore)
+    - vectors/: the chunk embeddings (see embeddings.quantized)
+    - tokens.npy: the token count of every chunk
+    - id_hashes.npy and id_rows.npy: sorted hashes of the chunk IDs and
+      their rows, for looking a chunk up by its stable ID
+    - bundle.json: version, embedding model, row count and file sizes
+
+    Row i of every file is chunk i: the vectors are embedded from the
+    bundle's own copy of the chunk store, the files are written together into
+    a new directory that replaces the old one, and opening checks that they
+    all hold the same rows, so vectors cannot point at the wrong chunk.
+    Opening memory-maps the files and parses nothing but bundle.json.
+
+    Example:
+        >>> RetrievalBundle.build('data/bundle', 'data/chunked/chunks.jsonl', model.encode, "all-MiniLM-L6-v2")
+        >>> bundle = RetrievalBundle('data/bundle')
+        >>> distances, rows = bundle.vectors.search(query_vectors, k=5, rescore=50)
+        >>> bundle.chunks[int(rows[0, 0])]['text'], bundle.tokens[rows[0]]
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, BUNDLE_NAME), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != BUNDLE_VERSION:
+            raise ValueError(f"{path} is a version {self.meta['version']} retrieval bundle, "
+                             f"expected version {BUNDLE_VERSION}; rebuild it")
+        for name, size in self.meta['files'].items():
+            if os.path.getsize(os.path.join(path, name)) != size:
+                raise ValueError(f"{os.path.join(path, name)} does not match {BUNDLE_NAME}; rebuild the bundle")
+
+        self.model_name = self.meta['model']
+        self.chunks = ChunkStore(os.path.join(path, CHUNK_STORE_NAME))
+        self.vectors = QuantizedVectors(os.path.join(path, 'vectors'))
+        self.tokens = np.load(os.path.join(path, 'tokens.npy'), mmap_mode='r')
+        self.id_hashes = np.load(os.path.join(path, 'id_hashes.npy'), mmap_mode='r')
+        self.id_rows = np.load(os.path.join(path, 'id_rows.npy'), mmap_mode='r')
+        counts = {len(self.chunks), len(self.vectors), len(self.tokens), len(self.id_rows), self.meta['rows']}
+        if len(counts) != 1:
+            raise ValueError(f"{path} holds chunks, vectors and token counts of different lengths; rebuild it")
+
+    @classmethod
+    def build(cls, path, chunk_store_path, embed_fn, model_name, mode=VECTOR_MODE, metric='ip', keep_full=True):
+        """
+        Write a bundle of the chunk store at chunk_store_path to path,
+        replacing any bundle there. The chunk texts, in store order, are
+        embedded with embed_fn(list of texts) -> vectors.
+        """
+        tmp_path = path.rstrip('/') + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        shutil.copyfile(chunk_store_path, os.path.join(tmp_path, CHUNK_STORE_NAME))
+        shutil.copyfile(ChunkStore.offsets_path(chunk_store_path),
+                        ChunkStore.offsets_path(os.path.join(tmp_path, CHUNK_STORE_NAME)))
+        with ChunkStore(os.path.join(tmp_path, CHUNK_STORE_NAME)) as store:
+            records = [(record['id'], record['text'], record['tokens']) for record in store]
+        vectors = embed_fn([text for _, text, _ in records])
+
+        QuantizedVectors.build(os.path.join(tmp_path, 'vectors'), vectors, mode=mode, metric=metric,
+                               keep_full=keep_full)
+        tokens = np.array([count for _, _, count in records], dtype=np.int32)
+        save_array(os.path.join(tmp_path, 'tokens.npy'), tokens)
+        hashes = np.array([id_hash(chunk_id) for chunk_id, _, _ in records], dtype=np.uint64)
+        order = np.argsort(hashes, kind='stable')
+        save_array(os.path.join(tmp_path, 'id_hashes.npy'), hashes[order])
+        save_array(os.path.join(tmp_path, 'id_rows.npy'), order.astype(np.int64))
+
+        files = {}
+        for directory, _, filenames in os.walk(tmp_path):
+            for filename in filenames:
+                name = os.path.relpath(os.path.join(directory, filename), tmp_path)
+                files[name] = os.path.getsize(os.path.join(tmp_path, name))
+        meta = {'version': BUNDLE_VERSION, 'model': model_name, 'rows': len(records), 'built': time.time(),
+                'files': files}
+        with open(os.path.join(tmp_path, BUNDLE_NAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+        # Processes with the old bundle open keep reading its files until they reopen it
+        old_path = path.rstrip('/') + '.old'
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return cls(path)
+
+    def row(self, chunk_id):
+        """Row of the chunk with the given ID"""
+        key = np.uint64(id_hash(chunk_id))
+        start = int(np.searchsorted(self.id_hashes, key))
+        for i in range(start, len(self.id_hashes)):
+            if self.id_hashes[i] != key:
+                break
+            row = int(self.id_rows[i])
+            if self.chunks[row]['id'] == chunk_id:
+                return row
+        raise KeyError(chunk_id)
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def close(self):
+        self.chunks.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,140 @@
+import os
+import re
+import sqlite3
+import hashlib
+import unicodedata
+import numpy as np
+
+WHITESPACE = re.compile(r'\s+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, dim INTEGER NOT NULL, rows INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL, text_hash TEXT NOT NULL, row INTEGER NOT NULL, PRIMARY KEY (model, text_hash)
+);
+"""
+# SQLite caps the number of parameters of a statement
+LOOKUP_BATCH = 500
+
+
+def normalize_text(text):
+    """Texts that only differ in Unicode normalization or whitespace share an embedding"""
+    return WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of embedding vectors, keyed by (embedding model name, hash
+    of the normalized text).
+
+    Vectors of a model are appended to one float32 matrix file that is read
+    through a memory map, and an SQLite table maps each key to its row. The
+    row count in the models table is only updated once the rows are written,
+    so rows of an interrupted append are ignored and overwritten.
+
+    Example:
+        >>> cache = EmbeddingCache('data/embedding_cache/', 'BAAI/bge-small-en')
+        >>> vectors = cache.embed(texts, model.encode)  # only cache misses reach model.encode
+        >>> cache.report()
+    """
+
+    def __init__(self, cache_dir, model_name):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.db = sqlite3.connect(os.path.join(cache_dir, 'embeddings.sqlite'))
+        self.db.executescript(SCHEMA)
+        row = self.db.execute('SELECT dim, rows FROM models WHERE model = ?', (model_name,)).fetchone()
+        self.dim, self.rows = row if row else (None, 0)
+
+        slug = hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:12]
+        self.matrix_path = os.path.join(cache_dir, f'vectors-{slug}.f32')
+        self._matrix = None
+        self.hits = self.misses = 0
+
+    @property
+    def matrix(self):
+        """(rows, dim) float32 memory map of every cached vector of the model"""
+        if not self.rows:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        if self._matrix is None or len(self._matrix) != self.rows:
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r', shape=(self.rows, self.dim))
+        return self._matrix
+
+    def lookup(self, keys):
+        """Matrix row of each text key, -1 where the text is not cached"""
+        rows = {}
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[start:start + LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows.update(self.db.execute(f'SELECT text_hash, row FROM embeddings '
+                                        f'WHERE model = ? AND text_hash IN ({placeholders})',
+                                        (self.model_name, *batch)))
+        return np.array([rows.get(key, -1) for key in keys], dtype=np.int64)
+
+    def add(self, keys, vectors):
+        """Append the vectors of new text keys"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"{self.model_name} vectors have {self.dim} dimensions, got {vectors.shape[1]}")
+
+        with open(self.matrix_path, 'ab') as f:
+            f.truncate(self.rows * self.dim * 4)  # Drop rows of an append that was never committed
+            f.write(vectors.tobytes())
+
+        first = self.rows
+        self.rows += len(vectors)
+        with self.db:
+            self.db.executemany('INSERT OR IGNORE INTO embeddings (model, text_hash, row) VALUES (?, ?, ?)',
+                                [(self.model_name, key, first + i) for i, key in enumerate(keys)])
+            self.db.execute('INSERT OR REPLACE INTO models (model, dim, rows) VALUES (?, ?, ?)',
+                            (self.model_name, self.dim, self.rows))
+
+    def embed(self, texts, embed_fn):
+        """
+        (len(texts), dim) float32 vectors of texts. Texts missing from the
+        cache are embedded with embed_fn(list of texts) -> vectors, once per
+        distinct text, and stored.
+        """
+        if not texts:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+
+        keys = [text_key(text) for text in texts]
+        rows = self.lookup(keys)
+        missing = {}
+        for i, (key, row) in enumerate(zip(keys, rows)):
+            if row < 0:
+                missing.setdefault(key, i)
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        if missing:
+            self.add(list(missing), embed_fn([texts[i] for i in missing.values()]))
+            rows = self.lookup(keys)
+        return np.asarray(self.matrix[rows])
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self):
+        print(f"Embedding cache ({self.model_name}): {self.hits} hits, {self.misses} embedded, "
+              f"{self.hit_rate:.1%} hit rate, {self.rows} vectors stored")
+
+    def close(self):
+        self._matrix = None
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
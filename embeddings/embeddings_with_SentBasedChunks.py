@@ -1,66 +1,55 @@
 import os
-from bs4 import BeautifulSoup
 from transformers import AutoTokenizer, AutoModel
 import torch
-import faiss
 import numpy as np
+from preprocessing.chunkstore import CHUNK_STORE_NAME
+from embeddings.cache import EmbeddingCache
+from embeddings.batching import embed_in_batches, PaddingStats
+from embeddings.quantized import VECTOR_MODE
+from embeddings.bundle import RetrievalBundle
 
-# Folder containing the chunked HTML files (adjust if needed)
+# Folder containing the chunk store (adjust if needed)
 chunked_html_folder = "/Users/sudarshanp/Desktop/shreya_bot/data/chunks"
-output_dir = "/Users/sudarshanp/Desktop/shreya_bot/data"  # Path for storing the FAISS index
+output_dir = "/Users/sudarshanp/Desktop/shreya_bot/data"  # Path for storing the retrieval bundle
+cache_dir = os.path.join(output_dir, "embedding_cache")  # Chunks embedded by earlier runs are read from here
 
-# Function to load the chunked HTML content
-def load_chunked_html_files(folder):
-    files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.html')]
-    chunks = []
-    for file in files:
-        with open(file, "r", encoding="utf-8") as f:
-            soup = BeautifulSoup(f, "html.parser")
-            # Each paragraph in the chunked HTML is considered a separate chunk
-            chunks.extend([p.get_text() for p in soup.find_all('p')])
-    return chunks
-
-# Load chunked HTML files
-print(f"Loading chunks from {chunked_html_folder}...")
-all_chunks = load_chunked_html_files(chunked_html_folder)
-print(f"Loaded {len(all_chunks)} chunks.")
+chunk_store_path = os.path.join(chunked_html_folder, CHUNK_STORE_NAME)
 
 # Load BERT model and tokenizer
 print("Loading model and tokenizer...")
 tokenizer = AutoTokenizer.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
 model = AutoModel.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
 
-# Generate embeddings for all chunks
-def get_embeddings(text_chunks, batch_size=16):  # Add batch_size parameter
-    embeddings = []
-    total_batches = (len(text_chunks) + batch_size - 1) // batch_size
-    
-    for i in range(0, len(text_chunks), batch_size):
-        batch = text_chunks[i:i + batch_size]
-        print(f"Processing batch {i//batch_size + 1}/{total_batches}")
+# Generate embeddings for all chunks, in batches of chunks of similar token length
+padding = PaddingStats()
+
+def get_embeddings(text_chunks):
+    def encode(batch):
         encoded_input = tokenizer(batch, padding=True, truncation=True, return_tensors='pt')
         with torch.no_grad():
             model_output = model(**encoded_input)
-        embeddings.append(model_output.pooler_output.to(torch.float16).cpu().numpy())  # Lower precision for less memory
-    return np.vstack(embeddings)
-
-print(f"Generating embeddings for {len(all_chunks)} chunks...")
-embeddings = get_embeddings(all_chunks)
-print(f"Generated embeddings with shape: {embeddings.shape}")
+        return model_output.pooler_output.to(torch.float16).cpu().numpy()  # Lower precision for less memory
 
-# Store in FAISS
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(np.array(embeddings, dtype='float32'))
+    lengths = [len(ids) for ids in tokenizer(list(text_chunks), truncation=True)['input_ids']]
+    return embed_in_batches(list(text_chunks), lengths, encode, padding)
 
 # Create output directory if it doesn't exist
 os.makedirs(output_dir, exist_ok=True)
 
-# Save FAISS index
-index_path = os.path.join(output_dir, "faiss_index-shreya.index")
-faiss.write_index(index, index_path)
+# Bundle the chunk store with the vectors of its chunks, stored memory-mapped as VECTOR_MODE
+# codes (float16 by default) plus a float32 copy for re-scoring the best candidates
+print(f"Embedding the chunks of {chunk_store_path}...")
+bundle_path = os.path.join(output_dir, "bundle")
+# Keyed by the pooling as well: the pooler output differs from sentence-transformers' mean pooling
+with EmbeddingCache(cache_dir, "sentence-transformers/all-MiniLM-L6-v2:pooler_output") as cache:
+    bundle = RetrievalBundle.build(bundle_path, chunk_store_path, lambda texts: cache.embed(texts, get_embeddings),
+                                   model_name=cache.model_name, mode=VECTOR_MODE, metric='l2')
+    cache.report()
+padding.report()
+index = bundle.vectors
 
-print(f"Embeddings stored successfully in FAISS at {index_path}")
+print(f"Embeddings of {len(bundle)} chunks stored successfully as {VECTOR_MODE} vectors in {bundle_path} "
+      f"({index.nbytes / 2 ** 20:.1f} MB searched per query)")
 
 # Example query
 query = "where is Boston University"
@@ -70,8 +59,8 @@ encoded_query = tokenizer(query, padding=True, truncation=True, return_tensors='
 with torch.no_grad():
     query_embedding = model(**encoded_query).pooler_output[0].numpy()
 
-# FAISS search
-D, I = index.search(np.array([query_embedding], dtype='float32'), k=3)
+# Vector search, re-scoring the 50 best candidates exactly
+D, I = index.search(np.array([query_embedding], dtype='float32'), k=3, rescore=50)
 print("Top 3 closest chunks:", I)  # Top 3 closest chunks
 
 # Display the content of the top relevant chunks
@@ -81,5 +70,5 @@ for i, idx in enumerate(I[0]):
     if idx != -1:
         print(f"Result {i+1} (Score: {D[0][i]:.4f})")
         print(f"Chunk ID: {idx}")
-        print(f"Content: {all_chunks[idx]}")
+        print(f"Content: {bundle.chunks[int(idx)]['text']}")
         print("-" * 50)
@@ -0,0 +1,87 @@
+from typing import Any, List
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from embeddings.cache import EmbeddingCache
+
+
+class EncoderEmbedding(BaseEmbedding):
+    """
+    LlamaIndex embedding model over an embeddings.backends encoder. Queries
+    get the model's query instruction, as with HuggingFaceEmbedding.
+
+    Example:
+        >>> Settings.embed_model = EncoderEmbedding(get_encoder("BAAI/bge-small-en"))
+    """
+    _encoder: Any = PrivateAttr()
+
+    def __init__(self, encoder: Any, **kwargs: Any):
+        # Hand the encoder large batches: it groups texts by token length itself
+        super().__init__(model_name=encoder.name, embed_batch_size=2048, **kwargs)
+        self._encoder = encoder
+
+    def report(self) -> None:
+        self._encoder.padding.report()
+
+    def close(self) -> None:
+        """Stop the encoder's worker processes, if it has any"""
+        if hasattr(self._encoder, 'close'):
+            self._encoder.close()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._encoder.encode([self._encoder.query_instruction + query])[0].tolist()
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._encoder.encode(texts).tolist()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    LlamaIndex embedding model that serves text embeddings from an
+    EmbeddingCache and only passes cache misses to the wrapped model.
+    Queries go straight to the wrapped model.
+
+    Example:
+        >>> Settings.embed_model = CachedEmbedding(HuggingFaceEmbedding(model_name="BAAI/bge-small-en"),
+        ...                                        'data/embedding_cache/')
+    """
+    _inner: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache_dir: str, **kwargs: Any):
+        # Batches reaching the cache are large; the wrapped model still embeds misses in its own batch size
+        super().__init__(model_name=inner.model_name, embed_batch_size=2048, **kwargs)
+        self._inner = inner
+        self._cache = EmbeddingCache(cache_dir, inner.model_name)
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def report(self) -> None:
+        """Cache hit rate, and batching statistics of the wrapped model if it keeps any"""
+        self._cache.report()
+        if hasattr(self._inner, 'report'):
+            self._inner.report()
+
+    def close(self) -> None:
+        self._cache.close()
+        if hasattr(self._inner, 'close'):
+            self._inner.close()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._inner.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self._inner.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._cache.embed(texts, self._inner.get_text_embedding_batch).tolist()
@@ -0,0 +1,155 @@
+import os
+import time
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from embeddings.batching import PaddingStats, MAX_BATCH
+
+# Thread pools of the numeric libraries, capped in each worker to its share of the cores
+THREAD_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+# The encoder of a worker process, loaded once by _init_worker
+_encoder = None
+
+
+def resolve_embed_workers(workers=None):
+    """
+    Worker count from the EMBED_WORKERS setting; 0 means one per CPU core.
+    Unset, it is 1: embedding in a single process unless the pool is asked for.
+    """
+    workers = int(os.getenv('EMBED_WORKERS', 1) if workers is None else workers)
+    return workers if workers > 0 else os.cpu_count() or 1
+
+
+def available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def shard_ranges(lengths, shards):
+    """
+    Contiguous (start, end) ranges of texts with about the same total length
+    each, at most shards of them and none empty.
+
+    Example:
+        >>> shard_ranges([1, 1, 1, 1, 1, 1, 1, 1], 4)
+        [(0, 2), (2, 4), (4, 6), (6, 8)]
+    """
+    if not lengths:
+        return []
+    cumulative = np.cumsum(np.maximum(lengths, 1))
+    cuts = [int(np.searchsorted(cumulative, cumulative[-1] * k / shards)) + 1 for k in range(1, shards)]
+    bounds = sorted({0, len(lengths), *(min(cut, len(lengths)) for cut in cuts)})
+    return list(zip(bounds, bounds[1:]))
+
+
+def _init_worker(factory, counter, cores, threads):
+    """Pin the worker to its own cores and thread count, then load its encoder"""
+    global _encoder
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    pinned = cores[index * threads:(index + 1) * threads]
+    if pinned and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, pinned)
+    for var in THREAD_VARS:
+        os.environ[var] = str(threads)
+    _encoder = factory(threads=threads)
+
+
+def _describe():
+    """(name, query instruction, dimension) of the worker's encoder"""
+    return _encoder.name, _encoder.query_instruction, _encoder.encode(["dimension probe"]).shape[1]
+
+
+def _embed_shard(shm_name, shape, start, end, texts):
+    """
+    Embed a shard straight into rows start:end of the shared output matrix.
+    Only the timing and padding statistics travel back to the parent.
+    """
+    _encoder.padding = PaddingStats()
+    shm = SharedMemory(name=shm_name)
+    try:
+        matrix = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        begin = time.perf_counter()
+        _encoder.encode(texts, out=matrix[start:end])
+        seconds = time.perf_counter() - begin
+        del matrix  # The buffer cannot be closed while an array views it
+    finally:
+        shm.close()
+    return seconds, _encoder.padding
+
+
+class ParallelEncoder:
+    """
+    Encoder that shards texts over a pool of worker processes, each with its
+    own encoder from factory(threads=...), pinned to its share of the CPU
+    cores. Workers write their vectors into a shared-memory matrix, so
+    vectors are never pickled back to the parent.
+
+    It stands in for an embeddings.backends encoder (encode, name,
+    query_instruction, padding). The pool is kept between encode calls, so
+    each worker loads its model once; close() stops it.
+
+    Example:
+        >>> with ParallelEncoder(partial(get_encoder, "BAAI/bge-small-en", device='cpu'), workers=8) as encoder:
+        ...     vectors = encoder.encode(texts)
+    """
+
+    def __init__(self, factory, workers):
+        cores = available_cores()
+        self.workers = workers
+        self.threads = max(1, len(cores) // workers)
+        self.batch_size = MAX_BATCH
+        self.padding = PaddingStats()
+
+        # Spawned workers start without the parent's torch or ONNX Runtime thread pools
+        context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                            initargs=(factory, context.Value('i', 0), cores, self.threads))
+        self.name, self.query_instruction, self.dim = self.executor.submit(_describe).result()
+
+    def encode(self, texts, out=None):
+        """(len(texts), dim) float32 array of embeddings, in input order; written into out when given"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        shape = (len(texts), self.dim)
+        shm = SharedMemory(create=True, size=len(texts) * self.dim * 4)
+        try:
+            matrix = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            start = time.perf_counter()
+            futures = [self.executor.submit(_embed_shard, shm.name, shape, begin, end, texts[begin:end])
+                       for begin, end in shard_ranges([len(text) for text in texts], self.workers)]
+            results = [future.result() for future in futures]
+            wall_time = time.perf_counter() - start
+
+            if out is None:
+                out = np.array(matrix)
+            else:
+                out[:] = matrix
+            del matrix
+        finally:
+            shm.close()
+            shm.unlink()
+
+        for _, padding in results:
+            self.padding.merge(padding)
+        busy = sum(seconds for seconds, _ in results)
+        print(f"Embedded {len(texts)} texts in {wall_time:.2f}s with {len(results)} worker(s) "
+              f"of {self.threads} thread(s): {len(texts) / wall_time:.1f} texts/sec, "
+              f"{busy / wall_time:.1f}x parallel speedup")
+        return out
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,205 @@
+import os
+import json
+import numpy as np
+
+STORE_VERSION = 1
+MODES = ('float32', 'float16', 'int8', 'pq')
+CODE_DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.uint8, 'pq': np.uint8}
+VECTOR_MODE = os.getenv('VECTOR_MODE', 'float16')
+# Rows scored at once, so a search never decodes the whole matrix into floats
+BLOCK_ROWS = 8192
+# PQ: centroids per subspace (codes are one byte), training rows and k-means iterations
+PQ_CENTROIDS = 256
+PQ_TRAIN_ROWS = 16384
+PQ_ITERATIONS = 20
+
+
+def pq_subspaces(dim):
+    """Subspaces of about 8 dimensions each; the count must divide dim"""
+    subspaces = max(dim // 8, 1)
+    while dim % subspaces:
+        subspaces -= 1
+    return subspaces
+
+
+def nearest_centroids(x, centroids):
+    """Index of the nearest centroid (L2) of every row of x"""
+    sqnorms = (centroids ** 2).sum(axis=1)
+    return np.concatenate([np.argmin(sqnorms[None] - 2 * x[start:start + BLOCK_ROWS] @ centroids.T, axis=1)
+                           for start in range(0, len(x), BLOCK_ROWS)])
+
+
+def kmeans(x, k, iterations=PQ_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_centroids(x, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, x)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # An empty cluster restarts from a random row
+        centroids[~filled] = x[rng.choice(len(x), int((~filled).sum()))]
+    return centroids
+
+
+def write_array(path, array):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(path + '.tmp', path)
+
+
+class QuantizedVectors:
+    """
+    Embedding vectors in a memory-mapped directory, stored as one of:
+
+    - float32: the vectors as they are (4 bytes per dimension)
+    - float16: half precision (2 bytes per dimension)
+    - int8: per-dimension scalar quantization to 256 levels between the
+      dimension's min and max (1 byte per dimension)
+    - pq: product quantization, one byte per subspace of about 8 dimensions
+      naming the nearest of 256 k-means centroids
+
+    The codes are never decoded as a whole: searches score them block by
+    block, so every process serving the same store shares one copy of it
+    through the page cache. With keep_full, the float32 vectors are stored
+    as well and search(..., rescore=n) re-scores the best n candidates
+    exactly; only the pages of those rows are read.
+
+    search has the signature of a FAISS index: inner products (metric 'ip',
+    higher is better) or squared L2 distances (metric 'l2', lower is better)
+    and row numbers, best first.
+
+    Example:
+        >>> QuantizedVectors.build('data/vectors', embeddings, mode='int8', keep_full=True)
+        >>> store = QuantizedVectors('data/vectors')
+        >>> distances, rows = store.search(query_vectors, k=5, rescore=50)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'vectors.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != STORE_VERSION:
+            raise ValueError(f"{path} is a version {self.meta['version']} vector store, "
+                             f"expected version {STORE_VERSION}; rebuild it")
+
+        self.mode, self.metric = self.meta['mode'], self.meta['metric']
+        self.rows, self.dim = self.meta['rows'], self.meta['dim']
+        width = self.meta['subspaces'] if self.mode == 'pq' else self.dim
+        self.codes = self._map('codes.bin', CODE_DTYPES[self.mode], (self.rows, width))
+        self.sqnorms = self._map('sqnorms.f32', np.float32, (self.rows,))
+        self.full = self._map('full.f32', np.float32, (self.rows, self.dim)) if self.meta['full'] else None
+        if self.mode in ('int8', 'pq'):
+            with np.load(os.path.join(path, 'params.npz')) as params:
+                self.params = dict(params)
+
+    def _map(self, name, dtype, shape):
+        if not self.rows:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode='r', shape=shape)
+
+    @classmethod
+    def build(cls, path, vectors, mode=VECTOR_MODE, metric='ip', keep_full=False):
+        """Write vectors to a store in path with the given mode and metric"""
+        if mode not in MODES:
+            raise ValueError(f"Unknown vector mode {mode!r}, expected one of {', '.join(MODES)}")
+        if metric not in ('ip', 'l2'):
+            raise ValueError(f"Unknown metric {metric!r}, expected 'ip' or 'l2'")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        rows, dim = vectors.shape
+        os.makedirs(path, exist_ok=True)
+        meta = {'version': STORE_VERSION, 'mode': mode, 'metric': metric, 'rows': rows, 'dim': dim,
+                'full': keep_full}
+
+        params = {}
+        if mode in ('float32', 'float16'):
+            codes = vectors.astype(CODE_DTYPES[mode])
+            decoded = codes.astype(np.float32)
+        elif mode == 'int8':
+            low = vectors.min(axis=0) if rows else np.zeros(dim, dtype=np.float32)
+            scale = np.maximum(vectors.max(axis=0) - low, 1e-12) / 255 if rows else np.ones(dim, dtype=np.float32)
+            codes = np.clip(np.rint((vectors - low) / scale), 0, 255).astype(np.uint8)
+            decoded = low + codes * scale
+            params = {'low': low.astype(np.float32), 'scale': scale.astype(np.float32)}
+        else:
+            subspaces = meta['subspaces'] = pq_subspaces(dim)
+            parts = vectors.reshape(rows, subspaces, dim // subspaces)
+            sample = np.random.default_rng(0).permutation(rows)[:PQ_TRAIN_ROWS]
+            centroids = np.stack([kmeans(parts[sample, m], min(PQ_CENTROIDS, rows)) for m in range(subspaces)])
+            codes = np.stack([nearest_centroids(parts[:, m], centroids[m]) for m in range(subspaces)],
+                             axis=1).astype(np.uint8)
+            decoded = centroids[np.arange(subspaces), codes].reshape(rows, dim)
+            params = {'centroids': centroids.astype(np.float32)}
+
+        write_array(os.path.join(path, 'codes.bin'), codes)
+        # Norms of the stored (decoded) vectors, for L2 distances from inner products
+        write_array(os.path.join(path, 'sqnorms.f32'), (decoded ** 2).sum(axis=1).astype(np.float32))
+        if keep_full:
+            write_array(os.path.join(path, 'full.f32'), vectors)
+        if params:
+            np.savez(os.path.join(path, 'params.tmp.npz'), **params)
+            os.replace(os.path.join(path, 'params.tmp.npz'), os.path.join(path, 'params.npz'))
+        # The metadata goes last: a store is only opened once its files are complete
+        with open(os.path.join(path, 'vectors.json.tmp'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(path, 'vectors.json.tmp'), os.path.join(path, 'vectors.json'))
+        return cls(path)
+
+    @property
+    def nbytes(self):
+        """Bytes searches read: the codes, norms and quantization parameters, not the float32 copy"""
+        params = sum(array.nbytes for array in self.params.values()) if self.mode in ('int8', 'pq') else 0
+        return self.codes.nbytes + self.sqnorms.nbytes + params
+
+    def _inner_products(self, queries, start, end):
+        """(queries, end - start) inner products of the queries with the stored rows start:end"""
+        codes = self.codes[start:end]
+        if self.mode == 'pq':
+            centroids = self.params['centroids']
+            subspaces = centroids.shape[0]
+            # Asymmetric distance: a table of query-centroid products per subspace, summed over the codes
+            tables = np.einsum('qmd,mcd->qmc', queries.reshape(len(queries), subspaces, -1), centroids)
+            scores = np.zeros((len(queries), len(codes)), dtype=np.float32)
+            for m in range(subspaces):
+                scores += tables[:, m, codes[:, m]]
+            return scores
+        if self.mode == 'int8':
+            return (queries * self.params['scale']) @ codes.astype(np.float32).T + (queries @ self.params['low'])[:, None]
+        return queries @ codes.astype(np.float32).T
+
+    def _rank(self, queries, inner_products, sqnorms):
+        """Scores to report, and keys that sort best first"""
+        if self.metric == 'ip':
+            return inner_products, -inner_products
+        distances = (queries ** 2).sum(axis=1)[:, None] - 2 * inner_products + sqnorms
+        return distances, distances
+
+    def search(self, queries, k, rescore=0):
+        """
+        (scores, rows) of the k best rows for each query, as (queries, k)
+        arrays. With rescore and a float32 copy, the best max(k, rescore)
+        candidates are re-scored with the exact vectors.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, self.rows)
+        inner_products = np.concatenate([self._inner_products(queries, start, start + BLOCK_ROWS)
+                                         for start in range(0, self.rows, BLOCK_ROWS)], axis=1) \
+            if self.rows else np.empty((len(queries), 0), dtype=np.float32)
+        scores, keys = self._rank(queries, inner_products, self.sqnorms[None])
+
+        candidates = min(max(k, rescore if self.full is not None else 0), self.rows)
+        rows = np.argpartition(keys, candidates - 1, axis=1)[:, :candidates] if candidates else \
+            np.empty((len(queries), 0), dtype=np.int64)
+        if candidates > k:
+            exact = np.stack([self.full[row] for row in rows])
+            scores, keys = self._rank(queries, np.einsum('qd,qcd->qc', queries, exact), (exact ** 2).sum(axis=2))
+        else:
+            scores, keys = np.take_along_axis(scores, rows, 1), np.take_along_axis(keys, rows, 1)
+
+        order = np.argsort(keys, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(scores, order, 1), np.take_along_axis(rows, order, 1)
+
+    def __len__(self):
+        return self.rows
@@ -1,8 +1,8 @@
 import os
 
-if not os.getenv('ENV_STATUS') == '1':
-    import utils  # This loads vars, do not remove
 from model.claude import *
+from preprocessing.manifest import PreprocessManifest
+from scrapper.manifest import manifest_path
 
 
 def run_rag_claude(rebuild=False, index_name="claude_index", chunked_dir=''):
@@ -12,23 +12,31 @@ def run_rag_claude(rebuild=False, index_name="claude_index", chunked_dir=''):
     Args:
         rebuild (bool): Force rebuild the index if True
         index_name (str): Name of the index directory
-        chunked_dir (str): Directory containing chunked HTML files
+        chunked_dir (str): Directory containing the chunk store
     """
 
     if not chunked_dir:
         chunked_dir = os.getenv('CHUNKDATA_DIR')
+    manifest = PreprocessManifest(manifest_path(chunked_dir, 'preprocess_manifest.json'), chunked_dir)
 
     # Check if we need to build/rebuild the index
     if rebuild or not index_exists(index_name):
-        # Read all chunks from the HTML files
-        print("Reading chunked HTML files...")
-        chunks = read_chunked_html(chunked_dir)
+        # Read all chunks from the chunk store
+        print("Reading chunk store...")
+        chunks = read_chunk_records(chunked_dir)
         print(f"Found {len(chunks)} chunks across all files")
 
         # Build the RAG index
-        print("Building RAG index with MPS acceleration...")
+        print("Building RAG index...")
         index = build_rag_index(chunks, index_name=index_name)
+        manifest.mark_indexed()
         print("Index built successfully!")
+    elif any(manifest.pending_changes()):
+        # Only the chunk files preprocessing changed since the last build are re-indexed
+        changed, deleted = manifest.pending_changes()
+        print(f"Updating index {index_name}: {len(changed)} changed and {len(deleted)} removed chunk files")
+        update_rag_index(chunked_dir, changed, deleted, index_name=index_name)
+        manifest.mark_indexed()
     else:
         print(f"Using existing index from {index_name}")
 
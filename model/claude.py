@@ -1,54 +1,68 @@
 import os
-from bs4 import BeautifulSoup
+from functools import partial
 from llama_index.core import Document, Settings
 from llama_index.core import VectorStoreIndex
 from llama_index.core import StorageContext, load_index_from_storage
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.llms.anthropic import Anthropic
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from preprocessing.chunkstore import read_chunk_records, chunk_source
+from embeddings.llama import CachedEmbedding, EncoderEmbedding
+from embeddings.backends import get_encoder, select_device, available_backends
+from embeddings.parallel import ParallelEncoder, resolve_embed_workers
 
 
-def read_chunked_html(chunked_dir):
+def index_exists(index_name):
     """
-    Reads chunked HTML files and extracts the individual chunks.
-    Returns a list of tuples containing (filename, chunk_text).
+    Check if an index already exists at the specified path.
     """
-    all_chunks = []
-
-    for filename in os.listdir(chunked_dir):
-        if filename.startswith('chunked_') and filename.endswith('.html'):
-            file_path = os.path.join(chunked_dir, filename)
-            original_filename = filename.replace('chunked_', '', 1)
-
-            with open(file_path, 'r', encoding='utf-8') as file:
-                html_content = file.read()
+    return os.path.exists(index_name) and os.path.isdir(index_name) and len(os.listdir(index_name)) > 0
 
-            # Parse the HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
 
-            # Extract each chunk (paragraph) from the HTML
-            chunk_elements = soup.find_all('p')
+EMBEDDING_MODEL = "BAAI/bge-small-en"
 
-            for chunk in chunk_elements:
-                chunk_text = chunk.get_text(strip=True)
-                if chunk_text:  # Only add non-empty chunks
-                    # Store as tuple of (source_file, chunk_text)
-                    all_chunks.append((original_filename, chunk_text))
 
-    return all_chunks
+def embedding_model(workers=1):
+    """
+    bge-small-en on the backend and device embeddings.backends picks: PyTorch
+    on CUDA, MPS or the CPU, or ONNX Runtime (see EMBEDDING_BACKEND).
+    On CPU with workers > 1, chunks are embedded by that many worker
+    processes (see embeddings.parallel); close() the model to stop them.
+    """
+    if not available_backends(EMBEDDING_MODEL):
+        raise ImportError("No embedding backend is installed: install torch and transformers "
+                          "(or onnxruntime and transformers, with torch to export the ONNX graph)")
+    if workers > 1 and select_device() == 'cpu':
+        return EncoderEmbedding(ParallelEncoder(partial(get_encoder, EMBEDDING_MODEL, device='cpu'), workers))
+    return EncoderEmbedding(get_encoder(EMBEDDING_MODEL))
 
 
-def index_exists(index_name):
+def chunk_document(record):
     """
-    Check if an index already exists at the specified path.
+    Document for a chunk store record, identified by the chunk ID. The section
+    breadcrumb and page URL are shown to the LLM as a short citation, and the
+    section's outbound links let it point to a relevant page; only the section
+    is embedded. Pages holding a near-duplicate of the chunk are kept as
+    aliases. Metadata values are flat strings so retrieval can filter on them.
     """
-    return os.path.exists(index_name) and os.path.isdir(index_name) and len(os.listdir(index_name)) > 0
+    return Document(
+        id_=record['id'],
+        text=record['text'],
+        metadata={
+            "source": record['source'],
+            "url": record.get('url') or "",
+            "section": " > ".join(record.get('headings', [])),
+            "links": " ".join(record.get('links', [])),
+            "aliases": " ".join(alias['url'] or alias['source'] for alias in record.get('aliases', [])),
+        },
+        excluded_embed_metadata_keys=["source", "url", "links", "aliases"],
+        excluded_llm_metadata_keys=["source", "aliases"],
+    )
 
 
 def build_rag_index(chunks, index_name="my_rag_index"):
     """
-    Builds a RAG index using LlamaIndex from the extracted chunks.
-    Uses Claude API for generation and MPS for GPU acceleration.
+    Builds a RAG index using LlamaIndex from chunk store records.
+    Uses Claude API for generation and embedding_model() for embeddings.
     """
     # Initialize Claude LLM
     llm = Anthropic(
@@ -57,32 +71,20 @@ def build_rag_index(chunks, index_name="my_rag_index"):
         temperature=0.2,
     )
 
-    # Use HuggingFace embeddings with MPS acceleration
-    embed_model = HuggingFaceEmbedding(
-        model_name="BAAI/bge-small-en",
-        device="mps",  # Use Metal Performance Shaders on Apple Silicon
-        embed_batch_size=16  # Optimize batch size for MPS
-    )
+    # Chunks embedded before come from the cache; the others are embedded in this process, or by the
+    # worker pool of embeddings.parallel when EMBED_WORKERS is set above 1 (or to 0, one per core)
+    embed_model = CachedEmbedding(embedding_model(resolve_embed_workers()), os.getenv('EMBEDDING_CACHE_DIR'))
 
     # Configure global settings for LLM and embedding model
     Settings.llm = llm
     Settings.embed_model = embed_model
 
-    # Create Documents for LlamaIndex
-    documents = []
-
-    for source_file, chunk_text in chunks:
-        # Create a Document object with metadata
-        doc = Document(
-            text=chunk_text,
-            metadata={
-                "source": source_file,
-            }
-        )
-        documents.append(doc)
-
-    # Build the index
-    print("Indexing documents with MPS acceleration...")
+    # Create Documents for LlamaIndex, with each chunk's section and links as metadata
+    documents = [chunk_document(record) for record in chunks]
+
+    # Build the index. LlamaIndex's default store keeps float32 vectors: embeddings.quantized stores are
+    # written once, while update_rag_index inserts and deletes documents in place
+    print("Indexing documents...")
     index = VectorStoreIndex.from_documents(
         documents,
         show_progress=True  # Show progress bar for indexing
@@ -90,7 +92,45 @@ def build_rag_index(chunks, index_name="my_rag_index"):
 
     # Save the index for later use
     index.storage_context.persist(persist_dir=index_name)
+    embed_model.report()
+    embed_model.close()
+
+    return index
+
+
+def update_rag_index(chunked_dir, changed, deleted, index_name="my_rag_index"):
+    """
+    Updates a saved index in place with the chunk files that changed since it
+    was built. The chunk store holds one chunk per group of near-duplicates,
+    so a chunk of an unchanged page can appear or disappear with a change
+    elsewhere: documents of changed and deleted pages, and those no longer in
+    the store, are dropped; then every store chunk missing from the index,
+    or whose page or aliases changed, is inserted.
+    """
+    embed_model = CachedEmbedding(embedding_model(resolve_embed_workers()), os.getenv('EMBEDDING_CACHE_DIR'))
+    Settings.embed_model = embed_model
+
+    storage_context = StorageContext.from_defaults(persist_dir=index_name)
+    index = load_index_from_storage(storage_context)
+
+    stale_sources = {chunk_source(filename) for filename in changed + deleted}
+    records = read_chunk_records(chunked_dir)
+    stale_ids = {record['id'] for record in records if record['source'] in stale_sources
+                 or any(alias['source'] in stale_sources for alias in record.get('aliases', []))}
+    store_ids = {record['id'] for record in records}
+
+    for doc_id, info in list(index.ref_doc_info.items()):
+        if doc_id not in store_ids or doc_id in stale_ids or info.metadata.get("source") in stale_sources:
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
 
+    indexed = set(index.ref_doc_info)
+    for record in records:
+        if record['id'] not in indexed:
+            index.insert(chunk_document(record))
+
+    index.storage_context.persist(persist_dir=index_name)
+    embed_model.report()
+    embed_model.close()
     return index
 
 
@@ -105,12 +145,8 @@ def create_chat_engine(index_name="my_rag_index"):
         temperature=0.2,
     )
 
-    # Use HuggingFace embeddings with MPS acceleration
-    embed_model = HuggingFaceEmbedding(
-        model_name="BAAI/bge-small-en",
-        device="mps",
-        embed_batch_size=16
-    )
+    # Queries are embedded with the same model as the chunks
+    embed_model = embedding_model()
 
     # Configure global settings for LLM and embedding model
     Settings.llm = llm
@@ -141,7 +177,7 @@ RESPONSE STYLE:
 
 DECLINING INSTRUCTIONS:
 - ALWAYS decline non-immigration or non-Northeastern questions in 10 words or less
-- When declining, extract and include a relevant URL from your context if available
+- When declining, include a relevant URL from the url or links of your context if available
 - Example: "Not my thing! Try the Housing site: [URL]"
 - Keep declines short, helpful, and to the point
 
@@ -2,46 +2,15 @@ import os
 import argparse
 
 os.environ['TOKENIZERS_PARALLELISM'] = 'false'
-if not os.getenv('ENV_STATUS') == '1':
-    import utils  # This loads vars, do not remove
+import utils
 
-from bs4 import BeautifulSoup
 from llama_index.core import Document, Settings
 from llama_index.core import VectorStoreIndex
 from llama_index.core import StorageContext, load_index_from_storage
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.llms.anthropic import Anthropic
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-
-
-def read_chunked_html(chunked_dir):
-    """
-    Reads chunked HTML files and extracts the individual chunks.
-    Returns a list of tuples containing (filename, chunk_text).
-    """
-    all_chunks = []
-
-    for filename in os.listdir(chunked_dir):
-        if filename.startswith('chunked_') and filename.endswith('.html'):
-            file_path = os.path.join(chunked_dir, filename)
-            original_filename = filename.replace('chunked_', '', 1)
-
-            with open(file_path, 'r', encoding='utf-8') as file:
-                html_content = file.read()
-
-            # Parse the HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Extract each chunk (paragraph) from the HTML
-            chunk_elements = soup.find_all('p')
-
-            for chunk in chunk_elements:
-                chunk_text = chunk.get_text(strip=True)
-                if chunk_text:  # Only add non-empty chunks
-                    # Store as tuple of (source_file, chunk_text)
-                    all_chunks.append((original_filename, chunk_text))
-
-    return all_chunks
+from preprocessing.chunkstore import read_chunks
 
 
 def index_exists(index_name):
@@ -173,12 +142,14 @@ First message: "Hey! I'm your Northeastern OGS buddy. What immigration stuff can
 
 # Example usage
 if __name__ == "__main__":
+    utils.import_settings()  # This loads vars, do not remove
+
     # Set up argument parsing
     parser = argparse.ArgumentParser(description="RAG Chat System")
     parser.add_argument("--rebuild", action="store_true", help="Force rebuild the index")
     parser.add_argument("--index-name", default="my_rag_index", help="Name of the index directory")
     parser.add_argument("--chunked-dir", default='/Users/nmnsnghl/Work/Github/UniQbot-rag/data/chunked',
-                        help="Directory containing chunked HTML files")
+                        help="Directory containing the chunk store")
     args = parser.parse_args()
 
     index_name = args.index_name
@@ -186,9 +157,9 @@ if __name__ == "__main__":
 
     # Check if we need to build/rebuild the index
     if args.rebuild or not index_exists(index_name):
-        # Read all chunks from the HTML files
-        print("Reading chunked HTML files...")
-        chunks = read_chunked_html(chunked_dir)
+        # Read all chunks from the chunk store
+        print("Reading chunk store...")
+        chunks = read_chunks(chunked_dir)
         print(f"Found {len(chunks)} chunks across all files")
 
         # Build the RAG index
@@ -1,12 +1,9 @@
 import numpy as np
-import faiss
 import os
-from sentence_transformers import SentenceTransformer
+from functools import cached_property
 from openai import OpenAI
-import gc
 import os
-import tiktoken  
-from bs4 import BeautifulSoup
+from embeddings.bundle import RetrievalBundle
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 class RAGChatbot:
@@ -14,19 +11,19 @@ class RAGChatbot:
                  openai_api_key=None,
                  model_name="gpt-3.5-turbo",
                  embedding_model_name="sentence-transformers/all-MiniLM-L6-v2",
-                 faiss_index_path="/Users/sudarshanp/Desktop/shreya_bot/data/faiss_index-shreya.index",
-                 chunks_folder="/Users/sudarshanp/Desktop/shreya_bot/data/chunks",
+                 bundle_path="/Users/sudarshanp/Desktop/shreya_bot/data/bundle",
+                 rescore=50,  # Candidates re-scored with the float32 vectors
                  max_chunks=5,  # Default number of chunks to retrieve
                  max_context_tokens=12000):  # Reserve tokens for context
         """
-        Initialize the RAG chatbot with OpenAI's GPT and FAISS index.
+        Initialize the RAG chatbot with OpenAI's GPT and the retrieval bundle.
         
         Args:
             openai_api_key: Your OpenAI API key
             model_name: The GPT model to use ("gpt-3.5-turbo")
             embedding_model_name: The name of the sentence transformer model for encoding queries
-            faiss_index_path: Path to the pre-built FAISS index
-            chunks_folder: Path to the folder containing chunked HTML files
+            bundle_path: Path to the retrieval bundle built by embeddings_with_SentBasedChunks.py
+            rescore: Number of best candidates re-scored exactly when the vectors are quantized
             max_chunks: Maximum number of chunks to retrieve
             max_context_tokens: Maximum tokens to use for context
         """
@@ -40,35 +37,33 @@ class RAGChatbot:
         self.model_name = model_name
         self.max_chunks = max_chunks
         self.max_context_tokens = max_context_tokens
+        self.embedding_model_name = embedding_model_name
+        self.rescore = rescore
         
-        # to calculate token counts
-        self.tokenizer = tiktoken.encoding_for_model("gpt-3.5-turbo")
-        
-        # Load the FAISS index
-        print(f"Loading FAISS index from {faiss_index_path}...")
-        self.index = faiss.read_index(faiss_index_path)
-        
-        # Load the chunks from HTML files
-        print(f"Loading text chunks from {chunks_folder}...")
-        # Load chunked HTML files
-        files = [os.path.join(chunks_folder, f) for f in os.listdir(chunks_folder)]
-        self.chunks = []
-        for file in files:
-            with open(file, "r", encoding="utf-8") as f:
-                soup = BeautifulSoup(f, "html.parser")
-                # Each paragraph in the chunked HTML is considered a separate chunk
-                self.chunks.extend([p.get_text() for p in soup.find_all('p')])
+        # Memory-map the bundle of vectors, chunks and token counts; nothing is parsed
+        # until a chunk is retrieved, and processes serving it share one copy
+        print(f"Loading retrieval bundle from {bundle_path}...")
+        self.bundle = RetrievalBundle(bundle_path)
+        self.index = self.bundle.vectors
+        self.chunks = self.bundle.chunks
         
         print(f"Loaded {len(self.chunks)} chunks.")
+        print("RAG Chatbot initialization complete!")
+    
+    @cached_property
+    def embedding_model(self):
+        """The query encoder, loaded with the first query"""
+        from sentence_transformers import SentenceTransformer
         
-        # Load the embedding model for query encoding
-        print(f"Loading embedding model {embedding_model_name}...")
-        self.embedding_model = SentenceTransformer(embedding_model_name)
-        
-        # Run garbage collection
-        gc.collect()
+        print(f"Loading embedding model {self.embedding_model_name}...")
+        return SentenceTransformer(self.embedding_model_name)
+    
+    @cached_property
+    def tokenizer(self):
+        """Tokenizer of the GPT model, to count prompt tokens"""
+        import tiktoken
         
-        print("RAG Chatbot initialization complete!")
+        return tiktoken.encoding_for_model("gpt-3.5-turbo")
     
     def encode_query(self, query):
         """Encode the query using the embedding model"""
@@ -79,7 +74,7 @@ class RAGChatbot:
         return len(self.tokenizer.encode(text))
     
     def retrieve_relevant_chunks(self, query_embedding, k=None):
-        """Retrieve the k most relevant chunks from the FAISS index"""
+        """Retrieve the k most relevant chunks from the retrieval bundle"""
         if k is None:
             k = self.max_chunks
             
@@ -90,14 +85,17 @@ class RAGChatbot:
         query_embedding = query_embedding.reshape(1, -1).astype(np.float32)
         
         # Search the index
-        distances, indices = self.index.search(query_embedding, k_search)
+        distances, indices = self.index.search(query_embedding, k_search, rescore=self.rescore)
         
-        # Return the retrieved chunks with their relevance scores
-        retrieved_chunks = [self.chunks[idx] for idx in indices[0]]
-        return retrieved_chunks, distances[0]
+        # Return the retrieved chunks with their relevance scores and token counts
+        retrieved_chunks = [self.chunks[int(idx)]['text'] for idx in indices[0]]
+        return retrieved_chunks, distances[0], self.bundle.tokens[indices[0]]
     
-    def filter_chunks_by_relevance_and_tokens(self, chunks, distances, similarity_threshold=0.6):
-        """Filter chunks by relevance and token count"""
+    def filter_chunks_by_relevance_and_tokens(self, chunks, distances, similarity_threshold=0.6, tokens=None):
+        """Filter chunks by relevance and token count (counted here unless given)"""
+        if tokens is None:
+            tokens = [self.num_tokens(chunk) for chunk in chunks]
+        
         # Convert distances to similarity scores (assuming L2 distance)
         # For L2 distance, smaller values are more similar
         max_distance = max(distances)
@@ -108,9 +106,9 @@ class RAGChatbot:
         filtered_distances = []
         
         # First filter by similarity
-        for chunk, dist, sim in zip(chunks, distances, similarity_scores):
+        for chunk, dist, sim, count in zip(chunks, distances, similarity_scores, tokens):
             if sim >= similarity_threshold:
-                filtered_chunks.append(chunk)
+                filtered_chunks.append((chunk, count))
                 filtered_distances.append(dist)
         
         # Then filter by token count
@@ -121,8 +119,7 @@ class RAGChatbot:
         # Sort by distance (ascending) so more relevant chunks come first
         sorted_items = sorted(zip(filtered_chunks, filtered_distances), key=lambda x: x[1])
         
-        for chunk, dist in sorted_items:
-            chunk_tokens = self.num_tokens(chunk)
+        for (chunk, chunk_tokens), dist in sorted_items:
             if total_tokens + chunk_tokens <= self.max_context_tokens:
                 final_chunks.append(chunk)
                 final_distances.append(dist)
@@ -191,11 +188,11 @@ class RAGChatbot:
         query_embedding = self.encode_query(query)
         
         # Step 2: Retrieve more relevant chunks than we'll ultimately use
-        candidate_chunks, distances = self.retrieve_relevant_chunks(query_embedding, k=self.max_chunks * 3)
+        candidate_chunks, distances, tokens = self.retrieve_relevant_chunks(query_embedding, k=self.max_chunks * 3)
         
         # Step 3: Filter chunks by relevance and token count
         filtered_chunks, filtered_distances = self.filter_chunks_by_relevance_and_tokens(
-            candidate_chunks, distances
+            candidate_chunks, distances, tokens=tokens
         )
         
         # Step 4: Format the messages with the context and query
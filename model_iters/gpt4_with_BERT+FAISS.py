@@ -1,27 +1,26 @@
 import numpy as np
-import faiss
 import os
-from sentence_transformers import SentenceTransformer
+from functools import cached_property
 from openai import OpenAI
-import gc
+from embeddings.bundle import RetrievalBundle
 
 class RAGChatbot:
     def __init__(self, 
                  openai_api_key=None,
                  model_name="gpt-4-turbo",
                  embedding_model_name="sentence-transformers/all-MiniLM-L6-v2",
-                 faiss_index_path="data/faiss_index.index",
-                 chunks_path="data/chunks.npy",
+                 bundle_path="data/bundle",
+                 rescore=50,  # Candidates re-scored with the float32 vectors
                  TOKENIZERS_PARALLELISM=False):
         """
-        Initialize the RAG chatbot with OpenAI's GPT-4 and FAISS index.
+        Initialize the RAG chatbot with OpenAI's GPT-4 and the retrieval bundle.
         
         Args:
             openai_api_key: Your OpenAI API key
             model_name: The GPT model to use (e.g., "gpt-4-turbo", "gpt-3.5-turbo")
             embedding_model_name: The name of the sentence transformer model for encoding queries
-            faiss_index_path: Path to the pre-built FAISS index
-            chunks_path: Path to the numpy array of text chunks
+            bundle_path: Path to the retrieval bundle built by embeddings_with_SentBasedChunks.py
+            rescore: Number of best candidates re-scored exactly when the vectors are quantized
         """
         # Set up OpenAI client
         if openai_api_key is None:
@@ -31,37 +30,39 @@ class RAGChatbot:
         
         self.client = OpenAI(api_key=openai_api_key)
         self.model_name = model_name
+        self.embedding_model_name = embedding_model_name
+        self.rescore = rescore
         
-        # Load the FAISS index and text chunks
-        print(f"Loading FAISS index from {faiss_index_path}...")
-        self.index = faiss.read_index(faiss_index_path)
-        
-        print(f"Loading text chunks from {chunks_path}...")
-        self.chunks = np.load(chunks_path, allow_pickle=True)
-        
-        # Load the embedding model for query encoding
-        print(f"Loading embedding model {embedding_model_name}...")
-        self.embedding_model = SentenceTransformer(embedding_model_name)
-        
-        # Run garbage collection
-        gc.collect()
+        # Memory-map the bundle of vectors and chunks; nothing is parsed until a chunk is retrieved
+        print(f"Loading retrieval bundle from {bundle_path}...")
+        self.bundle = RetrievalBundle(bundle_path)
+        self.index = self.bundle.vectors
+        self.chunks = self.bundle.chunks
         
         print("RAG Chatbot initialization complete!")
     
+    @cached_property
+    def embedding_model(self):
+        """The query encoder, loaded with the first query"""
+        from sentence_transformers import SentenceTransformer
+        
+        print(f"Loading embedding model {self.embedding_model_name}...")
+        return SentenceTransformer(self.embedding_model_name)
+    
     def encode_query(self, query):
         """Encode the query using the embedding model"""
         return self.embedding_model.encode([query])[0]
     
     def retrieve_relevant_chunks(self, query_embedding, k=5):
-        """Retrieve the k most relevant chunks from the FAISS index"""
+        """Retrieve the k most relevant chunks from the retrieval bundle"""
         # Ensure the query embedding is in the right shape and type
         query_embedding = query_embedding.reshape(1, -1).astype(np.float32)
         
         # Search the index
-        distances, indices = self.index.search(query_embedding, k)
+        distances, indices = self.index.search(query_embedding, k, rescore=self.rescore)
         
         # Return the retrieved chunks with their relevance scores
-        retrieved_chunks = [self.chunks[idx] for idx in indices[0]]
+        retrieved_chunks = [self.chunks[int(idx)]['text'] for idx in indices[0]]
         return retrieved_chunks, distances[0]
     
     def format_messages(self, query, context_chunks, distances=None):
@@ -0,0 +1,114 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+
+# Block-level tags kept by clean_html and comments; the markup between two of them is one block
+BLOCK_TAG_PATTERN = re.compile(r'</?(?:p|div|h[1-6])>|<!--.*?-->', re.DOTALL)
+HEADING_TAG_PATTERN = re.compile(r'<h[1-6]>')
+
+# Blocks found on more than this share of the pages are dropped before chunking (1 disables)
+BOILERPLATE_SHARE = float(os.getenv('BOILERPLATE_SHARE', 0.5))
+# With fewer pages, a block two of them happen to share is not evidence of a site template
+MIN_PAGES = 5
+BOILERPLATE_NAME = 'boilerplate.json'
+
+
+def block_fingerprint(markup):
+    return hashlib.sha1(markup.strip().encode('utf-8')).hexdigest()[:16]
+
+
+def page_blocks(cleaned_html):
+    """
+    (start, end, fingerprint, section, heading) of every non-empty block of
+    clean_html output. section numbers the heading sections the way
+    split_sections cuts them, and heading is True for the text of the
+    heading that opens a section.
+    """
+    blocks, position, section, heading = [], 0, 0, False
+    boundaries = [(match.start(), match.end(), HEADING_TAG_PATTERN.fullmatch(match.group()))
+                  for match in BLOCK_TAG_PATTERN.finditer(cleaned_html)]
+    boundaries.append((len(cleaned_html), len(cleaned_html), None))
+
+    for start, end, opens_heading in boundaries:
+        markup = cleaned_html[position:start]
+        if markup.strip():
+            blocks.append((position, start, block_fingerprint(markup), section, heading))
+        if opens_heading:
+            section += 1
+        heading = bool(opens_heading)
+        position = end
+    return blocks
+
+
+def detect_boilerplate(pages, share=BOILERPLATE_SHARE, min_pages=MIN_PAGES):
+    """
+    Fingerprints of the blocks that appear on more than `share` of the pages,
+    given as an iterable of clean_html output. Navigation menus, cookie
+    banners and footers come out of the site template identically on every
+    page, so their blocks hash the same wherever they appear.
+
+    Example:
+        >>> boilerplate = detect_boilerplate(read_pages('data/cleaned/', files))
+        >>> strip_boilerplate(cleaned_html, boilerplate)
+    """
+    page_count, frequency = 0, Counter()
+    for cleaned_html in pages:
+        page_count += 1
+        frequency.update({block[2] for block in page_blocks(cleaned_html)})
+
+    if page_count < min_pages:
+        return frozenset()
+    return frozenset(fingerprint for fingerprint, count in frequency.items() if count > share * page_count)
+
+
+def boilerplate_blocks(cleaned_html, boilerplate):
+    """
+    (start, end, section) of the blocks of a page to drop: those in
+    boilerplate, except a repeated heading whose section keeps other content.
+    """
+    blocks = page_blocks(cleaned_html)
+    kept_sections = {section for _, _, fingerprint, section, heading in blocks
+                     if not heading and fingerprint not in boilerplate}
+    return [(start, end, section) for start, end, fingerprint, section, heading in blocks
+            if fingerprint in boilerplate and not (heading and section in kept_sections)]
+
+
+def strip_boilerplate(cleaned_html, boilerplate):
+    """clean_html output without its boilerplate blocks; block tags stay, so sections are unchanged"""
+    if not boilerplate:
+        return cleaned_html
+
+    pieces, position = [], 0
+    for start, end, _ in boilerplate_blocks(cleaned_html, boilerplate):
+        pieces.append(cleaned_html[position:start])
+        position = end
+    pieces.append(cleaned_html[position:])
+    return ''.join(pieces)
+
+
+def boilerplate_digest(boilerplate):
+    """Short digest of a boilerplate set; chunks built without another set must be rebuilt"""
+    return hashlib.sha256('\n'.join(sorted(boilerplate)).encode('utf-8')).hexdigest()[:16]
+
+
+def read_pages(input_dir, files):
+    for filename in files:
+        with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
+            yield f.read()
+
+
+def save_boilerplate(path, boilerplate):
+    """Write the boilerplate set, for the streaming pipeline which never sees the whole corpus at once"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sorted(boilerplate), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_boilerplate(path):
+    if not os.path.isfile(path):
+        return frozenset()
+    with open(path, 'r', encoding='utf-8') as f:
+        return frozenset(json.load(f))
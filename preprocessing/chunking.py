@@ -1,76 +1,278 @@
 import os
-from bs4 import BeautifulSoup
-import nltk
-from nltk.tokenize import sent_tokenize
-from llama_index.core.text_splitter import TokenTextSplitter
+import re
+import html
+import math
+import time
+from functools import lru_cache
+from urllib.parse import urljoin, urlparse
+from utils.parsers import get_parser
+from preprocessing.parallel import map_files, report_timings
+from preprocessing.chunkstore import chunk_record, write_chunk_file
+from preprocessing.boilerplate import page_blocks, boilerplate_blocks, strip_boilerplate, read_pages
+from scrapper.urls import canonicalize_url
 
-# Ensure required NLTK package is downloaded
-nltk.download('punkt')
+# Bump when a change to the chunking logic alters its output, so chunk files get rebuilt
+CHUNKER_VERSION = 5
+# Token budget of a chunk and the tokens of trailing sentences repeated at the start of the next one
+CHUNK_SIZE = int(os.getenv('CHUNK_TOKENS', 256))
+CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', 30))
 
 
-def extract_text_from_html(cleaned_html):
+# Comments, doctype and the few simple tags that clean_html keeps
+MARKUP_PATTERN = re.compile(r'<!--.*?-->|<[^>]*>', re.DOTALL)
+
+
+def extract_text_from_cleaned_html(cleaned_html):
     """
-    Extracts clean text from HTML content.
+    Same text as a parser's text() for clean_html output, without parsing:
+    the cleaned markup only holds simple tags, so splitting on them is enough.
     """
-    soup = BeautifulSoup(cleaned_html, "html.parser")
-    return soup.get_text(separator=" ", strip=True)
+    pieces = (html.unescape(piece).strip() for piece in MARKUP_PATTERN.split(cleaned_html))
+    return " ".join(piece for piece in pieces if piece)
+
+
+# Fallback sentence boundary: end punctuation followed by whitespace and a capital, digit or quote
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=["\'(\[]?[A-Z0-9])')
+
+
+@lru_cache(maxsize=None)
+def sentence_splitter():
+    """
+    'punkt' if NLTK's punkt data is installed locally, else 'regex'. Nothing
+    is downloaded, so chunking works offline; install the data once with
+    `python -m nltk.downloader punkt_tab` for NLTK's sentence boundaries.
+    """
+    import nltk
+
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+        return 'punkt'
+    except LookupError:
+        print("NLTK punkt data is not installed; splitting sentences on punctuation instead")
+        return 'regex'
 
 
 def sentence_based_chunking(text):
     """
     Primary Chunking: Splits text into meaningful sentences using NLTK.
     """
-    return sent_tokenize(text)
+    if sentence_splitter() == 'punkt':
+        from nltk.tokenize import sent_tokenize
+        return sent_tokenize(text)
+    return [sentence for sentence in SENTENCE_END.split(text.strip()) if sentence]
+
+
+def token_based_chunking(sentence, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Secondary Chunking: Splits a single sentence that exceeds the token budget.
+    """
+    from llama_index.core.text_splitter import TokenTextSplitter
+    return TokenTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_text(sentence)
 
 
-def token_based_chunking(sentences, chunk_size=256, chunk_overlap=30):
+def pack_sentences(sentences, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
-    Secondary Chunking: If sentences exceed the token limit, apply token-based chunking.
+    Greedily merges consecutive sentences into chunks of at most chunk_size
+    tokens. Each new chunk starts with the trailing sentences of the previous
+    one that fit in chunk_overlap tokens; sentences longer than the budget
+    are split on their own with token_based_chunking.
     """
-    text_splitter = TokenTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = []
+    chunks, current, current_tokens = [], [], 0
 
     for sentence in sentences:
-        if len(sentence.split()) > chunk_size:  # Check if sentence exceeds token limit
-            chunks.extend(text_splitter.split_text(sentence))
-        else:
-            chunks.append(sentence)
+        tokens = count_tokens(sentence)
+        if tokens > chunk_size:
+            if current:
+                chunks.append(" ".join(text for text, _ in current))
+            chunks.extend(token_based_chunking(sentence, chunk_size, chunk_overlap))
+            current, current_tokens = [], 0
+            continue
+
+        if current and current_tokens + tokens > chunk_size:
+            chunks.append(" ".join(text for text, _ in current))
+            overlap, overlap_tokens = [], 0
+            for text, count in reversed(current):
+                if overlap_tokens + count > chunk_overlap or overlap_tokens + count + tokens > chunk_size:
+                    break
+                overlap.insert(0, (text, count))
+                overlap_tokens += count
+            current, current_tokens = overlap, overlap_tokens
 
+        current.append((sentence, tokens))
+        current_tokens += tokens
+
+    if current:
+        chunks.append(" ".join(text for text, _ in current))
     return chunks
 
 
-def process_files(input_dir, output_dir):
+def chunk_text(text):
     """
-    Reads cleaned HTML files, extracts text, applies chunking, and saves results in HTML format.
+    Splits plain text into sentences and packs them into token-budget chunks.
     """
-    os.makedirs(output_dir, exist_ok=True)
+    return pack_sentences(sentence_based_chunking(text))
 
-    for filename in os.listdir(input_dir):
-        if filename.endswith('.html'):
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, f"chunked_{filename}")  # Save as .html
 
-            with open(input_path, 'r', encoding='utf-8') as file:
-                cleaned_html = file.read()
+# Cleaned markup is cut in front of every heading, so a section is a heading and what follows it
+HEADING_PATTERN = re.compile(r'(?=<h[1-6]>)')
+HEADING_TAG_PATTERN = re.compile(r'<h([1-6])>(.*?)</h\1>', re.DOTALL)
+# clean_html keeps href as the only attribute, always double-quoted
+HREF_PATTERN = re.compile(r'<a href="([^"]*)"')
 
-            # Extract text
-            text = extract_text_from_html(cleaned_html)
 
-            # Apply primary chunking
-            sentence_chunks = sentence_based_chunking(text)
+def split_sections(cleaned_html):
+    """
+    Heading-delimited sections of clean_html output, in page order. Each
+    section is a dict with its text, its heading breadcrumb (the enclosing
+    headings from h1 down to its own) and the hrefs of its links. A heading
+    followed directly by another heading is merged into the next section
+    rather than becoming a chunk of its own.
+    """
+    sections, breadcrumb, pending = [], [], None
+    for part in HEADING_PATTERN.split(cleaned_html):
+        heading = HEADING_TAG_PATTERN.match(part)
+        title = None
+        if heading:
+            level = int(heading.group(1))
+            breadcrumb = [(parent_level, title) for parent_level, title in breadcrumb if parent_level < level]
+            title = extract_text_from_cleaned_html(heading.group(2))
+            if title:
+                breadcrumb.append((level, title))
+
+        text = extract_text_from_cleaned_html(part)
+        if not text:
+            continue
+        section = {'text': text, 'headings': [title for _, title in breadcrumb],
+                   'links': [html.unescape(href) for href in HREF_PATTERN.findall(part)]}
+        if pending:
+            section['text'] = f"{pending['text']} {text}"
+            section['links'] = pending['links'] + section['links']
+            pending = None
+        if text == title:
+            pending = section  # Nothing but the heading
+        else:
+            sections.append(section)
+
+    if pending:
+        sections.append(pending)
+    return sections
+
+
+def chunk_cleaned_html(cleaned_html):
+    """
+    Chunks a cleaned page section by section, so no chunk spans a heading
+    boundary. Each chunk is a dict with its text and its section's headings and links.
+    """
+    return [dict(section, text=chunk) for section in split_sections(cleaned_html) for chunk in chunk_text(section['text'])]
 
-            # Apply secondary chunking where necessary
-            final_chunks = token_based_chunking(sentence_chunks)
 
-            # Format chunks as HTML
-            html_output = "<html><body>\n"
-            html_output += "\n<hr>\n".join(f"<p>{chunk.strip()}</p>" for chunk in final_chunks if chunk.strip())
-            html_output += "\n</body></html>"
+def outbound_links(url, hrefs):
+    """Canonical absolute URLs of a section's hrefs, in order, without duplicates or the page itself"""
+    links = []
+    for href in hrefs:
+        full_url = urljoin(url or '', href)
+        if urlparse(full_url).scheme not in ('http', 'https'):
+            continue
+        link = canonicalize_url(full_url)
+        if link != url and link not in links:
+            links.append(link)
+    return links
 
-            # Save chunked data as HTML
-            with open(output_path, 'w', encoding='utf-8') as file:
-                file.write(html_output)
 
-            print(f"Chunked {filename} successfully!")
+@lru_cache(maxsize=None)
+def tokenizer():
+    """The tokenizer TokenTextSplitter measures chunks with; llama_index is only loaded once chunking starts"""
+    from llama_index.core.utils import get_tokenizer
+    return get_tokenizer()
 
+
+def count_tokens(text):
+    """Token count with the tokenizer TokenTextSplitter measures chunks with"""
+    return len(tokenizer()(text))
+
+
+def chunk_records(filename, url, chunks):
+    """Chunk store records of a page's chunks (as returned by chunk_cleaned_html), in page order"""
+    url = canonicalize_url(url) if url else url
+    chunks = [chunk for chunk in chunks if chunk['text'].strip()]
+    return [chunk_record(filename, url, ordinal, chunk['text'].strip(), count_tokens(chunk['text'].strip()),
+                         chunk.get('headings', []), outbound_links(url, chunk.get('links', [])))
+            for ordinal, chunk in enumerate(chunks)]
+
+
+def chunk_filename(filename):
+    return f"chunked_{os.path.splitext(filename)[0]}.jsonl"
+
+
+def chunk_file(filename, input_dir, output_dir, url=None, boilerplate=frozenset()):
+    input_path = os.path.join(input_dir, filename)
+    output_path = os.path.join(output_dir, chunk_filename(filename))
+
+    with open(input_path, 'r', encoding='utf-8') as file:
+        cleaned_html = strip_boilerplate(file.read(), boilerplate)
+
+    # Pack sentences into token-budget chunks within each heading section
+    final_chunks = chunk_cleaned_html(cleaned_html)
+
+    # Save the chunks as JSON lines for the chunk store
+    write_chunk_file(output_path, chunk_records(filename, url, final_chunks))
+
+
+def process_files(input_dir, output_dir, files=None, workers=1, urls=None, boilerplate=frozenset()):
+    """
+    Reads cleaned HTML files, chunks them section by section, and saves each page's
+    chunks as a JSON-lines chunk file (see preprocessing.chunkstore).
+    If files is given, only those filenames are processed. With workers > 1 the
+    files are chunked in a process pool. urls maps filenames to their page URL.
+    Blocks whose fingerprint is in boilerplate are dropped before chunking.
+    Returns the chunk filenames written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    urls = urls or {}
+
+    filenames = sorted(os.listdir(input_dir)) if files is None else files
+    start, timings = time.perf_counter(), []
+    tasks = ((filename, input_dir, output_dir, urls.get(filename), boilerplate)
+             for filename in filenames if filename.endswith('.html'))
+    for filename, seconds in map_files(chunk_file, tasks, workers):
+        timings.append((filename, seconds))
+        print(f"Chunked {filename} successfully! ({seconds * 1000:.1f} ms)")
+
+    report_timings("Chunked", timings, time.perf_counter() - start, workers)
     print("All cleaned HTML files have been chunked!")
+    return [chunk_filename(filename) for filename, _ in timings]
+
+
+def boilerplate_removal(cleaned_html, boilerplate):
+    """
+    (bytes, chunks) that dropping the boilerplate blocks takes out of a page.
+    Chunks are counted per section from token counts, the way pack_sentences
+    fills them, so no sentence splitting is needed.
+    """
+    removed = {(start, end) for start, end, _ in boilerplate_blocks(cleaned_html, boilerplate)}
+    sections = {}
+    for start, end, _, section, _ in page_blocks(cleaned_html):
+        sections.setdefault(section, []).append((cleaned_html[start:end], (start, end) in removed))
+
+    removed_bytes = removed_chunks = 0
+    for blocks in sections.values():
+        if not any(is_removed for _, is_removed in blocks):
+            continue
+        removed_bytes += sum(len(markup.encode('utf-8')) for markup, is_removed in blocks if is_removed)
+
+        tokens = [(count_tokens(extract_text_from_cleaned_html(markup)), is_removed) for markup, is_removed in blocks]
+        kept_tokens = sum(count for count, is_removed in tokens if not is_removed)
+        total_tokens = sum(count for count, _ in tokens)
+        removed_chunks += math.ceil(total_tokens / CHUNK_SIZE) - math.ceil(kept_tokens / CHUNK_SIZE)
+    return removed_bytes, removed_chunks
+
+
+def report_boilerplate(input_dir, files, boilerplate):
+    """Print how much boilerplate was dropped from the given cleaned pages"""
+    removed_bytes = removed_chunks = 0
+    for cleaned_html in read_pages(input_dir, files):
+        page_bytes, page_chunks = boilerplate_removal(cleaned_html, boilerplate)
+        removed_bytes += page_bytes
+        removed_chunks += page_chunks
+    print(f"Boilerplate: {len(boilerplate)} blocks dropped from {len(files)} pages, "
+          f"{removed_bytes / 1024:.1f} KiB and about {removed_chunks} chunks removed")
@@ -0,0 +1,162 @@
+import os
+import json
+import mmap
+import numpy as np
+from preprocessing.dedup import near_duplicates, DEDUP_THRESHOLD
+
+CHUNK_STORE_NAME = 'chunks.jsonl'
+
+
+def chunk_record(source, url, ordinal, text, tokens, headings=(), links=()):
+    """
+    One chunk as stored: a stable ID, its page and canonical URL, its position
+    in the page, the text and its token count, the heading breadcrumb of its
+    section and the canonical URLs the section links to.
+    """
+    return {'id': f"{source}:{ordinal}", 'source': source, 'url': url, 'ordinal': ordinal,
+            'text': text, 'tokens': tokens, 'headings': list(headings), 'links': list(links)}
+
+
+def write_chunk_file(path, records):
+    """Write one page's chunk records as JSON lines"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, path)
+
+
+def read_chunk_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def chunk_source(chunk_file):
+    """Raw page filename a per-page chunk file was built from ('chunked_index.jsonl' -> 'index.html')"""
+    return chunk_file[len('chunked_'):-len('.jsonl')] + '.html'
+
+
+def chunk_files(chunk_dir):
+    """Per-page chunk files in a chunk directory, in a stable order"""
+    return sorted(f for f in os.listdir(chunk_dir) if f.startswith('chunked_') and f.endswith('.jsonl'))
+
+
+class ChunkStore:
+    """
+    Every chunk of the corpus in one JSON-lines file, with an offset index
+    for random access.
+
+    chunks.jsonl holds one record per line (see chunk_record) and
+    chunks.offsets.npy the byte offset of every line plus the file size,
+    so chunk i is the slice offsets[i]:offsets[i + 1]. Both files are
+    memory-mapped: opening the store reads nothing, and a chunk costs one
+    json.loads of its own line. The store is rebuilt from the per-page
+    chunk files with ChunkStore.build after preprocessing.
+
+    Near-duplicate chunks (see preprocessing.dedup) are stored once: the
+    first one is kept and lists the others' id, source and URL in
+    `aliases`, so they are embedded and indexed a single time.
+
+    Example:
+        >>> store = ChunkStore('data/chunked/chunks.jsonl')
+        >>> store[42]['text'], store[42]['url']
+        >>> texts = store.texts()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = np.load(self.offsets_path(path), mmap_mode='r')
+        self._file = open(path, 'rb')
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self) else b''
+
+    @staticmethod
+    def offsets_path(path):
+        return os.path.splitext(path)[0] + '.offsets.npy'
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.isfile(path) and os.path.isfile(cls.offsets_path(path))
+
+    @classmethod
+    def build(cls, chunk_dir, path=None, threshold=DEDUP_THRESHOLD):
+        """
+        Combine the per-page chunk files of chunk_dir into the store, collapsing
+        chunks that are near-duplicates at the given threshold; returns the chunk count.
+        """
+        path = path or os.path.join(chunk_dir, CHUNK_STORE_NAME)
+        records = [record for filename in chunk_files(chunk_dir)
+                   for record in read_chunk_file(os.path.join(chunk_dir, filename))]
+        canonical = near_duplicates([record['text'] for record in records], threshold)
+
+        aliases = {}
+        for record, first in zip(records, canonical):
+            if records[first] is not record:
+                aliases.setdefault(first, []).append({key: record[key] for key in ('id', 'source', 'url')})
+
+        tmp_path, offsets = path + '.tmp', [0]
+        with open(tmp_path, 'wb') as out:
+            for i, record in enumerate(records):
+                if canonical[i] != i:
+                    continue
+                record['aliases'] = aliases.get(i, [])
+                out.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+                offsets.append(out.tell())
+
+        offsets_path = cls.offsets_path(path)
+        np.save(offsets_path + '.tmp.npy', np.array(offsets, dtype=np.uint64))
+        os.replace(offsets_path + '.tmp.npy', offsets_path)
+        os.replace(tmp_path, path)
+        if len(records) > len(offsets) - 1:
+            print(f"Collapsed {len(records) - len(offsets) + 1} near-duplicate chunks "
+                  f"into {len(aliases)} ({len(records)} -> {len(offsets) - 1} chunks)")
+        return len(offsets) - 1
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"chunk {i} out of range")
+        i %= len(self)
+        return json.loads(self._data[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def texts(self):
+        return [record['text'] for record in self]
+
+    def close(self):
+        if len(self):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_chunk_records(chunk_dir, files=None):
+    """
+    Records of every chunk in the chunk store of chunk_dir, or only of the
+    given per-page chunk files. The store is built first if preprocessing
+    has not written one.
+    """
+    if files is not None:
+        paths = [os.path.join(chunk_dir, filename) for filename in files]
+        return [record for path in paths if os.path.isfile(path) for record in read_chunk_file(path)]
+
+    path = os.path.join(chunk_dir, CHUNK_STORE_NAME)
+    if not ChunkStore.exists(path):
+        ChunkStore.build(chunk_dir, path)
+    with ChunkStore(path) as store:
+        return list(store)
+
+
+def read_chunks(chunk_dir, files=None):
+    """(source filename, chunk text) of the chunks read_chunk_records returns"""
+    return [(record['source'], record['text']) for record in read_chunk_records(chunk_dir, files)]
@@ -1,14 +1,159 @@
 import os
 import re
-from bs4 import BeautifulSoup
+import time
+from html.parser import HTMLParser
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution, UnicodeDammit
+from scrapper.storage import open_raw_store
+from preprocessing.parallel import map_files, report_timings
 
+# Bump when a change to the cleaning logic alters its output, so cleaned pages get rebuilt
+CLEANER_VERSION = 1
+KEEP_TAGS = ['a', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div']
 
-def clean_html(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    keep_tags = ['a', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div']
+WHITESPACE = re.compile(r'\s+')
 
+
+class StreamingCleaner(HTMLParser):
+    """
+    Single-pass cleaner: writes the kept tags and the text of a page while
+    html.parser emits its events, without building a tree.
+
+    Produces the same output as clean_soup on an html.parser soup. Open
+    elements are tracked by name the way BeautifulSoup nests them, so stray
+    and misnested end tags close the same elements; entities, comments and
+    declarations are decoded and re-serialized the same way; whitespace is
+    collapsed as each piece is written. The href of every <a> tag is
+    collected in `hrefs` as well, so link extraction needs no second parse.
+
+    Example:
+        >>> cleaner = StreamingCleaner()
+        >>> cleaner.clean('<div class="x"><span>Hi</span> <a href="/ogs">OGS</a></div>')
+        '<div>Hi <a href="/ogs">OGS</a></div>'
+    """
+    keep_tags = frozenset(KEEP_TAGS)
+    void_tags = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack = []
+        self.open_counts = {}
+        self.hrefs = []
+        self._out = []
+        self._space = False
+        self._last = ''
+
+    def clean(self, html_content):
+        self.feed(html_content)
+        self.close()
+        while self.stack:
+            self._pop()
+        if self._space:
+            self._out.append(' ')
+        return ''.join(self._out)
+
+    def _write(self, piece, markup=False):
+        piece = WHITESPACE.sub(' ', piece)
+        if markup:
+            piece = piece.replace('> <', '><')
+        if piece[:1] == ' ':
+            self._space, piece = True, piece[1:]
+        if not piece:
+            return
+        if self._space and not (self._last == '>' and piece[0] == '<'):
+            self._out.append(' ')
+        self._space = piece[-1] == ' '
+        if self._space:
+            piece = piece[:-1]
+        self._out.append(piece)
+        self._last = piece[-1]
+
+    def _pop(self):
+        name = self.stack.pop()
+        self.open_counts[name] -= 1
+        if name in self.keep_tags:
+            self._write(f'</{name}>')
+
+    def handle_starttag(self, tag, attrs, self_closing=False):
+        if tag == 'a':
+            href = dict(attrs).get('href', False)
+            if href is not False:
+                self.hrefs.append(href or '')
+            if href:
+                self._write(f'<a href={EntitySubstitution.substitute_xml(href, True)}>')
+            else:
+                self._write('<a>')
+        elif tag in self.keep_tags:
+            self._write(f'<{tag}>')
+
+        if tag in self.void_tags and not self_closing:
+            return
+        self.stack.append(tag)
+        self.open_counts[tag] = self.open_counts.get(tag, 0) + 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, self_closing=True)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # Like BeautifulSoup, close everything opened after the most recent open `tag`
+        if self.open_counts.get(tag):
+            while self.stack[-1] != tag:
+                self._pop()
+            self._pop()
+
+    def handle_data(self, data):
+        self._write(EntitySubstitution.substitute_xml(data))
+
+    def handle_charref(self, name):
+        base, digits = (16, name[1:]) if name[:1] in ('x', 'X') else (10, name)
+        try:
+            character, rest = int(digits, base), ''
+        except ValueError:
+            match = re.match(r'([0-9a-f]+)(.*)' if base == 16 else r'([0-9]+)(.*)', digits)
+            if match is None:
+                return self.handle_data(digits)
+            character, rest = int(match.group(1), base), match.group(2)
+        self.handle_data(UnicodeDammit.numeric_character_reference(character)[0] + rest)
+
+    def handle_entityref(self, name):
+        self.handle_data(EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name) or f'&{name}')
+
+    # An empty comment or declaration is serialized with a single space, as BeautifulSoup does
+    def handle_comment(self, data):
+        self._write(f'<!--{data or " "}-->', markup=True)
+
+    def handle_decl(self, decl):
+        self._write(f'<!DOCTYPE {decl[len("DOCTYPE "):] or " "}>\n', markup=True)
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self._write(f'<![CDATA[{data[len("CDATA["):] or " "}]]>', markup=True)
+        else:
+            self._write(f'<?{data or " "}?>', markup=True)
+
+    def handle_pi(self, data):
+        self._write(f'<?{data or " "}>', markup=True)
+
+
+def clean_html(html_content, parser=None):
+    """
+    Strips a page down to the kept tags (only <a> keeps its href) with
+    whitespace collapsed. Runs the single-pass StreamingCleaner unless a
+    parser backend is given, in which case its soup goes through clean_soup.
+    """
+    if parser is not None:
+        return clean_soup(parser.soup(html_content))
+    return StreamingCleaner().clean(html_content)
+
+
+def clean_soup(soup):
+    """
+    Strips an already parsed page down to the kept tags in place and returns it
+    serialized, so callers holding a parse tree do not need to parse again.
+    """
     for tag in reversed(soup.find_all()):
-        if tag.name not in keep_tags:
+        if tag.name not in KEEP_TAGS:
             tag.replace_with_children() if hasattr(tag, 'contents') else tag.extract()
 
     for a_tag in soup.find_all('a'):
@@ -25,20 +170,39 @@ def clean_html(html_content):
     return re.sub(r'>\s+<', '><', cleaned_html)
 
 
-def process_cleaning(input_dir, output_dir):
-    os.makedirs(output_dir, exist_ok=True)
+def clean_file(filename, html_content, output_dir):
+    with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as file:
+        file.write(clean_html(html_content))
 
-    for filename in os.listdir(input_dir):
-        if filename.endswith('.html'):
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, filename)
 
-            with open(input_path, 'r', encoding='utf-8') as file:
-                html_content = file.read()
+def process_cleaning(input_dir, output_dir, files=None, workers=1, manifest=None):
+    """
+    Cleans raw HTML pages. If files is given, only those filenames are processed.
+    Pages are streamed from the raw page archive when input_dir holds one.
+    With workers > 1 the pages are cleaned in a process pool.
+
+    With a preprocessing manifest, pages whose content and pipeline settings
+    match the manifest are skipped. Returns the filenames that were cleaned.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    digests = {}
 
-            cleaned_html = clean_html(html_content)
+    def pages():
+        for filename, html_content in open_raw_store(input_dir).iter_pages(files):
+            if manifest is not None:
+                digest = manifest.content_hash(html_content)
+                if manifest.is_current(filename, digest, output_dir):
+                    continue
+                digests[filename] = digest
+            yield filename, html_content, output_dir
 
-            with open(output_path, 'w', encoding='utf-8') as file:
-                file.write(cleaned_html)
+    start, timings = time.perf_counter(), []
+    for filename, seconds in map_files(clean_file, pages(), workers):
+        timings.append((filename, seconds))
+        if manifest is not None:
+            manifest.record(filename, digests.pop(filename))
+        print(f"Cleaned {filename} successfully! ({seconds * 1000:.1f} ms)")
 
-            print(f"Cleaned {filename} successfully!")
+    report_timings("Cleaned", timings, time.perf_counter() - start, workers)
+    return [filename for filename, _ in timings]
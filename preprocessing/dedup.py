@@ -0,0 +1,77 @@
+import os
+import re
+import hashlib
+import numpy as np
+
+# Chunks whose estimated Jaccard similarity of word 3-grams reaches this are collapsed (0 disables)
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', 0.8))
+SHINGLE_SIZE = 3
+# 16 bands of 8 rows: pairs from about 0.7 similarity up share a band and get compared
+NUM_PERM = 128
+BANDS = 16
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+WORD_PATTERN = re.compile(r'\w+')
+
+_rng = np.random.RandomState(1)
+PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Word n-grams of a text, lowercased; a text shorter than n words is one shingle"""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text):
+    """MinHash signature of a text's shingles, NUM_PERM 32-bit values"""
+    hashes = np.array([int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+                       for shingle in shingles(text)], dtype=np.uint64)
+    # Wrapping uint64 arithmetic is fine here: the values only need to be well mixed
+    permuted = (PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=1)
+
+
+def near_duplicates(texts, threshold=DEDUP_THRESHOLD):
+    """
+    For each text, the index of the first text it is a near-duplicate of
+    (itself if none), using MinHash signatures and LSH banding.
+
+    Each signature is cut into BANDS bands; texts that agree on a whole band
+    land in the same bucket and are compared on their full signature. Only
+    bucket members are compared, so the work grows linearly with the corpus
+    rather than with the number of pairs. Groups are merged transitively,
+    and the earliest text of a group is its canonical one.
+
+    Example:
+        >>> near_duplicates(["Contact OGS at ogs@northeastern.edu today.",
+        ...                  "Contact OGS at ogs@northeastern.edu today!", "Apply for OPT."])
+        [0, 0, 2]
+    """
+    parent = list(range(len(texts)))
+    if not threshold or len(texts) < 2:
+        return parent
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    signatures = np.array([minhash(text) for text in texts])
+    rows = NUM_PERM // BANDS
+    for band in range(BANDS):
+        buckets = {}
+        for i, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+            first = buckets.setdefault(key, i)
+            if first == i:
+                continue
+            a, b = find(first), find(i)
+            if a != b and np.mean(signatures[first] == signatures[i]) >= threshold:
+                parent[max(a, b)] = min(a, b)
+
+    return [find(i) for i in range(len(texts))]
@@ -1,17 +1,63 @@
 import os
 from preprocessing.cleaning import process_cleaning
-from preprocessing.chunking import process_files
+from preprocessing.chunking import process_files, report_boilerplate
+from preprocessing.boilerplate import (detect_boilerplate, boilerplate_digest, read_pages, save_boilerplate,
+                                       BOILERPLATE_NAME)
+from preprocessing.parallel import resolve_workers
+from preprocessing.manifest import PreprocessManifest
+from preprocessing.chunkstore import ChunkStore, CHUNK_STORE_NAME
+from scrapper.manifest import CrawlManifest, manifest_path
+from scrapper.storage import open_raw_store
 
 
 def run_cleaner():
+    """
+    Clean and chunk the raw HTML files.
+
+    Every raw file is hashed against the preprocessing manifest rather than
+    trusting the crawl's list of changed files, which is lost when a run
+    fails between crawling and cleaning. Files are spread over
+    PREPROCESS_WORKERS processes (0 uses every core, 1 runs serially).
+    Pages already processed with the same content and pipeline settings are
+    skipped, and outputs of pages removed from the raw store are deleted.
+    Blocks repeated on more than BOILERPLATE_SHARE of the pages (menus,
+    banners, footers) are detected over the whole cleaned corpus and left out
+    of the chunks; when that set changes, every page is chunked again.
+    Per-page chunk files are then combined into the chunk store read by the
+    index builders. Returns the chunk files that changed, for updating the index.
+    """
     raw_html_dir = os.getenv('RAWDATA_DIR')
     cleaned_html_dir = os.getenv('CLEANDATA_DIR')
     chunked_output_dir = os.getenv('CHUNKDATA_DIR')
+    workers = resolve_workers()
+
+    manifest = PreprocessManifest(manifest_path(chunked_output_dir, 'preprocess_manifest.json'), chunked_output_dir)
 
     print("Cleaning extracted HTML files...")
-    process_cleaning(raw_html_dir, cleaned_html_dir)
+    cleaned_files = process_cleaning(raw_html_dir, cleaned_html_dir, workers=workers, manifest=manifest)
+
+    manifest.remove_deleted(open_raw_store(raw_html_dir), cleaned_html_dir)
+
+    print("Detecting boilerplate blocks...")
+    boilerplate = detect_boilerplate(read_pages(cleaned_html_dir, sorted(manifest.entries)))
+    os.makedirs(chunked_output_dir, exist_ok=True)
+    save_boilerplate(os.path.join(chunked_output_dir, BOILERPLATE_NAME), boilerplate)
+    rechunk = manifest.set_boilerplate(boilerplate_digest(boilerplate))
+    if rechunk:
+        print(f"Boilerplate set changed: rechunking all {len(rechunk)} pages")
+        cleaned_files = rechunk
 
     print("Chunking cleaned HTML files...")
-    process_files(cleaned_html_dir, chunked_output_dir)
+    # Chunks record the URL of their page, which only the crawl manifest knows
+    urls = CrawlManifest(manifest_path(raw_html_dir), raw_html_dir).files
+    process_files(cleaned_html_dir, chunked_output_dir, files=cleaned_files, workers=workers, urls=urls,
+                  boilerplate=boilerplate)
+    report_boilerplate(cleaned_html_dir, cleaned_files, boilerplate)
+    manifest.save()
+
+    chunk_count = ChunkStore.build(chunked_output_dir, os.path.join(chunked_output_dir, CHUNK_STORE_NAME))
+    print(f"Chunk store written: {chunk_count} chunks")
 
+    print(f"Chunk files changed: {len(manifest.changed_files)}, removed: {len(manifest.deleted_files)}")
     print("Cleaning pipeline completed successfully!")
+    return sorted(manifest.changed_files)
@@ -0,0 +1,148 @@
+import os
+import json
+import hashlib
+from preprocessing.cleaning import CLEANER_VERSION, KEEP_TAGS
+from preprocessing.chunking import CHUNKER_VERSION, CHUNK_SIZE, CHUNK_OVERLAP, chunk_filename, sentence_splitter
+
+
+def pipeline_settings():
+    """Versions and parameters of the cleaner and chunker; a change invalidates every output"""
+    return {
+        'cleaner_version': CLEANER_VERSION,
+        'keep_tags': KEEP_TAGS,
+        'chunker_version': CHUNKER_VERSION,
+        'chunk_size': CHUNK_SIZE,
+        'chunk_overlap': CHUNK_OVERLAP,
+        'sentence_splitter': sentence_splitter(),
+    }
+
+
+class PreprocessManifest:
+    """
+    On-disk record of the raw pages that have been cleaned and chunked.
+
+    For each raw filename the manifest keeps a SHA-256 of the page content
+    and a fingerprint of the cleaner/chunker versions and parameters that
+    produced its outputs. A page is skipped when both still match and its
+    chunk file exists; outputs of pages that disappeared from the raw store
+    are removed.
+
+    The digest of the boilerplate blocks the chunks were built without is
+    kept as well: when the corpus-level boilerplate set changes, every
+    page's chunks are rebuilt.
+
+    Chunk files written or removed are collected in `changed_files` and
+    `deleted_files` for the current run, and accumulate in `pending` until
+    the index builder calls mark_indexed(), so the index can be updated
+    with only those files.
+
+    Example:
+        >>> manifest = PreprocessManifest('data/preprocess_manifest.json', 'data/chunked/')
+        >>> manifest.is_current('index.html', manifest.content_hash(html))
+        True
+    """
+
+    def __init__(self, path, chunk_dir):
+        self.path = path
+        self.chunk_dir = chunk_dir
+        self.settings = pipeline_settings()
+        self.fingerprint = hashlib.sha256(json.dumps(self.settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        self.entries = {}
+        self.boilerplate = None
+        self.pending = {}
+        self.changed_files = set()
+        self.deleted_files = set()
+
+        if self.path and os.path.isfile(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entries = data.get('pages', {})
+            self.boilerplate = data.get('boilerplate')
+            self.pending = data.get('pending_index', {})
+
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def is_current(self, filename, digest, cleaned_dir=None):
+        """
+        True if the page's outputs were built from this content with the current
+        settings. With cleaned_dir, its cleaned HTML must be there as well: the
+        streaming pipeline records pages without writing it.
+        """
+        entry = self.entries.get(filename)
+        return (bool(entry) and entry['sha256'] == digest and entry['fingerprint'] == self.fingerprint
+                and os.path.exists(os.path.join(self.chunk_dir, entry['chunk_file']))
+                and (cleaned_dir is None or os.path.exists(os.path.join(cleaned_dir, filename))))
+
+    def record(self, filename, digest):
+        chunk_file = chunk_filename(filename)
+        previous = self.entries.get(filename, {}).get('chunk_file')
+        if previous and previous != chunk_file and os.path.exists(os.path.join(self.chunk_dir, previous)):
+            # The chunk file format changed; drop the output in the old format
+            os.remove(os.path.join(self.chunk_dir, previous))
+        self.entries[filename] = {'sha256': digest, 'fingerprint': self.fingerprint, 'chunk_file': chunk_file}
+        self.changed_files.add(chunk_file)
+        self.pending[chunk_file] = 'changed'
+
+    def set_boilerplate(self, digest):
+        """
+        Record the boilerplate set chunks are built without. Returns the pages
+        to rechunk: all of them if the set changed, since their chunks did too.
+        """
+        if digest == self.boilerplate:
+            return []
+        self.boilerplate = digest
+        for entry in self.entries.values():
+            self.changed_files.add(entry['chunk_file'])
+            self.pending[entry['chunk_file']] = 'changed'
+        return sorted(self.entries)
+
+    def remove_deleted(self, store, cleaned_dir=None):
+        """
+        Delete the outputs of pages that are no longer in the raw store; returns their chunk files.
+        Cleaned pages are only looked for when cleaned_dir is given.
+        """
+        for filename in sorted(self.entries):
+            if store.exists(filename):
+                continue
+
+            chunk_file = self.entries.pop(filename)['chunk_file']
+            paths = [os.path.join(self.chunk_dir, chunk_file)]
+            if cleaned_dir:
+                paths.append(os.path.join(cleaned_dir, filename))
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.deleted_files.add(chunk_file)
+            self.pending[chunk_file] = 'deleted'
+            print(f"Removed outputs of deleted page {filename}")
+        return sorted(self.deleted_files)
+
+    def pending_changes(self):
+        """(changed, deleted) chunk files the index has not picked up yet"""
+        changed = sorted(name for name, change in self.pending.items() if change == 'changed')
+        deleted = sorted(name for name, change in self.pending.items() if change == 'deleted')
+        return changed, deleted
+
+    def mark_indexed(self):
+        """Called by the index builder once it holds every pending change"""
+        self.pending = {}
+        self.save()
+
+    def save(self):
+        """Atomically write the manifest to disk"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+
+        data = {
+            'settings': self.settings,
+            'pages': self.entries,
+            'boilerplate': self.boilerplate,
+            'changed_files': sorted(self.changed_files),
+            'deleted_files': sorted(self.deleted_files),
+            'pending_index': self.pending,
+        }
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
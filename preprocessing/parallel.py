@@ -0,0 +1,55 @@
+import os
+import time
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+
+def resolve_workers(workers=None):
+    """Worker count from the PREPROCESS_WORKERS setting; 0 means one per CPU core"""
+    workers = int(os.getenv('PREPROCESS_WORKERS', 1) if workers is None else workers)
+    return workers if workers > 0 else os.cpu_count() or 1
+
+
+def timed(task, *args):
+    """Run task(*args) and return its elapsed seconds; executed in the worker process"""
+    start = time.perf_counter()
+    task(*args)
+    return time.perf_counter() - start
+
+
+def map_files(task, items, workers=1, chunksize=8):
+    """
+    Apply task to every (filename, *args) tuple in items and yield
+    (filename, seconds) in input order, so output and logs do not depend on
+    which worker finishes first.
+
+    With more than one worker the items are spread over a process pool.
+    Tasks are submitted chunksize at a time and at most a few batches are
+    in flight, so a large input is never materialized at once.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item[0], timed(task, *item)
+        return
+
+    items = iter(items)
+    batch_size = chunksize * workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while batch := list(islice(items, batch_size)):
+            filenames = [item[0] for item in batch]
+            seconds = executor.map(timed, [task] * len(batch), *zip(*batch), chunksize=chunksize)
+            yield from zip(filenames, seconds)
+
+
+def report_timings(label, timings, wall_time, workers):
+    """Print a summary of per-file timings collected from map_files"""
+    if not timings:
+        print(f"{label}: no files to process")
+        return
+
+    total = sum(seconds for _, seconds in timings)
+    slowest_file, slowest = max(timings, key=lambda timing: timing[1])
+    print(f"{label} {len(timings)} files in {wall_time:.2f}s with {workers} worker(s): "
+          f"{total / len(timings) * 1000:.1f} ms/file on average, "
+          f"slowest {slowest_file} ({slowest * 1000:.1f} ms), "
+          f"{total / wall_time:.1f}x parallel speedup")
@@ -0,0 +1,121 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from scrapper.ogs_html import NortheasternScraper, run_scrapper
+from scrapper.manifest import manifest_path
+from preprocessing.cleaning import StreamingCleaner
+from preprocessing.chunking import chunk_cleaned_html, chunk_records, chunk_filename
+from preprocessing.chunkstore import ChunkStore, write_chunk_file
+from preprocessing.boilerplate import strip_boilerplate, load_boilerplate, BOILERPLATE_NAME
+from preprocessing.manifest import PreprocessManifest
+from preprocessing.parallel import resolve_workers
+from utils.parsers import get_parser
+
+
+def parse_page(content, chunk=True, boilerplate=frozenset()):
+    """
+    Link extraction, cleaning and chunking from a single parse of the page.
+    Runs in a worker process; returns (hrefs, cleaned_html, chunks). Blocks
+    in boilerplate are left out of the chunks but not of the cleaned HTML.
+    """
+    if not chunk:
+        return get_parser().hrefs(content), None, None
+
+    # The streaming cleaner collects the links while it cleans
+    cleaner = StreamingCleaner()
+    cleaned_html = cleaner.clean(content)
+    return cleaner.hrefs, cleaned_html, chunk_cleaned_html(strip_boilerplate(cleaned_html, boilerplate))
+
+
+class StreamingScraper(NortheasternScraper):
+    """
+    Scraper that cleans and chunks every page as soon as it is fetched.
+
+    Each page is parsed once in a worker process: the same pass yields the
+    links to follow, the cleaned HTML and the chunks. Chunk files are written
+    to chunk_dir (and handed to on_chunks) while the crawl keeps fetching, so
+    network I/O overlaps with CPU-bound processing. Cleaned HTML is only
+    written when clean_dir is given, as a debug output. Raw pages are still
+    stored because they back revalidation on the next crawl.
+
+    Every chunked page is recorded in the preprocessing manifest, like
+    run_cleaner does, so the index picks up its changes. Pages that are
+    duplicates of a stored page, or unchanged with current chunks, are parsed
+    for links only. Outputs of pages no longer in the raw store are removed
+    when the crawl is closed. Boilerplate is detected over the whole
+    corpus, which a single pass never sees, so the set saved by the last
+    staged run (if any) is dropped from the chunks. The chunk store is
+    rebuilt from the chunk files when the crawl is closed.
+    """
+
+    def __init__(self, base_url, data_dir, chunk_dir, clean_dir=None, on_chunks=None, workers=None, **kwargs):
+        super().__init__(base_url, data_dir, **kwargs)
+        self.chunk_dir = chunk_dir
+        self.boilerplate = load_boilerplate(os.path.join(chunk_dir, BOILERPLATE_NAME))
+        self.clean_dir = clean_dir
+        self.on_chunks = on_chunks
+        self.preprocess = PreprocessManifest(manifest_path(chunk_dir, 'preprocess_manifest.json'), chunk_dir)
+        # Workers are started from the crawl's threads, which fork cannot do safely
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        self.chunk_count = 0
+        self._emit_lock = threading.Lock()
+
+    def handle_page(self, url, content, headers, modified, base=None):
+        filename = self.save_page(url, content, headers, served_url=base) if modified else None
+        if filename is None:
+            filename = self.outdated_page(url, content)
+        if filename is None and not self.follow_links:
+            return set()
+
+        hrefs, cleaned_html, chunks = self.executor.submit(parse_page, content, filename is not None,
+                                                           self.boilerplate).result()
+        if filename is not None:
+            self.emit(filename, url, content, cleaned_html, chunks)
+        return self.resolve_links(base or url, hrefs) if self.follow_links else set()
+
+    def outdated_page(self, url, content):
+        """Filename of a stored page whose chunks are missing or were built from other content or settings"""
+        entry = self.manifest.entries.get(url)
+        if entry is None or self.preprocess.is_current(entry['file'], self.preprocess.content_hash(content)):
+            return None
+        return entry['file']
+
+    def emit(self, filename, url, content, cleaned_html, chunks):
+        """Write a page's chunks (and optionally its cleaned HTML) as soon as they are produced"""
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        write_chunk_file(os.path.join(self.chunk_dir, chunk_filename(filename)), chunk_records(filename, url, chunks))
+        with self._emit_lock:
+            self.preprocess.record(filename, self.preprocess.content_hash(content))
+
+        if self.clean_dir:
+            os.makedirs(self.clean_dir, exist_ok=True)
+            with open(os.path.join(self.clean_dir, filename), 'w', encoding='utf-8') as file:
+                file.write(cleaned_html)
+
+        self.chunk_count += len(chunks)
+        if self.on_chunks:
+            self.on_chunks(filename, chunks)
+        print(f"Chunked {filename}: {len(chunks)} chunks")
+
+    def close(self):
+        super().close()
+        self.executor.shutdown()
+        self.preprocess.remove_deleted(self.store, self.clean_dir)
+        self.preprocess.save()
+        if os.path.isdir(self.chunk_dir):
+            ChunkStore.build(self.chunk_dir)
+
+
+def run_streaming_pipeline(resume=False, on_chunks=None):
+    """
+    Crawl, clean and chunk in one pass. Cleaned HTML is written to CLEANDATA_DIR
+    only when KEEP_CLEANED is 1. Pages are parsed by PREPROCESS_WORKERS
+    processes, as in run_cleaner. Returns the filenames whose chunks changed.
+    """
+    home_dir = os.getenv('HOME_DIR')
+    clean_dir = os.path.join(home_dir, os.getenv('CLEANDATA_DIR')) if os.getenv('KEEP_CLEANED') == '1' else None
+
+    return run_scrapper(resume=resume, scraper_cls=StreamingScraper,
+                        chunk_dir=os.path.join(home_dir, os.getenv('CHUNKDATA_DIR')),
+                        clean_dir=clean_dir, on_chunks=on_chunks, workers=resolve_workers())
@@ -0,0 +1,98 @@
+import os
+import json
+import threading
+
+
+class CrawlCheckpoint:
+    """
+    Append-only log of crawl progress used to resume an interrupted crawl.
+
+    Every URL added to the frontier is logged as 'queued' and every URL that
+    finished processing as 'done'. Writes are buffered and flushed every
+    `flush_every` events, so checkpointing costs one short line per URL.
+    Replaying the log gives back the visited set and the pending frontier.
+
+    Attributes:
+        path (str): Location of the log file
+        visited (set): URLs that completed before the interruption
+        frontier (set): URLs that were queued but never completed
+        on_flush (callable): Optional hook run after each flush, e.g. saving the crawl manifest
+
+    Example:
+        >>> checkpoint = CrawlCheckpoint('data/crawl_checkpoint.log')
+        >>> checkpoint.start(resume=True)
+        >>> checkpoint.frontier
+        {'https://international.northeastern.edu/ogs/new-students/'}
+    """
+
+    def __init__(self, path, flush_every=50, on_flush=None):
+        self.path = path
+        self.flush_every = flush_every
+        self.on_flush = on_flush
+        self.visited = set()
+        self.frontier = set()
+        self._file = None
+        self._unflushed = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Replay the log into the visited set and frontier"""
+        self.visited, self.frontier = set(), set()
+        if not os.path.isfile(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Last line was cut off by the interruption
+
+                if record['event'] == 'queued':
+                    self.frontier.add(record['url'])
+                elif record['event'] == 'done':
+                    self.visited.add(record['url'])
+                    self.frontier.discard(record['url'])
+
+    def start(self, resume=False):
+        """Open the log, replaying it first when resuming or truncating it otherwise"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if resume:
+            self.load()
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+
+    def mark_queued(self, url):
+        self._write('queued', url)
+
+    def mark_done(self, url):
+        self._write('done', url)
+
+    def _write(self, event, url):
+        with self._lock:
+            self._file.write(json.dumps({'event': event, 'url': url}) + '\n')
+            self._unflushed += 1
+            if self._unflushed < self.flush_every:
+                return
+            self._flush()
+
+        if self.on_flush:
+            self.on_flush()
+
+    def _flush(self):
+        self._file.flush()
+        self._unflushed = 0
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._flush()
+                self._file.close()
+                self._file = None
+
+    def clear(self):
+        """Remove the log once the crawl has finished"""
+        self.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
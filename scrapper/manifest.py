@@ -0,0 +1,206 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+from scrapper.storage import DirectoryStore
+
+
+class CrawlManifest:
+    """
+    On-disk record of every page the scraper has stored.
+
+    For each URL the manifest keeps the saved filename, the ETag and
+    Last-Modified validators sent by the server, a SHA-256 of the content,
+    the last fetch time and the URL the page was served from. Later crawls use the validators to send
+    conditional requests and the hash to skip rewriting unchanged pages.
+
+    Files written during the current run are collected in `changed_files`
+    and persisted with the manifest as a report of what the crawl changed.
+    A resumed crawl keeps the changes recorded before the interruption.
+    Preprocessing does not rely on this list; it hashes every raw file
+    against its own manifest.
+
+    The manifest also deduplicates the corpus: a page whose content hash
+    matches an already stored page is recorded as a duplicate of that page
+    instead of being written again, and each stored page gets a unique
+    filename. Duplicates are fetched again on every crawl, since their
+    content may diverge; only URLs that redirect to a stored page are kept
+    as permanent aliases and skipped by later crawls. With path=None the manifest is kept in memory only. Stored
+    copies are looked up in `store` (one file per page in data_dir by default).
+
+    Example:
+        >>> manifest = CrawlManifest('data/crawl_manifest.json', 'data/raw/')
+        >>> manifest.conditional_headers('https://international.northeastern.edu/ogs/')
+        {'If-None-Match': '"abc123"'}
+    """
+
+    def __init__(self, path, data_dir, resume=False, store=None):
+        self.path = path
+        self.dir = data_dir
+        self.store = store or DirectoryStore(data_dir)
+        self.entries = {}
+        self.changed_files = set()
+        self._lock = threading.Lock()
+
+        if self.path and os.path.isfile(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entries = data.get('pages', {})
+            if resume:
+                self.changed_files = set(data.get('changed_files', []))
+
+        # Lookup tables rebuilt from the entries
+        self.by_hash = {entry['sha256']: url for url, entry in self.entries.items()}
+        self.files = {entry['file']: url for url, entry in self.entries.items()}
+        self.aliases = {alias: url for url, entry in self.entries.items()
+                        for alias in entry.get('aliases', [])}
+        self.duplicates = {duplicate: url for url, entry in self.entries.items()
+                           for duplicate in entry.get('duplicates', [])}
+
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def has_saved_copy(self, url):
+        """True if the URL was stored before and its file is still on disk"""
+        entry = self.entries.get(url)
+        return bool(entry) and self.store.exists(entry['file'])
+
+    def conditional_headers(self, url):
+        """Revalidation headers for a URL we already have a copy of"""
+        if not self.has_saved_copy(url):
+            return {}
+
+        entry = self.entries[url]
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def unchanged_since(self, url, lastmod):
+        """True if our stored copy was fetched after the page's sitemap <lastmod>"""
+        if lastmod is None or not self.has_saved_copy(url):
+            return False
+        return datetime.fromisoformat(self.entries[url]['fetched_at']) >= lastmod
+
+    def read_saved_page(self, url):
+        """Return the stored content of a page that came back 304 Not Modified"""
+        return self.store.read(self.entries[url]['file'])
+
+    def is_alias(self, url):
+        """True if the URL redirects to a stored page"""
+        return url in self.aliases
+
+    def add_alias(self, url, alias, redirect=True):
+        """
+        Record that `alias` serves the same page as the stored `url`: as a
+        permanent alias if it redirects there, otherwise as a duplicate that
+        holds until the alias is fetched again.
+        """
+        if alias == url:
+            return
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None or alias in self.entries:
+                return
+            if redirect:
+                if alias not in entry.setdefault('aliases', []):
+                    entry['aliases'].append(alias)
+                self.aliases[alias] = url
+            else:
+                self._forget_duplicate(alias)
+                entry.setdefault('duplicates', []).append(alias)
+                self.duplicates[alias] = url
+            print(f"Duplicate: {alias} -> {url}")
+
+    def _forget_duplicate(self, url):
+        """Drop the record of url duplicating a stored page; the lock must be held"""
+        original = self.duplicates.pop(url, None)
+        if original is not None and url in self.entries.get(original, {}).get('duplicates', []):
+            self.entries[original]['duplicates'].remove(url)
+
+    def assign_filename(self, url, filename):
+        """Return filename, made unique if it is already taken by a different URL"""
+        with self._lock:
+            owner = self.files.get(filename)
+            if owner is not None and owner != url:
+                stem, ext = os.path.splitext(filename)
+                filename = f"{stem}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}{ext}"
+            self.files[filename] = url
+        return filename
+
+    def touch(self, url):
+        """Refresh the fetch time of a page that was revalidated as unchanged"""
+        with self._lock:
+            self.entries[url]['fetched_at'] = datetime.now(timezone.utc).isoformat()
+
+    def record(self, url, filename, content, headers=None, served_url=None):
+        """
+        Update the entry for a freshly fetched page.
+        Returns True if the content differs from the stored copy and must be written,
+        False if it is unchanged or duplicates another stored page.
+        """
+        headers = headers or {}
+        digest = self.content_hash(content)
+
+        with self._lock:
+            previous = self.entries.get(url)
+            original = self.by_hash.get(digest)
+            if previous is None and original is not None and original != url:
+                duplicate_of = original
+                if self.files.get(filename) == url:
+                    del self.files[filename]
+            else:
+                duplicate_of = None
+
+            if duplicate_of is None:
+                changed = not (previous and previous['sha256'] == digest and
+                               previous['file'] == filename and self.has_saved_copy(url))
+
+                self.entries[url] = {
+                    'file': filename,
+                    'etag': headers.get('ETag'),
+                    'last_modified': headers.get('Last-Modified'),
+                    'sha256': digest,
+                    'fetched_at': datetime.now(timezone.utc).isoformat(),
+                    'served_url': served_url or url,
+                    'aliases': previous.get('aliases', []) if previous else [],
+                    'duplicates': previous.get('duplicates', []) if previous else [],
+                }
+                self._forget_duplicate(url)
+                # The old content is no longer stored under this URL, so it must not make new pages aliases
+                if previous and previous['sha256'] != digest and self.by_hash.get(previous['sha256']) == url:
+                    del self.by_hash[previous['sha256']]
+                self.by_hash[digest] = url
+                if changed:
+                    self.changed_files.add(filename)
+
+        if duplicate_of is not None:
+            self.add_alias(duplicate_of, url, redirect=False)
+            return False
+        return changed
+
+    def save(self):
+        """Atomically write the manifest to disk"""
+        if not self.path:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+
+        with self._lock:
+            data = {
+                'pages': self.entries,
+                'changed_files': sorted(self.changed_files),
+            }
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def manifest_path(data_dir, name='crawl_manifest.json'):
+    """Path of a manifest file stored next to the given data directory"""
+    return os.path.join(os.path.dirname(os.path.normpath(data_dir)), name)
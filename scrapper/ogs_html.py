@@ -1,20 +1,61 @@
-import os
-if not os.getenv('ENV_STATUS') == '1':
-    import utils  # This loads vars, do not remove
-
 import requests, os, time, re
-from bs4 import BeautifulSoup
+import asyncio
+import aiohttp
+import threading
+from collections import namedtuple, Counter
 from urllib.parse import urljoin, urlparse
 from concurrent.futures import ThreadPoolExecutor
 from utils.helpers import measure_time
+from utils.parsers import get_parser
+from scrapper.manifest import CrawlManifest, manifest_path
+from scrapper.checkpoint import CrawlCheckpoint
+from scrapper.urls import canonicalize_url
+from scrapper.ratelimit import HostRateLimiter, THROTTLE_STATUSES
+from scrapper.sitemap import read_sitemaps
+from scrapper.storage import DirectoryStore, open_raw_store
+
+# url is the final URL after redirects, as served; status is None if no response was received
+FetchResult = namedtuple('FetchResult', ['url', 'content', 'headers', 'modified', 'status'])
 
 
 class NortheasternScraper:
-    def __init__(self, base_url, data_dir):
-        self.base_url = base_url
+    """
+    Crawls a site into one HTML file per page.
+
+    discovery selects how pages are found: 'links' follows the links on
+    every fetched page, 'sitemap' only fetches pages listed in the site's
+    sitemaps (skipping those whose <lastmod> predates our stored copy), and
+    'sitemap+links' seeds from the sitemap and follows links to find pages
+    the sitemap misses. Sitemap modes fall back to 'links' when the site
+    has no sitemap.
+
+    Pages are written to `store`: one file per page in data_dir by default,
+    or a scrapper.storage.PageArchive.
+
+    URLs are fetched exactly as they were discovered, since rewriting them
+    can cost a redirect per page (e.g. stripping WordPress's trailing slash).
+    Their canonical form is only the key for dedup, the manifest and aliases.
+    """
+
+    def __init__(self, base_url, data_dir, manifest=None, checkpoint=None, rate_limiter=None, max_retries=3,
+                 discovery='links', store=None, parser=None):
+        self.scheme = urlparse(base_url).scheme
+        self.start_url = base_url
+        self.base_url = canonicalize_url(base_url, self.scheme)
         self.visited_urls = set()
         self.session = requests.Session()
         self.dir = data_dir
+        self.store = store or DirectoryStore(data_dir)
+        # Without a persistent manifest, dedup and aliases are tracked for this crawl only
+        self.manifest = manifest or CrawlManifest(None, data_dir, store=self.store)
+        self.checkpoint = checkpoint
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.max_retries = max_retries
+        self.retries = Counter()
+        self.discovery = discovery
+        self.follow_links = discovery != 'sitemap'
+        self.parser = parser or get_parser()
+        self._lock = threading.Lock()
 
         # Add headers to mimic a browser
         self.headers = {
@@ -32,95 +73,402 @@ class NortheasternScraper:
                 '#' not in url and
                 'mailto:' not in url)
 
+    def canonicalize(self, url):
+        """Map every spelling of a page's URL to a single crawl key"""
+        return canonicalize_url(url, self.scheme)
+
+    def filter_new(self, urls):
+        """
+        Drop URLs that were already crawled or are known duplicates of a stored
+        page, keeping a single spelling of each remaining page.
+        """
+        new_urls = {}
+        for url in sorted(urls):
+            key = self.canonicalize(url)
+            if key not in self.visited_urls and not self.manifest.is_alias(key):
+                new_urls.setdefault(key, url)
+        return set(new_urls.values())
+
+    def claim_redirect(self, url):
+        """Mark a redirect target as visited; False if another worker already crawled it"""
+        with self._lock:
+            if url in self.visited_urls:
+                return False
+            self.visited_urls.add(url)
+            return True
+
+    def request_headers(self, url):
+        """Browser headers plus revalidation headers for pages we already have"""
+        headers = dict(self.headers)
+        headers.update(self.manifest.conditional_headers(self.canonicalize(url)))
+        return headers
+
+    def should_retry(self, url, result):
+        """Throttled pages go back on the frontier a limited number of times"""
+        if result.status not in THROTTLE_STATUSES or self.retries[url] >= self.max_retries:
+            return False
+        self.retries[url] += 1
+        return True
+
+    def fetch_page(self, url):
+        """
+        Fetch a page, revalidating it against the manifest when possible.
+        Returns a FetchResult; on 304 Not Modified the stored copy is returned
+        so links can still be followed.
+        """
+        host = urlparse(url).netloc
+        self.rate_limiter.acquire(host)
+        start, status, retry_after = time.monotonic(), None, None
+        try:
+            response = self.session.get(url, headers=self.request_headers(url), timeout=10)
+            status, retry_after = response.status_code, response.headers.get('Retry-After')
+            if response.status_code == 304:
+                return self.not_modified(url, response.headers, status)
+            response.raise_for_status()
+            return FetchResult(response.url, response.text, response.headers, True, status)
+        except Exception as e:
+            print(f"Error fetching {url}: {str(e)}")
+            return FetchResult(url, None, None, False, status)
+        finally:
+            self.rate_limiter.release(host, time.monotonic() - start, status, retry_after)
+
+    def not_modified(self, url, headers, status):
+        """FetchResult of a page that came back 304 Not Modified, holding our stored copy"""
+        key = self.canonicalize(url)
+        self.manifest.touch(key)
+        return FetchResult(url, self.manifest.read_saved_page(key), headers, False, status)
+
     def get_page_content(self, url):
         """Fetch the content of a page"""
+        return self.fetch_page(url).content
+
+    def fetch_raw(self, url):
+        """Fetch a non-page resource such as robots.txt or a sitemap; returns bytes or None"""
+        host = urlparse(url).netloc
+        self.rate_limiter.acquire(host)
+        start, status = time.monotonic(), None
         try:
             response = self.session.get(url, headers=self.headers, timeout=10)
+            status = response.status_code
             response.raise_for_status()
-            return response.text
+            return response.content
         except Exception as e:
             print(f"Error fetching {url}: {str(e)}")
             return None
+        finally:
+            # A missing robots.txt or sitemap is not a sign of an overloaded server
+            self.rate_limiter.release(host, time.monotonic() - start, 200 if status == 404 else status)
 
-    def save_page(self, url, content):
-        """Save the page content to a file"""
-        # Create a valid filename from the URL
+    def url_to_filename(self, url):
+        """Create a valid filename from the URL"""
         parsed_url = urlparse(url)
         path = parsed_url.path
         if not path or path == '/':
-            filename = 'index.html'
-        else:
-            filename = re.sub(r'[^\w\-_\. ]', '_', path.strip('/'))
-            if not filename.endswith('.html'):
-                filename += '.html'
+            return 'index.html'
 
-        # Create directory structure
-        os.makedirs(self.dir, exist_ok=True)
+        filename = re.sub(r'[^\w\-_\. ]', '_', path.strip('/'))
+        if not filename.endswith('.html'):
+            filename += '.html'
+        return filename
+
+    def save_page(self, url, content, headers=None, served_url=None):
+        """
+        Save the page content to the store, skipping unchanged pages and duplicates of stored pages.
+        served_url is the URL the page was fetched from, when it differs from its canonical url.
+        Returns the filename if the page was written, otherwise None.
+        """
+        filename = self.manifest.assign_filename(url, self.url_to_filename(url))
         filepath = os.path.join(self.dir, filename)
 
+        if not self.manifest.record(url, filename, content, headers, served_url):
+            print(f"Skipped unchanged or duplicate page: {url}")
+            return None
+
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+            self.store.write(filename, content, url=url, headers=headers)
             print(f"Saved: {filepath}")
+            return filename
         except Exception as e:
             print(f"Error saving {filepath}: {str(e)}")
+            return None
 
     def extract_links(self, url, content):
         """Extract all valid links from a page"""
-        soup = BeautifulSoup(content, 'html.parser')
-        links = set()
+        return self.resolve_links(url, self.parser.hrefs(content))
 
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
+    def resolve_links(self, url, hrefs):
+        """Turn the hrefs found on a page into absolute, crawlable URLs"""
+        links = set()
+        for href in hrefs:
             full_url = urljoin(url, href)
             if self.is_valid_url(full_url):
                 links.add(full_url)
-
         return links
 
     def scrape_page(self, url):
         """Scrape a single page and its links"""
-        if url in self.visited_urls:
+        key = self.canonicalize(url)
+        if key in self.visited_urls:
             return
 
-        self.visited_urls.add(url)
+        self.visited_urls.add(key)
         print(f"Scraping: {url}")
 
-        content = self.get_page_content(url)
-        if content:
-            self.save_page(url, content)
-            return self.extract_links(url, content)
-        return set()
+        result = self.fetch_page(url)
+        if self.should_retry(url, result):
+            # Returning the URL itself puts it back on the frontier
+            self.visited_urls.discard(key)
+            return {url}
+
+        new_urls = self.process_page(key, result) if result.content else set()
+        self.record_done(url, result)
+        return new_urls
+
+    def close(self):
+        self.session.close()
+
+    def record_queued(self, urls):
+        """Log newly discovered frontier URLs to the checkpoint"""
+        if self.checkpoint:
+            for url in urls:
+                self.checkpoint.mark_queued(url)
+
+    def record_done(self, url, result):
+        """
+        Log a URL as done once its page was handled, or refused for good with a
+        4xx. Failed fetches (5xx, timeouts, throttling) stay on the checkpoint's
+        frontier so that a resumed crawl retries them.
+        """
+        refused = result.status is not None and 400 <= result.status < 500 and result.status not in THROTTLE_STATUSES
+        if self.checkpoint and (result.content is not None or refused):
+            self.checkpoint.mark_done(url)
+
+    def sitemap_frontier(self):
+        """
+        Seed URLs from the sitemap: new pages and pages whose <lastmod> is newer
+        than the stored copy, plus pages known only from earlier link-following
+        crawls so they are revalidated. Returns None if the site has no sitemap.
+        """
+        sitemap = read_sitemaps(self.base_url, self.fetch_raw)
+        if sitemap is None:
+            return None
+
+        listed, seeds = set(), set()
+        for url, lastmod in sitemap.items():
+            if not self.is_valid_url(url):
+                continue
+            key = self.canonicalize(url)
+            listed.add(key)
+            if self.manifest.unchanged_since(key, lastmod):
+                self.visited_urls.add(key)  # Unchanged: neither fetched nor reached through links
+            else:
+                seeds.add(url)
+
+        # Fetched from the URL they were served at, which saves a redirect when it is not the canonical one
+        seeds.update(entry.get('served_url') or url for url, entry in self.manifest.entries.items()
+                     if url not in listed)
+        if self.follow_links and self.base_url not in self.visited_urls:
+            seeds.add(self.start_url)
+
+        print(f"Sitemap discovery: {len(seeds)} pages to fetch, "
+              f"{len(self.visited_urls)} unchanged since last crawl")
+        return seeds
+
+    def initial_frontier(self):
+        """
+        The URLs a crawl starts from: the pending frontier of a resumed
+        checkpoint, the sitemap seeds, or the base URL for a fresh crawl.
+        """
+        if self.checkpoint and self.checkpoint.frontier:
+            self.visited_urls.update(self.canonicalize(url) for url in self.checkpoint.visited)
+            print(f"Resuming crawl: {len(self.checkpoint.visited)} pages done, "
+                  f"{len(self.checkpoint.frontier)} pages queued")
+            return set(self.checkpoint.frontier)
+
+        seeds = self.sitemap_frontier() if self.discovery != 'links' else None
+        if seeds is None:
+            seeds = {self.start_url}
+
+        self.record_queued(seeds)
+        return seeds
 
     def scrape_site(self, max_workers=5):
         """Scrape the entire site using multiple threads"""
-        urls_to_scrape = {self.base_url}
+        urls_to_scrape = self.initial_frontier()
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             while urls_to_scrape:
                 futures = []
                 for url in list(urls_to_scrape)[:max_workers]:
                     urls_to_scrape.remove(url)
-                    futures.append(executor.submit(self.scrape_page, url))
+                    futures.append((url, executor.submit(self.scrape_page, url)))
 
-                for future in futures:
-                    new_urls = future.result()
+                for url, future in futures:
+                    try:
+                        new_urls = future.result()
+                    except Exception as e:
+                        print(f"Error crawling {url}: {e!r}")
+                        continue
                     if new_urls:
-                        urls_to_scrape.update(new_urls - self.visited_urls)
+                        new_urls = self.filter_new(new_urls) - urls_to_scrape
+                        self.record_queued(new_urls)
+                        urls_to_scrape.update(new_urls)
+
+                # Politeness is handled per request by the rate limiter
+                print(f"Crawl rate: {self.rate_limiter.summary()}")
+
+    async def fetch_page_async(self, session, url):
+        """Async counterpart of fetch_page using the pooled session"""
+        host = urlparse(url).netloc
+        await self.rate_limiter.acquire_async(host)
+        start, status, retry_after = time.monotonic(), None, None
+        try:
+            async with session.get(url, headers=self.request_headers(url)) as response:
+                status, retry_after = response.status, response.headers.get('Retry-After')
+                if response.status == 304:
+                    return self.not_modified(url, response.headers, status)
+                response.raise_for_status()
+                return FetchResult(str(response.url), await response.text(), response.headers, True, status)
+        except Exception as e:
+            print(f"Error fetching {url}: {str(e)}")
+            return FetchResult(url, None, None, False, status)
+        finally:
+            self.rate_limiter.release(host, time.monotonic() - start, status, retry_after)
 
-                # Add a small delay to be respectful to the server
-                time.sleep(1)
+    def process_page(self, url, result):
+        """
+        Save a fetched page (unless it was not modified) and return its outgoing links.
+        url is the canonical key of the fetched URL. A URL that redirected to an
+        already crawled page is recorded as its alias.
+        """
+        key = self.canonicalize(result.url)
+        if key != url and not self.claim_redirect(key):
+            self.manifest.add_alias(key, url)
+            return set()
+
+        new_urls = self.handle_page(key, result.content, result.headers, result.modified, base=result.url)
+        self.manifest.add_alias(key, url)
+        return new_urls
+
+    def handle_page(self, url, content, headers, modified, base=None):
+        """
+        Store a page under its canonical url and return its outgoing links,
+        resolved against base, the URL it was served from. The streaming
+        pipeline extends this.
+        """
+        if modified:
+            self.save_page(url, content, headers, served_url=base)
+        return self.extract_links(base or url, content) if self.follow_links else set()
+
+    async def crawl_worker(self, session, frontier):
+        """
+        Pull URLs off the shared frontier until the crawl is cancelled. An
+        error on one page is logged and the worker moves on to the next.
+        """
+        while True:
+            url = await frontier.get()
+            try:
+                print(f"Scraping: {url}")
+                result = await self.fetch_page_async(session, url)
+                if self.should_retry(url, result):
+                    frontier.put_nowait(url)
+                    continue
+
+                if result.content:
+                    # Parsing and disk writes run off the event loop so other fetches keep going
+                    new_urls = await asyncio.to_thread(self.process_page, self.canonicalize(url), result)
+                    new_urls = self.filter_new(new_urls)
+                    self.visited_urls.update(self.canonicalize(new_url) for new_url in new_urls)
+                    self.record_queued(new_urls)
+                    for new_url in new_urls:
+                        frontier.put_nowait(new_url)
+                self.record_done(url, result)
+            except Exception as e:
+                print(f"Error crawling {url}: {e!r}")
+            finally:
+                frontier.task_done()
+
+    async def scrape_site_async(self, max_workers=5):
+        """
+        Scrape the entire site with a continuously refilled frontier.
+        Up to max_workers fetches are in flight at any time; a new fetch
+        starts as soon as any of them finishes.
+        """
+        frontier = asyncio.Queue()
+        for url in self.initial_frontier():
+            key = self.canonicalize(url)
+            if key not in self.visited_urls:
+                self.visited_urls.add(key)
+                frontier.put_nowait(url)
+
+        connector = aiohttp.TCPConnector(limit=max_workers)
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            workers = [asyncio.create_task(self.crawl_worker(session, frontier))
+                       for _ in range(max_workers)]
+            reporter = asyncio.create_task(self.report_progress())
+            # Workers only return by failing; waiting on them too keeps a dead worker from hanging the crawl
+            crawl = asyncio.create_task(frontier.join())
+            await asyncio.wait(workers + [crawl], return_when=asyncio.FIRST_COMPLETED)
+
+            for task in workers + [reporter, crawl]:
+                task.cancel()
+            results = await asyncio.gather(*workers, reporter, crawl, return_exceptions=True)
+
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise RuntimeError(f"{len(errors)} crawl worker(s) died") from errors[0]
+
+    async def report_progress(self, interval=10):
+        """Print live crawl throughput while the async crawl runs"""
+        while True:
+            await asyncio.sleep(interval)
+            print(f"Crawl rate: {self.rate_limiter.summary()}")
 
 
 @measure_time
-def run_scrapper():
+def run_scrapper(resume=False, scraper_cls=NortheasternScraper, **scraper_kwargs):
+    """
+    Crawl the OGS site into RAWDATA_DIR.
+
+    Args:
+        resume (bool): Continue from the checkpoint of an interrupted crawl
+            instead of starting over from the base URL
+        scraper_cls (type): Scraper class to run, e.g. the streaming pipeline's
+        **scraper_kwargs: Extra arguments for scraper_cls
+    """
     base_url = os.getenv('SITEMAP')
     abs_data_dir = os.path.join(os.getenv('HOME_DIR'), os.getenv('RAWDATA_DIR'))
 
-    scraper = NortheasternScraper(base_url, abs_data_dir)
-    scraper.scrape_site(max_workers=int(os.getenv('WORKERS')))
+    max_workers = int(os.getenv('WORKERS'))
+    store = open_raw_store(abs_data_dir, os.getenv('RAW_STORAGE', 'files'), os.getenv('ARCHIVE_COMPRESSION', 'gzip'))
+    manifest = CrawlManifest(manifest_path(abs_data_dir), abs_data_dir, resume=resume, store=store)
+    checkpoint = CrawlCheckpoint(manifest_path(abs_data_dir, 'crawl_checkpoint.log'), on_flush=manifest.save)
+    checkpoint.start(resume=resume)
+    rate_limiter = HostRateLimiter(rate=float(os.getenv('RATE_LIMIT', 5)), max_concurrency=max_workers)
+
+    scraper = scraper_cls(base_url, abs_data_dir, manifest=manifest, checkpoint=checkpoint,
+                          rate_limiter=rate_limiter, discovery=os.getenv('DISCOVERY', 'sitemap+links'),
+                          store=store, **scraper_kwargs)
+    try:
+        if os.getenv('CRAWL_MODE', 'async') == 'async':
+            asyncio.run(scraper.scrape_site_async(max_workers=max_workers))
+        else:
+            scraper.scrape_site(max_workers=max_workers)
+    finally:
+        scraper.close()
+        checkpoint.close()
+        manifest.save()
+
+    # The crawl finished, so there is nothing left to resume
+    checkpoint.clear()
+
     print(f"Scraping completed. Total pages scraped: {len(scraper.visited_urls)}")
+    print(f"Pages changed since last crawl: {len(manifest.changed_files)}")
+    return sorted(manifest.changed_files)
 
 
 if __name__ == "__main__":
+    import utils
+    utils.import_settings()  # This loads vars, do not remove
     run_scrapper()
\ No newline at end of file
@@ -0,0 +1,167 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Responses that mean the server wants us to slow down
+THROTTLE_STATUSES = (429, 503)
+
+
+class HostState:
+    """Token bucket, AIMD window and live counters for one host"""
+
+    def __init__(self, rate, concurrency):
+        self.rate = rate
+        self.tokens = 1.0
+        self.window = concurrency
+        self.in_flight = 0
+        self.last_refill = time.monotonic()
+        self.backoff_until = 0.0
+        self.last_decrease = 0.0
+        self.completed = deque()
+
+
+class HostRateLimiter:
+    """
+    Adaptive per-host politeness policy for the scraper.
+
+    Each host gets a token bucket that caps the request rate and an AIMD
+    (additive increase, multiplicative decrease) window that caps the number
+    of requests in flight. Both grow while responses are fast and healthy.
+    Slow responses shrink the window by one; errors and 429/503 responses
+    halve both. A Retry-After header pauses the host until the given time.
+
+    Any object with the same acquire/acquire_async/release/stats methods can
+    be passed to NortheasternScraper instead.
+
+    Attributes:
+        rate (float): Initial requests per second per host
+        max_rate (float): Upper bound for the adaptive rate
+        min_concurrency / max_concurrency (int): Bounds for the in-flight window
+        target_latency (float): Responses slower than this (seconds) stop the ramp-up
+
+    Example:
+        >>> limiter = HostRateLimiter(rate=5, max_concurrency=30)
+        >>> limiter.acquire('international.northeastern.edu')
+        >>> limiter.release('international.northeastern.edu', latency=0.2, status=200)
+        >>> limiter.stats()['in_flight']
+        0
+    """
+
+    def __init__(self, rate=5.0, max_rate=50.0, min_rate=0.5, min_concurrency=1, max_concurrency=30,
+                 target_latency=2.0, rate_step=1.0, decrease_factor=0.5, stats_window=10.0):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+        self.stats_window = stats_window
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = HostState(self.rate, min(self.max_concurrency, max(self.min_concurrency, 2)))
+        return self.hosts[host]
+
+    def _try_acquire(self, host):
+        """Take a slot for host; returns 0 if granted, otherwise the seconds to wait before retrying"""
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+
+            state.tokens = min(max(1.0, state.rate), state.tokens + (now - state.last_refill) * state.rate)
+            state.last_refill = now
+
+            if now < state.backoff_until:
+                return state.backoff_until - now
+            if state.in_flight >= int(state.window):
+                return 0.05
+            if state.tokens < 1:
+                return (1 - state.tokens) / state.rate
+
+            state.tokens -= 1
+            state.in_flight += 1
+            return 0
+
+    def acquire(self, host):
+        """Block the calling thread until a request to host is allowed"""
+        while (wait := self._try_acquire(host)) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, host):
+        """Wait without blocking the event loop until a request to host is allowed"""
+        while (wait := self._try_acquire(host)) > 0:
+            await asyncio.sleep(wait)
+
+    def release(self, host, latency, status=None, retry_after=None):
+        """
+        Report a finished request and adapt the host's rate and window.
+        status is None when the request failed without a response.
+        """
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            state.in_flight -= 1
+            state.completed.append(now)
+            while now - state.completed[0] > self.stats_window:
+                state.completed.popleft()
+
+            if status is None or status in THROTTLE_STATUSES or status >= 500:
+                delay = parse_retry_after(retry_after)
+                if delay:
+                    state.backoff_until = max(state.backoff_until, now + delay)
+                # Halve at most once per round trip, not once per failed request in flight
+                if now - state.last_decrease > max(latency, 1.0):
+                    state.window = max(self.min_concurrency, state.window * self.decrease_factor)
+                    state.rate = max(self.min_rate, state.rate * self.decrease_factor)
+                    state.last_decrease = now
+            elif latency > self.target_latency:
+                state.window = max(self.min_concurrency, state.window - 1)
+            else:
+                # Roughly +1 slot and +rate_step req/s per full window of healthy responses
+                state.window = min(self.max_concurrency, state.window + 1 / state.window)
+                state.rate = min(self.max_rate, state.rate + self.rate_step / state.window)
+
+    def stats(self, host=None):
+        """Live pages/sec, in-flight requests and current limits, for one host or all hosts"""
+        with self._lock:
+            now = time.monotonic()
+            if host is None:
+                states = list(self.hosts.values())
+            else:
+                states = [self.hosts[host]] if host in self.hosts else []
+            for state in states:
+                while state.completed and now - state.completed[0] > self.stats_window:
+                    state.completed.popleft()
+
+            return {
+                'pages_per_sec': sum(len(s.completed) for s in states) / self.stats_window,
+                'in_flight': sum(s.in_flight for s in states),
+                'concurrency': sum(int(s.window) for s in states),
+                'rate': sum(s.rate for s in states),
+            }
+
+    def summary(self):
+        stats = self.stats()
+        return (f"{stats['pages_per_sec']:.1f} pages/sec, {stats['in_flight']} in flight, "
+                f"window {stats['concurrency']}, rate limit {stats['rate']:.1f} req/s")
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return 0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return 0
@@ -0,0 +1,119 @@
+import gzip
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlparse
+
+# Tried in order when robots.txt does not list any sitemap
+DEFAULT_SITEMAPS = ('/sitemap_index.xml', '/sitemap.xml', '/wp-sitemap.xml')
+
+
+def parse_lastmod(value):
+    """Parse a W3C datetime from <lastmod> into an aware UTC datetime, or None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def parse_sitemap(content):
+    """
+    Parse a sitemap or sitemap index.
+    Returns (is_index, [(loc, lastmod), ...]).
+    """
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+
+    root = ET.fromstring(content)
+    entries = []
+    for node in root:
+        loc, lastmod = None, None
+        for child in node:
+            tag = child.tag.rsplit('}', 1)[-1]
+            if tag == 'loc' and child.text:
+                loc = child.text.strip()
+            elif tag == 'lastmod':
+                lastmod = parse_lastmod(child.text)
+        if loc:
+            entries.append((loc, lastmod))
+
+    return root.tag.rsplit('}', 1)[-1] == 'sitemapindex', entries
+
+
+def find_sitemaps(base_url, fetch):
+    """
+    Sitemap URLs announced in robots.txt. Returns (urls, is_fallback); when
+    robots.txt lists none, the usual default locations are returned as fallbacks.
+    """
+    parsed = urlparse(base_url)
+    root = f"{parsed.scheme}://{parsed.netloc}"
+
+    robots = fetch(urljoin(root, '/robots.txt'))
+    if robots:
+        sitemaps = [line.split(':', 1)[1].strip() for line in robots.decode('utf-8', 'ignore').splitlines()
+                    if line.lower().startswith('sitemap:')]
+        if sitemaps:
+            return sitemaps, False
+
+    return [urljoin(root, path) for path in DEFAULT_SITEMAPS], True
+
+
+def walk_sitemaps(roots, fetch, max_sitemaps=500):
+    """
+    Read the given sitemaps and every sitemap index below them.
+    Returns {page url: lastmod}, or None if none of them could be read.
+    """
+    pending, seen, pages, found = list(roots), set(), {}, False
+
+    while pending and len(seen) < max_sitemaps:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+
+        content = fetch(sitemap_url)
+        if not content:
+            continue
+        try:
+            is_index, entries = parse_sitemap(content)
+        except (ET.ParseError, OSError) as e:
+            print(f"Error parsing sitemap {sitemap_url}: {str(e)}")
+            continue
+
+        found = True
+        if is_index:
+            pending.extend(loc for loc, _ in entries)
+        else:
+            pages.update(entries)
+
+    return pages if found else None
+
+
+def read_sitemaps(base_url, fetch, max_sitemaps=500):
+    """
+    Collect every page listed in the site's sitemap index(es).
+
+    Args:
+        base_url (str): Site to discover sitemaps for
+        fetch (callable): Returns the raw bytes of a URL, or None on failure
+        max_sitemaps (int): Safety cap on the number of sitemap files read
+
+    Returns:
+        dict mapping page URL to its lastmod datetime (None if not given),
+        or None if the site has no readable sitemap.
+    """
+    sitemaps, is_fallback = find_sitemaps(base_url, fetch)
+
+    # Default locations are alternatives for the same sitemap; use the first one that works
+    candidates = [[url] for url in sitemaps] if is_fallback else [sitemaps]
+    for roots in candidates:
+        pages = walk_sitemaps(roots, fetch, max_sitemaps)
+        if pages is not None:
+            print(f"Sitemap lists {len(pages)} pages")
+            return pages
+
+    return None
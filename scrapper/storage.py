@@ -0,0 +1,178 @@
+import os
+import json
+import gzip
+import threading
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_NAME = 'pages.archive'
+INDEX_SUFFIX = '.idx'
+
+
+class DirectoryStore:
+    """
+    Raw page storage as one HTML file per page (the default layout).
+    PageArchive offers the same interface backed by a single file.
+    """
+
+    def __init__(self, data_dir):
+        self.dir = data_dir
+
+    def exists(self, filename):
+        return os.path.isfile(os.path.join(self.dir, filename))
+
+    def read(self, filename):
+        with open(os.path.join(self.dir, filename), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def write(self, filename, content, url=None, headers=None):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(os.path.join(self.dir, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def iter_pages(self, files=None):
+        """Yield (filename, content) for every stored page, or only the given filenames"""
+        for filename in (sorted(os.listdir(self.dir)) if files is None else files):
+            if filename.endswith('.html') and self.exists(filename):
+                yield filename, self.read(filename)
+
+
+class PageArchive:
+    """
+    Append-only, compressed single-file store for raw pages, similar in spirit to WARC.
+
+    Every record is compressed on its own (a gzip member or zstd frame) and
+    appended to the archive file. A record holds a JSON header with the URL,
+    response headers and fetch time, followed by the page body. A JSON-lines
+    index next to the archive maps each filename to the offset and length of
+    its latest record, so pages can be read back individually or streamed in
+    file order. Rewritten pages leave their old record behind until compact().
+
+    Example:
+        >>> archive = PageArchive('data/raw/pages.archive')
+        >>> archive.write('index.html', '<html>...</html>', url='https://international.northeastern.edu/ogs')
+        >>> for filename, content in archive.iter_pages():
+        ...     print(filename)
+    """
+
+    def __init__(self, path, compression='gzip'):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.compression = compression
+        self.index = {}
+        self._lock = threading.Lock()
+
+        if os.path.isfile(self.index_path):
+            self._load_index()
+        elif compression == 'zstd' and zstandard is None:
+            raise ImportError("zstd compression requires the 'zstandard' package")
+
+    def _load_index(self):
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            self.compression = json.loads(f.readline())['compression']
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Interrupted write; the record it described is ignored
+                self.index[entry['file']] = entry
+
+    def _compress(self, data):
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor().compress(data)
+        return gzip.compress(data)
+
+    def _decompress(self, data):
+        if self.compression == 'zstd':
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    @staticmethod
+    def exists_in(data_dir):
+        return os.path.isfile(os.path.join(data_dir, ARCHIVE_NAME + INDEX_SUFFIX))
+
+    def exists(self, filename):
+        return filename in self.index
+
+    def write(self, filename, content, url=None, headers=None):
+        header = {
+            'url': url,
+            'file': filename,
+            'fetched_at': datetime.now(timezone.utc).isoformat(),
+            'headers': dict(headers or {}),
+        }
+        record = self._compress(json.dumps(header).encode('utf-8') + b'\n' + content.encode('utf-8'))
+
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            new_index = not os.path.isfile(self.index_path)
+            with open(self.path, 'ab') as f:
+                offset = f.tell()
+                f.write(record)
+
+            entry = {'file': filename, 'url': url, 'offset': offset, 'length': len(record),
+                     'fetched_at': header['fetched_at']}
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                if new_index:
+                    f.write(json.dumps({'format': 1, 'compression': self.compression}) + '\n')
+                f.write(json.dumps(entry) + '\n')
+            self.index[filename] = entry
+
+    def read_record(self, filename):
+        """Return (header, content) of the latest record stored for filename"""
+        entry = self.index[filename]
+        with open(self.path, 'rb') as f:
+            f.seek(entry['offset'])
+            return self._parse_record(f.read(entry['length']))
+
+    def read(self, filename):
+        return self.read_record(filename)[1]
+
+    def _parse_record(self, data):
+        header, _, body = self._decompress(data).partition(b'\n')
+        return json.loads(header), body.decode('utf-8')
+
+    def iter_records(self, files=None):
+        """Stream (header, content) of the latest records in archive order"""
+        wanted = self.index if files is None else {f: self.index[f] for f in files if f in self.index}
+        with open(self.path, 'rb') as f:
+            for entry in sorted(wanted.values(), key=lambda e: e['offset']):
+                f.seek(entry['offset'])
+                yield self._parse_record(f.read(entry['length']))
+
+    def iter_pages(self, files=None):
+        for header, content in self.iter_records(files):
+            yield header['file'], content
+
+    def compact(self):
+        """Rewrite the archive keeping only the latest record of each page"""
+        with self._lock:
+            tmp_path, tmp_index = self.path + '.tmp', self.index_path + '.tmp'
+            new_index = {}
+            with open(self.path, 'rb') as src, open(tmp_path, 'wb') as dst, \
+                    open(tmp_index, 'w', encoding='utf-8') as idx:
+                idx.write(json.dumps({'format': 1, 'compression': self.compression}) + '\n')
+                for entry in sorted(self.index.values(), key=lambda e: e['offset']):
+                    src.seek(entry['offset'])
+                    new_entry = dict(entry, offset=dst.tell())
+                    dst.write(src.read(entry['length']))
+                    idx.write(json.dumps(new_entry) + '\n')
+                    new_index[entry['file']] = new_entry
+
+            os.replace(tmp_path, self.path)
+            os.replace(tmp_index, self.index_path)
+            self.index = new_index
+
+
+def open_raw_store(data_dir, storage='files', compression='gzip'):
+    """
+    Raw page store for a data directory. An existing archive in data_dir is
+    always used, so readers do not need to know how the pages were saved.
+    """
+    if storage == 'archive' or PageArchive.exists_in(data_dir):
+        return PageArchive(os.path.join(data_dir, ARCHIVE_NAME), compression=compression)
+    return DirectoryStore(data_dir)
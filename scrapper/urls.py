@@ -0,0 +1,43 @@
+import posixpath
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# Query parameters that only track where a visitor came from and never change the page
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', '_ga', '_gl'}
+INDEX_PAGES = ('index.html', 'index.htm', 'index.php')
+
+
+def canonicalize_url(url, scheme=None):
+    """
+    Normalize a URL so that every spelling of the same page maps to one key.
+
+    - lowercases the host and drops default ports and fragments
+    - forces the given scheme (e.g. the base URL's) so http/https variants match
+    - resolves '.' / '..' segments, duplicate slashes and trailing index pages
+    - strips the trailing slash from non-root paths
+    - removes tracking parameters (utm_*, fbclid, ...) and sorts the rest
+
+    Example:
+        >>> canonicalize_url('HTTP://International.Northeastern.edu:80/ogs/?utm_source=x#top', 'https')
+        'https://international.northeastern.edu/ogs'
+    """
+    parsed = urlparse(url)
+    scheme = (scheme or parsed.scheme).lower()
+
+    host = (parsed.hostname or '').lower()
+    if parsed.port and (parsed.scheme, parsed.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parsed.port}"
+
+    path = posixpath.normpath(parsed.path) if parsed.path else '/'
+    if path.startswith('//'):
+        path = '/' + path.lstrip('/')
+    if posixpath.basename(path) in INDEX_PAGES:
+        path = posixpath.dirname(path)
+    if path in ('', '.'):
+        path = '/'
+    if path != '/':
+        path = path.rstrip('/')
+
+    query = [(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+             if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS]
+
+    return urlunparse((scheme, host, path, '', urlencode(sorted(query)), ''))
@@ -0,0 +1,18 @@
+import pytest
+
+from benchmarks.site import SiteConfig, SyntheticSite
+
+
+@pytest.fixture
+def synthetic_site():
+    """Factory for local stand-in sites: synthetic_site(pages=50, error_rate=0.1, ...) -> running SyntheticSite"""
+    sites = []
+
+    def start(**config):
+        site = SyntheticSite(SiteConfig(**config)).start()
+        sites.append(site)
+        return site
+
+    yield start
+    for site in sites:
+        site.stop()
@@ -0,0 +1,238 @@
+import numpy as np
+import pytest
+
+
+def fake_embed(calls):
+    """Embedding function with vectors derived from the text, recording what it was asked to embed"""
+    def embed(texts):
+        calls.append(list(texts))
+        return np.array([[len(text), sum(map(ord, text)) % 97, 1.0] for text in texts], dtype=np.float32)
+    return embed
+
+
+def test_embedding_cache_embeds_only_misses(tmp_path):
+    from embeddings.cache import EmbeddingCache
+
+    calls = []
+    with EmbeddingCache(str(tmp_path), "model-a") as cache:
+        first = cache.embed(["Apply for OPT.", "CPT rules.", "Apply for OPT."], fake_embed(calls))
+        assert calls == [["Apply for OPT.", "CPT rules."]]
+        assert first.shape == (3, 3) and (first[0] == first[2]).all()
+
+    # A new process sees the stored vectors; whitespace differences share an entry
+    with EmbeddingCache(str(tmp_path), "model-a") as cache:
+        second = cache.embed(["  Apply for\nOPT. ", "SEVIS fee."], fake_embed(calls))
+        assert calls[1:] == [["SEVIS fee."]]
+        assert (second[0] == first[0]).all()
+        assert (cache.hits, cache.misses, cache.hit_rate) == (1, 1, 0.5)
+        assert cache.rows == 3
+
+    # Another model never reads model-a's vectors
+    with EmbeddingCache(str(tmp_path), "model-b") as cache:
+        cache.embed(["CPT rules."], fake_embed(calls))
+        assert calls[-1] == ["CPT rules."] and cache.rows == 1
+
+
+def test_embedding_cache_ignores_uncommitted_rows(tmp_path):
+    from embeddings.cache import EmbeddingCache
+
+    with EmbeddingCache(str(tmp_path), "model-a") as cache:
+        cache.embed(["one"], fake_embed([]))
+        # Rows written by an append that crashed before the SQLite commit
+        with open(cache.matrix_path, "ab") as f:
+            f.write(np.ones((2, 3), dtype=np.float32).tobytes())
+
+    with EmbeddingCache(str(tmp_path), "model-a") as cache:
+        vectors = cache.embed(["one", "two"], fake_embed([]))
+        assert cache.rows == 2
+        assert (vectors[1] == fake_embed([])(["two"])[0]).all()
+
+
+def test_cached_llama_index_embedding(tmp_path):
+    from llama_index.core.embeddings import MockEmbedding
+    from embeddings.llama import CachedEmbedding
+
+    embed_model = CachedEmbedding(MockEmbedding(embed_dim=8), str(tmp_path))
+    assert len(embed_model.get_text_embedding_batch(["a", "b", "a"])) == 3
+    embed_model.get_text_embedding("b")
+    assert (embed_model.cache.hits, embed_model.cache.misses) == (2, 2)
+    assert len(embed_model.get_query_embedding("q")) == 8
+
+
+def test_pooling_and_parity():
+    from embeddings.backends import pool, cosine_parity
+
+    hidden = np.array([[[3.0, 4.0], [1.0, 0.0], [9.0, 9.0]]])
+    mask = np.array([[1, 1, 0]])
+    assert np.allclose(pool(hidden, mask, 'cls'), [[0.6, 0.8]])
+    # Padding tokens are left out of the mean
+    assert np.allclose(pool(hidden, mask, 'mean'), [[2.0, 2.0]] / np.sqrt(8))
+
+    reference = np.array([[1.0, 0.0], [0.0, 1.0]])
+    assert cosine_parity(reference, reference * 3) == (1.0, 1.0)
+    min_cos, mean_cos = cosine_parity(reference, np.array([[1.0, 0.0], [1.0, 1.0]]))
+    assert np.isclose(min_cos, np.sqrt(0.5)) and np.isclose(mean_cos, (1 + np.sqrt(0.5)) / 2)
+
+
+def test_get_encoder_needs_an_installed_backend(monkeypatch):
+    import pytest
+    from embeddings import backends
+
+    monkeypatch.setattr(backends, "available_backends", lambda model_name=None: [])
+    assert backends.select_device("cpu") == "cpu"
+    with pytest.raises(ImportError, match="torch embedding backend is not installed"):
+        backends.get_encoder("BAAI/bge-small-en", backend="auto", device="cpu")
+
+
+def test_token_batches_respect_the_budget_and_restore_order():
+    from embeddings.batching import token_batches, embed_in_batches, PaddingStats
+
+    lengths = [5, 300, 7, 280, 6, 900]
+    batches = token_batches(lengths, max_tokens=600, max_batch=2)
+    # Longest first; an over-long text gets a batch of its own
+    assert batches == [[5], [1, 3], [2, 4], [0]]
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    assert all(len(batch) * lengths[batch[0]] <= 600 for batch in batches if len(batch) > 1)
+
+    calls, stats = [], PaddingStats()
+    texts = ["x" * length for length in lengths]
+    vectors = embed_in_batches(texts, lengths, fake_embed(calls), stats, max_tokens=600, max_batch=2)
+    assert (vectors == fake_embed([])(texts)).all()
+    assert calls[1] == [texts[1], texts[3]]
+    # Bucketing pads far less than one fixed batch of all six texts
+    assert stats.tokens == sum(lengths)
+    assert stats.slots - stats.tokens < stats.fixed_slots - stats.tokens
+
+
+class FakeEncoder:
+    """Encoder stand-in for worker processes: vectors derived from the text, as in fake_embed"""
+
+    def __init__(self, threads=None):
+        from embeddings.batching import PaddingStats
+
+        self.name, self.query_instruction, self.padding = "fake", "", PaddingStats()
+        self.threads = threads
+
+    def encode(self, texts, out=None):
+        from embeddings.batching import embed_in_batches
+
+        return embed_in_batches(texts, [len(text) for text in texts], fake_embed([]), self.padding, out=out)
+
+
+def test_parallel_encoder_fills_the_shared_matrix_in_order():
+    from embeddings.parallel import ParallelEncoder, shard_ranges
+
+    assert shard_ranges([1] * 8, 4) == [(0, 2), (2, 4), (4, 6), (6, 8)]
+    assert shard_ranges([10, 1, 1, 1, 1], 2) == [(0, 1), (1, 5)]
+    assert shard_ranges([3, 4], 8) == [(0, 1), (1, 2)]
+
+    texts = [f"chunk {i} " + "word " * (i % 7) for i in range(50)]
+    with ParallelEncoder(FakeEncoder, workers=2) as encoder:
+        assert (encoder.name, encoder.dim) == ("fake", 3)
+        vectors = encoder.encode(texts)
+    assert (vectors == fake_embed([])(texts)).all()
+    assert encoder.padding.tokens == sum(map(len, texts))
+
+
+def test_quantized_vectors_search_and_rescore(tmp_path):
+    from embeddings.quantized import QuantizedVectors, MODES
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 32))
+    vectors = centers[rng.integers(0, 20, 600)] + 0.3 * rng.normal(size=(600, 32))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[:20] + 0.05 * rng.normal(size=(20, 32))
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :5]
+
+    sizes = {}
+    for mode in MODES:
+        QuantizedVectors.build(str(tmp_path / mode), vectors, mode=mode, keep_full=True)
+        store = QuantizedVectors(str(tmp_path / mode))
+        sizes[mode] = store.codes.nbytes
+        scores, rows = store.search(queries, k=5, rescore=100)
+        # Exact re-scoring of enough candidates recovers the float32 neighbors
+        assert (rows == exact).all()
+        assert (np.diff(scores, axis=1) <= 0).all()
+    assert sizes == {'float32': 600 * 32 * 4, 'float16': 600 * 32 * 2, 'int8': 600 * 32, 'pq': 600 * 4}
+
+    # L2 distances come back smallest first, like a FAISS IndexFlatL2
+    store = QuantizedVectors.build(str(tmp_path / "l2"), vectors, mode='float32', metric='l2')
+    distances, rows = store.search(vectors[:3], k=2)
+    assert (rows[:, 0] == [0, 1, 2]).all() and np.allclose(distances[:, 0], 0, atol=1e-5)
+
+
+def test_retrieval_bundle_keeps_rows_aligned(tmp_path):
+    import pytest
+    from preprocessing.chunkstore import ChunkStore, chunk_record, write_chunk_file
+    from embeddings.bundle import RetrievalBundle
+
+    texts = ["Apply for OPT.", "CPT rules for the summer.", "Pay the SEVIS fee early.", "Travel signatures."]
+    write_chunk_file(str(tmp_path / "chunked_a.jsonl"),
+                     [chunk_record("a.html", None, i, text, len(text.split())) for i, text in enumerate(texts)])
+    ChunkStore.build(str(tmp_path))
+
+    calls = []
+    bundle = RetrievalBundle.build(str(tmp_path / "bundle"), str(tmp_path / "chunks.jsonl"), fake_embed(calls),
+                                   model_name="fake", mode='float32', metric='l2')
+    assert calls == [texts]
+    bundle.close()
+
+    with RetrievalBundle(str(tmp_path / "bundle")) as bundle:
+        assert (len(bundle), bundle.model_name) == (4, "fake")
+        # Every chunk is its own nearest vector, and its row holds its text and token count
+        _, rows = bundle.vectors.search(fake_embed([])(texts), k=1)
+        assert [bundle.chunks[int(row)]['text'] for row in rows[:, 0]] == texts
+        assert list(bundle.tokens) == [3, 5, 5, 2]
+        assert bundle.row("a.html:2") == 2
+        with pytest.raises(KeyError):
+            bundle.row("b.html:0")
+
+    # A file that no longer matches the bundle is refused
+    with open(tmp_path / "bundle" / "tokens.npy", "ab") as f:
+        f.write(b"\0" * 4)
+    with pytest.raises(ValueError, match="rebuild the bundle"):
+        RetrievalBundle(str(tmp_path / "bundle"))
+
+
+def test_onnx_backend_needs_torch_or_an_exported_graph(monkeypatch, tmp_path):
+    import os
+    from embeddings import backends
+
+    installed = {"onnxruntime", "transformers"}
+    monkeypatch.setattr(backends, "find_spec", lambda name: object() if name in installed else None)
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", str(tmp_path))
+
+    # Without torch the graph cannot be exported on first use
+    assert backends.available_backends("BAAI/bge-small-en") == []
+    os.makedirs(backends.onnx_model_dir("BAAI/bge-small-en"))
+    open(backends.onnx_graph_path("BAAI/bge-small-en"), "wb").close()
+    assert backends.available_backends("BAAI/bge-small-en") == ["onnx"]
+
+    installed.add("torch")
+    assert backends.available_backends() == ["torch", "onnx"]
+
+
+def test_embedding_workers_are_opt_in(monkeypatch):
+    from embeddings.parallel import resolve_embed_workers
+
+    monkeypatch.delenv("EMBED_WORKERS", raising=False)
+    assert resolve_embed_workers() == 1
+    monkeypatch.setenv("EMBED_WORKERS", "3")
+    assert resolve_embed_workers() == 3
+    monkeypatch.setenv("EMBED_WORKERS", "0")
+    assert resolve_embed_workers() >= 1
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_onnx_embeddings_match_torch(quantize, tmp_path, monkeypatch):
+    for package in ("torch", "transformers", "onnxruntime"):
+        pytest.importorskip(package)
+    from embeddings.backends import TorchEncoder, OnnxEncoder, cosine_parity, PARITY_TOLERANCE
+
+    monkeypatch.setenv("EMBEDDING_CACHE_DIR", str(tmp_path))
+    texts = ["Apply for OPT up to 90 days before your program end date.",
+             "Your I-20 needs a valid travel signature to re-enter the United States.",
+             "Contact OGS"]
+    reference = TorchEncoder("BAAI/bge-small-en", device="cpu").encode(texts)
+    min_cos, _ = cosine_parity(reference, OnnxEncoder("BAAI/bge-small-en", quantize=quantize).encode(texts))
+    assert min_cos >= PARITY_TOLERANCE
@@ -0,0 +1,387 @@
+import os
+import sys
+import subprocess
+
+import pytest
+from bs4 import BeautifulSoup
+
+from preprocessing.cleaning import clean_html, clean_soup
+from preprocessing.streaming import parse_page
+
+
+PAGE = """
+<html>
+    <head><title>OGS</title><script>var x = 1;</script></head>
+    <body class="page">
+        <nav><a href="/ogs/contact" class="menu">Contact   OGS</a></nav>
+        <div id="main">
+            <h1>Maintaining F-1 Status</h1>
+            <p>Students must enroll full time.
+               Reduced course load requires approval.</p>
+            <span>Apply through <a href="https://international.northeastern.edu/ogs/rcl" target="_blank">myOGS</a>.</span>
+        </div>
+    </body>
+</html>
+"""
+
+
+def test_clean_soup_matches_clean_html():
+    assert clean_soup(BeautifulSoup(PAGE, 'html.parser')) == clean_html(PAGE)
+
+
+@pytest.mark.parametrize("markup", [
+    "<p>a<p>b</p></p><span><div></span>text</div></div>",
+    "<!DOCTYPE html><!----><!-- a >  < b --><p> &#65;&#x42;&#150; &foo; &amp &nbsp;x &lt;</p>",
+    "<a href>x</a><a href=''>y</a><a href=\"a'b\">z</a><a href='/x?a=1&b=2' href='/y'>dup</a>",
+    "<br/><p/><div/> <br></br><script>if (a < b) {}</script><![CDATA[ x ]]><?xml version='1.0'?>",
+    "<table><tr><td>1<td>2</table><p>Unclosed <div>nest <h2>head",
+])
+def test_streaming_cleaner_matches_clean_soup(markup):
+    from preprocessing.cleaning import StreamingCleaner
+    from utils.parsers import get_parser
+
+    cleaner = StreamingCleaner()
+    assert cleaner.clean(markup) == clean_soup(BeautifulSoup(markup, 'html.parser'))
+    assert cleaner.hrefs == get_parser('html.parser').hrefs(markup)
+
+
+def test_cleaned_text_without_parsing():
+    from preprocessing.chunking import extract_text_from_cleaned_html
+    from utils.parsers import get_parser
+
+    cleaned_html = clean_html(PAGE + "<p>Fees &amp; costs&nbsp;</p><!-- a > b -->")
+    assert extract_text_from_cleaned_html(cleaned_html) == get_parser('html.parser').text(cleaned_html)
+
+
+def test_parse_page_links_only():
+    hrefs, cleaned_html, chunks = parse_page(PAGE, chunk=False)
+
+    assert hrefs == ["/ogs/contact", "https://international.northeastern.edu/ogs/rcl"]
+    assert cleaned_html is None and chunks is None
+
+
+def test_parse_page_single_parse_matches_staged_pipeline():
+    from preprocessing.chunking import chunk_cleaned_html
+
+    _, cleaned_html, chunks = parse_page(PAGE)
+
+    assert cleaned_html == clean_html(PAGE)
+    assert chunks == chunk_cleaned_html(clean_html(PAGE))
+
+
+def test_pack_sentences_token_budget():
+    from preprocessing.chunking import pack_sentences, count_tokens
+
+    sentences = [f"Sentence number {i} is about visas and work permits." for i in range(40)]
+    chunks = pack_sentences(sentences, chunk_size=50, chunk_overlap=12)
+
+    assert 1 < len(chunks) < len(sentences)
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    # Every sentence is kept, in order, and each chunk repeats the last sentence of the previous one
+    assert chunks[0].startswith(sentences[0]) and chunks[-1].endswith(sentences[-1])
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.startswith(previous.split(". ")[-1])
+
+    long_sentence = " ".join(["word"] * 200)
+    chunks = pack_sentences(["Short one.", long_sentence, "Another."], chunk_size=50, chunk_overlap=0)
+    assert chunks[0] == "Short one." and chunks[-1] == "Another."
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+
+
+def test_split_sections_at_headings():
+    from preprocessing.chunking import split_sections, chunk_records
+
+    cleaned_html = clean_html("<p>Intro text.</p><h1>OGS</h1><h2>Visas</h2>"
+                              "<p>Apply <a href='/ogs/apply?utm_source=x'>early</a>.</p>"
+                              "<h3>Fees</h3><ul><li><a href='mailto:ogs@example.edu'>$100</a></li></ul>"
+                              "<h2>Work &amp; travel</h2><p>See <a href='https://example.edu/ogs/opt#top'>OPT</a>"
+                              " and <a href='/ogs/opt'>OPT</a>.</p>")
+    sections = split_sections(cleaned_html)
+
+    # The h1 has no text of its own before the h2, so it opens the h2's section
+    assert [section['text'] for section in sections] == [
+        "Intro text.", "OGS Visas Apply early .", "Fees $100", "Work & travel See OPT and OPT ."]
+    assert [section['headings'] for section in sections] == [
+        [], ["OGS", "Visas"], ["OGS", "Visas", "Fees"], ["OGS", "Work & travel"]]
+    assert sections[1]['links'] == ["/ogs/apply?utm_source=x"]
+
+    records = chunk_records("ogs.html", "https://example.edu/ogs/", sections)
+    assert [record['url'] for record in records] == ["https://example.edu/ogs"] * 4
+    assert records[1]['links'] == ["https://example.edu/ogs/apply"]
+    assert records[2]['links'] == []
+    assert records[3]['links'] == ["https://example.edu/ogs/opt"]
+
+    # A trailing heading with nothing after it is kept
+    assert [section['text'] for section in split_sections(clean_html("<p>Body.</p><h2>Contact</h2>"))] == [
+        "Body.", "Contact"]
+
+
+@pytest.mark.parametrize("backend", ["lxml", "selectolax"])
+def test_parser_backends_match_html_parser(backend):
+    from benchmarks.corpus import generate_corpus
+    from utils.parsers import get_parser, available_backends
+
+    if backend not in available_backends():
+        pytest.skip(f"{backend} is not installed")
+
+    reference, parser = get_parser('html.parser'), get_parser(backend)
+    for page in list(generate_corpus(5).values()) + [PAGE]:
+        cleaned_html = clean_html(page, reference)
+        assert clean_html(page, parser) == cleaned_html
+        assert parser.hrefs(page) == reference.hrefs(page)
+        assert parser.text(cleaned_html) == reference.text(cleaned_html)
+
+
+def test_parallel_cleaning_matches_serial(tmp_path):
+    from benchmarks.corpus import generate_corpus
+    from preprocessing.cleaning import process_cleaning
+
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    for path, page in generate_corpus(20).items():
+        (raw_dir / f"{path.strip('/')}.html").write_text(page, encoding="utf-8")
+
+    process_cleaning(str(raw_dir), str(tmp_path / "serial"))
+    process_cleaning(str(raw_dir), str(tmp_path / "parallel"), workers=2)
+
+    serial = {path.name: path.read_text() for path in (tmp_path / "serial").iterdir()}
+    parallel = {path.name: path.read_text() for path in (tmp_path / "parallel").iterdir()}
+    assert len(serial) == 20 and parallel == serial
+
+
+def test_incremental_preprocessing_manifest(tmp_path):
+    from preprocessing.cleaning import process_cleaning
+    from preprocessing.chunking import chunk_filename
+    from preprocessing.manifest import PreprocessManifest
+    from scrapper.storage import DirectoryStore
+
+    raw_dir, clean_dir, chunk_dir = tmp_path / "raw", tmp_path / "cleaned", tmp_path / "chunked"
+    raw_dir.mkdir()
+    chunk_dir.mkdir()
+    for name in ["a", "b", "c"]:
+        (raw_dir / f"{name}.html").write_text(f"<p>Page {name}</p>", encoding="utf-8")
+
+    def run():
+        manifest = PreprocessManifest(str(tmp_path / "preprocess_manifest.json"), str(chunk_dir))
+        cleaned = process_cleaning(str(raw_dir), str(clean_dir), manifest=manifest)
+        for filename in cleaned:  # Stand-in for chunking, which needs the NLTK data
+            (chunk_dir / chunk_filename(filename)).write_text("{}\n", encoding="utf-8")
+        manifest.remove_deleted(DirectoryStore(str(raw_dir)), str(clean_dir))
+        manifest.save()
+        return cleaned, manifest
+
+    cleaned, manifest = run()
+    assert cleaned == ["a.html", "b.html", "c.html"]
+    manifest.mark_indexed()
+
+    assert run()[0] == []
+
+    (raw_dir / "b.html").write_text("<p>Page b, updated</p>", encoding="utf-8")
+    (raw_dir / "c.html").unlink()
+    cleaned, manifest = run()
+
+    assert cleaned == ["b.html"]
+    assert manifest.deleted_files == {"chunked_c.jsonl"}
+    assert not (clean_dir / "c.html").exists() and not (chunk_dir / "chunked_c.jsonl").exists()
+    assert manifest.pending_changes() == (["chunked_b.jsonl"], ["chunked_c.jsonl"])
+
+
+def test_chunk_store_random_access(tmp_path):
+    from preprocessing.chunking import chunk_records, chunk_filename
+    from preprocessing.chunkstore import ChunkStore, write_chunk_file, read_chunks
+
+    pages = {"b.html": ["Second page."], "a.html": ["Fees &amp; costs.", "  ", "Apply through myOGS \u2713"]}
+    for filename, texts in pages.items():
+        chunks = [{"text": text, "headings": ["OGS"], "links": []} for text in texts]
+        write_chunk_file(str(tmp_path / chunk_filename(filename)),
+                         chunk_records(filename, f"https://example.edu/{filename}", chunks))
+
+    assert ChunkStore.build(str(tmp_path)) == 3
+    with ChunkStore(str(tmp_path / "chunks.jsonl")) as store:
+        assert len(store) == 3
+        assert store[1] == {"id": "a.html:1", "source": "a.html", "url": "https://example.edu/a.html",
+                            "ordinal": 1, "text": "Apply through myOGS \u2713", "tokens": store[1]["tokens"],
+                            "headings": ["OGS"], "links": [], "aliases": []}
+        assert store[1]["tokens"] > 0
+        assert store[-1]["id"] == "b.html:0"
+        assert store.texts() == ["Fees &amp; costs.", "Apply through myOGS \u2713", "Second page."]
+
+    assert read_chunks(str(tmp_path), files=["chunked_b.jsonl"]) == [("b.html", "Second page.")]
+
+
+def test_boilerplate_blocks_are_dropped():
+    from benchmarks.corpus import generate_corpus
+    from preprocessing.boilerplate import detect_boilerplate, strip_boilerplate
+    from preprocessing.chunking import split_sections, boilerplate_removal
+
+    pages = [clean_html(page) for page in generate_corpus(10).values()]
+    boilerplate = detect_boilerplate(pages, share=0.5)
+
+    assert boilerplate and detect_boilerplate(pages[:4]) == frozenset()
+    for page in pages:
+        stripped = strip_boilerplate(page, boilerplate)
+        text = " ".join(section['text'] for section in split_sections(stripped))
+        assert "We use cookies" not in text and "405 Ell Hall" not in text and "Forms & Guides" not in text
+        # Page content and the heading structure are kept
+        assert [s['headings'] for s in split_sections(stripped) if s['headings']] == \
+            [s['headings'] for s in split_sections(page) if s['headings']]
+        assert "Related:" in text
+
+        removed_bytes, removed_chunks = boilerplate_removal(page, boilerplate)
+        assert removed_bytes == len(page.encode('utf-8')) - len(stripped.encode('utf-8'))
+        # Menus and footers share sections with page content here and fit in its chunks
+        assert removed_chunks == 0
+
+    # A repeated section is dropped with its heading, and with it a chunk of every page
+    pages = [clean_html(f"<h1>Page {i}</h1><p>Body {i}.</p><h2>Contact us</h2><p>405 Ell Hall</p>") for i in range(6)]
+    boilerplate = detect_boilerplate(pages)
+    assert [section['text'] for section in split_sections(strip_boilerplate(pages[0], boilerplate))] == \
+        ["Page 0 Body 0."]
+    assert boilerplate_removal(pages[0], boilerplate) == (len("Contact us405 Ell Hall"), 1)
+
+
+def test_near_duplicate_chunks_collapse_into_aliases(tmp_path):
+    from preprocessing.chunking import chunk_records, chunk_filename
+    from preprocessing.chunkstore import ChunkStore, write_chunk_file
+    from preprocessing.dedup import near_duplicates
+
+    contact = "Contact OGS at ogs@northeastern.edu or +1-617-373-2310 with any questions about your F-1 status."
+    eligibility = ("Students must maintain full-time enrollment during each academic term and may only work "
+                   "on campus up to twenty hours a week while classes are in session. Reduced course load "
+                   "requires approval from OGS before the term starts, and dependents in F-2 status may not "
+                   "work but can study part time. Keep copies of all immigration documents in a safe place.")
+    pages = {
+        "a.html": [contact, "OPT lets F-1 students work in their field of study."],
+        "b.html": [contact.replace("OGS", "ogs"), eligibility],
+        "c.html": [contact + " Thanks!", eligibility.replace("twenty", "20"), "CPT must be part of the curriculum."],
+    }
+    for filename, texts in pages.items():
+        write_chunk_file(str(tmp_path / chunk_filename(filename)),
+                         chunk_records(filename, f"https://example.edu/{filename}", [{"text": t} for t in texts]))
+
+    assert near_duplicates(["Apply for OPT.", "Apply for CPT."]) == [0, 1]
+    assert ChunkStore.build(str(tmp_path), threshold=0) == 7
+    assert ChunkStore.build(str(tmp_path)) == 4
+    with ChunkStore(str(tmp_path / "chunks.jsonl")) as store:
+        records = {record["id"]: record for record in store}
+
+    assert sorted(records) == ["a.html:0", "a.html:1", "b.html:1", "c.html:2"]
+    assert [alias["id"] for alias in records["a.html:0"]["aliases"]] == ["b.html:0", "c.html:0"]
+    assert records["b.html:1"]["aliases"] == [{"id": "c.html:1", "source": "c.html", "url": "https://example.edu/c.html"}]
+    assert records["c.html:2"]["aliases"] == []
+
+
+def test_pipeline_imports_no_heavy_dependencies():
+    # The pipeline must start quickly and offline: NLTK, llama_index and the model stack load on use
+    code = ("import sys, app, scrapper, preprocessing; "
+            "print(sorted(m for m in ('nltk', 'llama_index', 'torch', 'anthropic', 'transformers') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_imports_do_not_load_settings():
+    # Only the entry points load config.ini into the environment
+    env = {key: value for key, value in os.environ.items() if key != "ENV_STATUS"}
+    code = "import os, app, scrapper, preprocessing; print(os.getenv('ENV_STATUS'))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == "None"
+
+
+def test_sentence_splitting_without_punkt(monkeypatch):
+    from preprocessing import chunking
+
+    monkeypatch.setattr(chunking, "sentence_splitter", lambda: "regex")
+    text = "Apply through myOGS. The fee is $100 (U.S.) per term! Is it refundable? \"No,\" says OGS."
+    assert chunking.sentence_based_chunking(text) == [
+        "Apply through myOGS.", "The fee is $100 (U.S.) per term!", "Is it refundable?", "\"No,\" says OGS."]
+
+
+def test_run_cleaner_picks_up_changes_of_an_unpreprocessed_crawl(tmp_path, monkeypatch):
+    from preprocessing.main import run_cleaner
+
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    for name in ["a", "b"]:
+        (raw_dir / f"{name}.html").write_text(f"<p>Page {name}.</p>", encoding="utf-8")
+    for var, name in [("RAWDATA_DIR", "raw"), ("CLEANDATA_DIR", "cleaned"), ("CHUNKDATA_DIR", "chunked")]:
+        monkeypatch.setenv(var, str(tmp_path / name) + "/")
+    monkeypatch.setenv("PREPROCESS_WORKERS", "1")
+
+    assert run_cleaner() == ["chunked_a.jsonl", "chunked_b.jsonl"]
+
+    # A crawl changed b.html but the run stopped before cleaning; the crawl's list of changes is gone
+    (raw_dir / "b.html").write_text("<p>Page b, updated.</p>", encoding="utf-8")
+    assert run_cleaner() == ["chunked_b.jsonl"]
+    assert run_cleaner() == []
+
+
+def test_streaming_pipeline_records_pages_for_the_index(synthetic_site, tmp_path):
+    import asyncio
+    from preprocessing.manifest import PreprocessManifest
+    from preprocessing.streaming import StreamingScraper
+    from scrapper.manifest import CrawlManifest
+
+    site = synthetic_site(pages=10)
+    raw_dir, chunk_dir = str(tmp_path / "raw"), str(tmp_path / "chunked")
+    manifest_file = str(tmp_path / "preprocess_manifest.json")
+
+    def crawl():
+        crawl_manifest = CrawlManifest(str(tmp_path / "crawl_manifest.json"), raw_dir)
+        scraper = StreamingScraper(site.url, raw_dir, chunk_dir, manifest=crawl_manifest, workers=1)
+        asyncio.run(scraper.scrape_site_async(max_workers=2))
+        scraper.close()
+        crawl_manifest.save()
+        return PreprocessManifest(manifest_file, chunk_dir)
+
+    manifest = crawl()
+    changed, deleted = manifest.pending_changes()
+    assert len(changed) == 11 and deleted == []
+    manifest.mark_indexed()
+
+    # Unchanged pages are not chunked again unless their chunks went missing
+    os.remove(os.path.join(chunk_dir, "chunked_page-3.jsonl"))
+    assert crawl().pending_changes() == (["chunked_page-3.jsonl"], [])
+
+
+def test_streaming_pipeline_builds_the_chunk_store(synthetic_site, tmp_path, monkeypatch):
+    from preprocessing.chunkstore import ChunkStore, CHUNK_STORE_NAME
+    from preprocessing.streaming import run_streaming_pipeline
+
+    site = synthetic_site(pages=12, sitemap=True)
+    settings = {"HOME_DIR": str(tmp_path), "SITEMAP": site.url, "RAWDATA_DIR": "raw/", "CHUNKDATA_DIR": "chunked/",
+                "CLEANDATA_DIR": "cleaned/", "KEEP_CLEANED": "1", "WORKERS": "3", "RAW_STORAGE": "files",
+                "CRAWL_MODE": "async", "DISCOVERY": "sitemap+links"}
+    for name, value in settings.items():
+        monkeypatch.setenv(name, value)
+
+    run_streaming_pipeline()
+
+    with ChunkStore(str(tmp_path / "chunked" / CHUNK_STORE_NAME)) as store:
+        records = list(store)
+    pages = {record["source"]: record["url"] for record in records}
+    assert len(pages) == 13
+    assert pages["page-4.html"] == site.url + "page-4"
+    assert all(record["text"].strip() and record["tokens"] > 0 for record in records)
+    assert sorted(os.listdir(tmp_path / "cleaned")) == sorted(pages)
+
+
+def test_staged_run_after_a_streaming_run(synthetic_site, tmp_path, monkeypatch):
+    from preprocessing.main import run_cleaner
+    from preprocessing.streaming import run_streaming_pipeline
+
+    site = synthetic_site(pages=6)
+    settings = {"HOME_DIR": str(tmp_path), "SITEMAP": site.url, "RAWDATA_DIR": "raw/", "CHUNKDATA_DIR": "chunked/",
+                "CLEANDATA_DIR": "cleaned/", "KEEP_CLEANED": "0", "WORKERS": "2", "RAW_STORAGE": "files",
+                "CRAWL_MODE": "async", "DISCOVERY": "links", "PREPROCESS_WORKERS": "1"}
+    for name, value in settings.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.chdir(tmp_path)
+
+    run_streaming_pipeline()
+    assert not (tmp_path / "cleaned").exists()
+
+    # The pages are current in the preprocess manifest, but their cleaned HTML was never written
+    run_cleaner()
+    assert len(os.listdir(tmp_path / "cleaned")) == 7
@@ -1,4 +1,5 @@
 from scrapper.ogs_html import NortheasternScraper
+import os
 
 import pytest
 from unittest.mock import Mock, patch
@@ -22,8 +23,8 @@ def test_valid_urls(scraper):
     assert not scraper.is_valid_url("mailto:test@example.com")
 
 
-def test_get_page_content_real(scraper):
-    content = scraper.get_page_content("http://quotes.toscrape.com")
+def test_get_page_content_real(scraper, synthetic_site):
+    content = scraper.get_page_content(synthetic_site(pages=5).url)
     assert content is not None
     assert "<html" in content
 
@@ -45,3 +46,315 @@ def test_extract_links(scraper):
         "https://www.google.com/page2"
     }
     assert links == expected_links
+
+
+def test_scrape_site_async(synthetic_site, tmp_path):
+    import asyncio
+
+    site = synthetic_site(pages=10, fan_out=4)
+    scraper = NortheasternScraper(site.url, str(tmp_path))
+    asyncio.run(scraper.scrape_site_async(max_workers=3))
+
+    assert set(os.listdir(tmp_path)) == {"index.html"} | {f"page-{i}.html" for i in range(10)}
+    assert site.stats()["duplicate_fetches"] == 0
+
+
+def test_incremental_recrawl(synthetic_site, tmp_path):
+    import asyncio
+    from scrapper.manifest import CrawlManifest
+
+    site = synthetic_site(pages=10, fan_out=4)
+    data_dir = str(tmp_path / "raw")
+    manifest_file = str(tmp_path / "crawl_manifest.json")
+
+    manifest = CrawlManifest(manifest_file, data_dir)
+    asyncio.run(NortheasternScraper(site.url, data_dir, manifest=manifest).scrape_site_async(max_workers=2))
+    manifest.save()
+    assert len(manifest.changed_files) == 11
+
+    # Second crawl revalidates every page and still follows links from the stored copies
+    manifest = CrawlManifest(manifest_file, data_dir)
+    scraper = NortheasternScraper(site.url, data_dir, manifest=manifest)
+    asyncio.run(scraper.scrape_site_async(max_workers=2))
+    assert manifest.changed_files == set()
+    assert site.stats()["statuses"]["304"] == 11
+
+
+def test_resume_from_checkpoint(synthetic_site, tmp_path):
+    import asyncio
+    from scrapper.checkpoint import CrawlCheckpoint
+
+    site = synthetic_site(pages=10, fan_out=4)
+
+    # Simulate a crawl interrupted after the home page and /page-1 were processed
+    log_path = str(tmp_path / "crawl_checkpoint.log")
+    checkpoint = CrawlCheckpoint(log_path)
+    checkpoint.start()
+    for path in ["", "page-0", "page-1"]:
+        checkpoint.mark_queued(site.url + path)
+    checkpoint.mark_done(site.url)
+    checkpoint.mark_done(site.url + "page-1")
+    checkpoint.close()
+
+    checkpoint = CrawlCheckpoint(log_path)
+    checkpoint.start(resume=True)
+    assert checkpoint.frontier == {site.url + "page-0"}
+
+    data_dir = tmp_path / "raw"
+    scraper = NortheasternScraper(site.url, str(data_dir), checkpoint=checkpoint)
+    asyncio.run(scraper.scrape_site_async(max_workers=2))
+    checkpoint.close()
+
+    # Completed pages are not fetched again
+    saved = set(os.listdir(data_dir))
+    assert "page-0.html" in saved and not {"index.html", "page-1.html"} & saved
+    assert not {"/", "/page-1"} & set(site.stats()["requests"])
+
+
+def test_canonicalize_url():
+    from scrapper.urls import canonicalize_url
+
+    expected = "https://international.northeastern.edu/ogs/students"
+    assert canonicalize_url("http://International.Northeastern.edu:80/ogs/students/", "https") == expected
+    assert canonicalize_url("https://international.northeastern.edu/ogs//students/index.html") == expected
+    assert canonicalize_url("https://international.northeastern.edu/ogs/students?utm_source=mail#top") == expected
+    # Only a whole index page segment is dropped
+    assert canonicalize_url("https://x.edu/ogs/sitemap-index.html") == "https://x.edu/ogs/sitemap-index.html"
+    assert canonicalize_url("https://x.edu/ogs/myindex.php") == "https://x.edu/ogs/myindex.php"
+    assert canonicalize_url("https://international.northeastern.edu/ogs/?b=2&a=1") == \
+        "https://international.northeastern.edu/ogs?a=1&b=2"
+
+
+def test_duplicate_content_saved_once(tmp_path):
+    scraper = NortheasternScraper("https://www.google.com/", str(tmp_path))
+
+    scraper.save_page("https://www.google.com/a", "<p>Same page</p>")
+    scraper.save_page("https://www.google.com/a-copy", "<p>Same page</p>")
+    # Different URLs that map to the same filename must not overwrite each other
+    scraper.save_page("https://www.google.com/a_b", "<p>One</p>")
+    scraper.save_page("https://www.google.com/a/b", "<p>Two</p>")
+
+    assert len(os.listdir(tmp_path)) == 3
+    assert scraper.manifest.duplicates == {"https://www.google.com/a-copy": "https://www.google.com/a"}
+
+
+def test_rate_limiter_adapts():
+    from scrapper.ratelimit import HostRateLimiter
+
+    limiter = HostRateLimiter(rate=100, max_concurrency=10)
+    host = "international.northeastern.edu"
+
+    for _ in range(20):
+        limiter.acquire(host)
+        limiter.release(host, latency=0.01, status=200)
+    ramped = limiter.stats(host)
+    assert ramped["concurrency"] > 2 and ramped["in_flight"] == 0
+
+    limiter.acquire(host)
+    limiter.release(host, latency=0.01, status=429, retry_after="30")
+    throttled = limiter.stats(host)
+    assert throttled["concurrency"] < ramped["concurrency"]
+    assert throttled["rate"] < ramped["rate"]
+    assert limiter._try_acquire(host) > 25  # Paused until Retry-After expires
+
+
+def test_sitemap_discovery(synthetic_site, tmp_path):
+    import asyncio
+    from scrapper.manifest import CrawlManifest
+
+    # /page-2 is linked from the home page but missing from the sitemap
+    site = synthetic_site(pages=10, fan_out=4, sitemap=True, sitemap_lastmod="2020-01-01", unlisted=["/page-2"])
+    data_dir = str(tmp_path / "raw")
+    manifest_file = str(tmp_path / "crawl_manifest.json")
+
+    manifest = CrawlManifest(manifest_file, data_dir)
+    scraper = NortheasternScraper(site.url, data_dir, manifest=manifest, discovery="sitemap+links")
+    asyncio.run(scraper.scrape_site_async(max_workers=2))
+    manifest.save()
+    # The unlisted page is found by following links
+    assert set(os.listdir(data_dir)) == {"index.html"} | {f"page-{i}.html" for i in range(10)}
+
+    # On a refresh only the page outside the sitemap is revalidated
+    before = site.stats()["requests"]
+    manifest = CrawlManifest(manifest_file, data_dir)
+    scraper = NortheasternScraper(site.url, data_dir, manifest=manifest, discovery="sitemap+links")
+    asyncio.run(scraper.scrape_site_async(max_workers=2))
+    refetched = {path: count - before.get(path, 0) for path, count in site.stats()["requests"].items()
+                 if count != before.get(path, 0)}
+    assert refetched == {"/page-2": 1}
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_page_archive(tmp_path, compression):
+    from scrapper.storage import PageArchive, open_raw_store
+
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    archive = PageArchive(str(tmp_path / "pages.archive"), compression=compression)
+    scraper = NortheasternScraper("https://www.google.com/", str(tmp_path), store=archive)
+
+    scraper.save_page("https://www.google.com/a", "<p>A v1</p>", {"ETag": '"1"'})
+    scraper.save_page("https://www.google.com/b", "<p>B</p>")
+    scraper.save_page("https://www.google.com/a", "<p>A v2</p>")
+
+    # Readers reopen the archive from its index and only see the latest record per page
+    reopened = open_raw_store(str(tmp_path))
+    assert list(reopened.iter_pages()) == [("b.html", "<p>B</p>"), ("a.html", "<p>A v2</p>")]
+    header, _ = reopened.read_record("b.html")
+    assert header["url"] == "https://www.google.com/b"
+
+    size = os.path.getsize(tmp_path / "pages.archive")
+    reopened.compact()
+    assert os.path.getsize(tmp_path / "pages.archive") < size
+    assert reopened.read("a.html") == "<p>A v2</p>"
+
+
+def test_crawl_synthetic_site(synthetic_site, tmp_path):
+    import asyncio
+    from scrapper.ratelimit import HostRateLimiter
+
+    site = synthetic_site(pages=60, fan_out=6, latency=0.01, jitter=0.01, error_rate=0.05, throttle_rate=0.05,
+                          retry_after=0, duplicate_links=True)
+    limiter = HostRateLimiter(rate=200, max_rate=1000)
+    scraper = NortheasternScraper(site.url, str(tmp_path), rate_limiter=limiter)
+    asyncio.run(scraper.scrape_site_async(max_workers=10))
+
+    stats = site.stats()
+    statuses = stats["statuses"]
+    # URL variants are never fetched; only throttled pages are fetched again, and pages that hit a 500 are lost
+    assert stats["duplicate_fetches"] == statuses.get("429", 0)
+    assert len(scraper.manifest.entries) == stats["distinct_pages"] - statuses.get("500", 0)
+
+
+class FailingScraper(NortheasternScraper):
+    """Scraper whose page handling fails for one page"""
+
+    def handle_page(self, url, *args, **kwargs):
+        if url.endswith("/page-1"):
+            raise ValueError("broken page")
+        return super().handle_page(url, *args, **kwargs)
+
+
+def test_async_crawl_survives_page_errors(synthetic_site, tmp_path):
+    import asyncio
+
+    site = synthetic_site(pages=8, fan_out=3)
+    scraper = FailingScraper(site.url, str(tmp_path))
+    asyncio.run(asyncio.wait_for(scraper.scrape_site_async(max_workers=2), timeout=30))
+
+    saved = set(os.listdir(tmp_path))
+    assert "page-1.html" not in saved and {"index.html", "page-0.html", "page-2.html"} <= saved
+
+
+def test_async_crawl_reports_dead_workers(synthetic_site, tmp_path):
+    import asyncio
+
+    class DeadWorkerScraper(NortheasternScraper):
+        async def crawl_worker(self, session, frontier):
+            raise RuntimeError("worker crashed")
+
+    scraper = DeadWorkerScraper(synthetic_site(pages=3).url, str(tmp_path))
+    with pytest.raises(RuntimeError, match="crawl worker"):
+        asyncio.run(asyncio.wait_for(scraper.scrape_site_async(max_workers=2), timeout=30))
+
+
+def test_changed_page_releases_its_old_content(tmp_path):
+    scraper = NortheasternScraper("https://www.google.com/", str(tmp_path))
+
+    scraper.save_page("https://www.google.com/a", "<p>Old A</p>")
+    scraper.save_page("https://www.google.com/a", "<p>New A</p>")
+    # A new page with A's former content is a page of its own, not an alias of A
+    assert scraper.save_page("https://www.google.com/b", "<p>Old A</p>") == "b.html"
+    assert scraper.manifest.aliases == {}
+    assert sorted(os.listdir(tmp_path)) == ["a.html", "b.html"]
+
+
+def test_crawl_fetches_discovered_urls_as_is(synthetic_site, tmp_path):
+    import asyncio
+
+    site = synthetic_site(pages=20, trailing_slash=True, sitemap=True)
+    scraper = NortheasternScraper(site.url, str(tmp_path), discovery="sitemap+links")
+    asyncio.run(scraper.scrape_site_async(max_workers=4))
+
+    # Links point at '/page-3/'; requesting the canonical '/page-3' would cost a redirect per page
+    stats = site.stats()
+    assert "301" not in stats["statuses"]
+    assert stats["distinct_pages"] == 21 and stats["duplicate_fetches"] == 0
+    assert "page-3.html" in os.listdir(tmp_path)
+    assert site.url + "page-3" in scraper.manifest.entries
+
+
+def test_scrape_site_threaded(synthetic_site, tmp_path):
+    site = synthetic_site(pages=15, fan_out=4)
+    NortheasternScraper(site.url, str(tmp_path / "all")).scrape_site(max_workers=3)
+
+    assert set(os.listdir(tmp_path / "all")) == {"index.html"} | {f"page-{i}.html" for i in range(15)}
+    stats = site.stats()
+    assert stats["distinct_pages"] == 16 and stats["duplicate_fetches"] == 0
+
+    # A page whose handling fails is logged and the crawl carries on
+    FailingScraper(site.url, str(tmp_path / "failing")).scrape_site(max_workers=3)
+    saved = set(os.listdir(tmp_path / "failing"))
+    assert "page-1.html" not in saved and {"index.html", "page-0.html", "page-2.html"} <= saved
+
+
+def test_content_duplicates_are_fetched_again(tmp_path):
+    from scrapper.manifest import CrawlManifest
+
+    manifest_file = str(tmp_path / "crawl_manifest.json")
+    manifest = CrawlManifest(manifest_file, str(tmp_path))
+    scraper = NortheasternScraper("https://www.google.com/", str(tmp_path), manifest=manifest)
+    scraper.save_page("https://www.google.com/a", "<p>Coming soon</p>")
+    assert scraper.save_page("https://www.google.com/b", "<p>Coming soon</p>") is None
+    manifest.save()
+
+    # Serving the same body once does not keep b out of later crawls
+    manifest = CrawlManifest(manifest_file, str(tmp_path))
+    scraper = NortheasternScraper("https://www.google.com/", str(tmp_path), manifest=manifest)
+    assert scraper.filter_new({"https://www.google.com/b"}) == {"https://www.google.com/b"}
+    assert scraper.save_page("https://www.google.com/b", "<p>Now a real page</p>") == "b.html"
+    assert manifest.entries["https://www.google.com/a"]["duplicates"] == []
+
+    # Redirects stay permanent aliases
+    manifest.add_alias("https://www.google.com/a", "https://www.google.com/old-a")
+    assert scraper.filter_new({"https://www.google.com/old-a"}) == set()
+
+
+def test_resume_retries_failed_pages(synthetic_site, tmp_path):
+    import asyncio
+    from scrapper.checkpoint import CrawlCheckpoint
+
+    site = synthetic_site(pages=6, fan_out=3, broken=["/page-2"])
+    log_path, data_dir = str(tmp_path / "crawl_checkpoint.log"), str(tmp_path / "raw")
+
+    checkpoint = CrawlCheckpoint(log_path)
+    checkpoint.start()
+    asyncio.run(NortheasternScraper(site.url, data_dir, checkpoint=checkpoint).scrape_site_async(max_workers=2))
+    checkpoint.close()
+    assert "page-2.html" not in os.listdir(data_dir)
+
+    # The 500 left /page-2 on the frontier; 404s (the site's nav links) are done for good
+    site.config.broken.clear()
+    checkpoint = CrawlCheckpoint(log_path)
+    checkpoint.start(resume=True)
+    assert checkpoint.frontier == {site.url + "page-2"}
+    asyncio.run(NortheasternScraper(site.url, data_dir, checkpoint=checkpoint).scrape_site_async(max_workers=2))
+    checkpoint.close()
+    assert "page-2.html" in os.listdir(data_dir)
+
+
+def test_unlisted_pages_are_revalidated_at_their_served_url(synthetic_site, tmp_path):
+    import asyncio
+    from scrapper.manifest import CrawlManifest
+
+    site = synthetic_site(pages=8, fan_out=3, trailing_slash=True, sitemap=True, sitemap_lastmod="2020-01-01",
+                          unlisted=["/page-2"])
+    data_dir, manifest_file = str(tmp_path / "raw"), str(tmp_path / "crawl_manifest.json")
+    for _ in range(2):
+        manifest = CrawlManifest(manifest_file, data_dir)
+        scraper = NortheasternScraper(site.url, data_dir, manifest=manifest, discovery="sitemap+links")
+        asyncio.run(scraper.scrape_site_async(max_workers=2))
+        manifest.save()
+
+    assert manifest.entries[site.url + "page-2"]["served_url"] == site.url + "page-2/"
+    assert "301" not in site.stats()["statuses"]
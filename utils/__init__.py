@@ -2,8 +2,13 @@ from utils.config import Manager
 import os
 
 def import_settings():
+    """
+    Loads the configuration into environment variables. Entry points call it
+    explicitly, so importing a utils module has no side effects; calls after
+    the first are no-ops.
+    """
+    if os.getenv('ENV_STATUS') == '1':
+        return
     print("Setting Configurations")
     config_manager = Manager()
     config_manager.load_vars()
-
-import_settings()
\ No newline at end of file
@@ -73,6 +73,21 @@ class Manager:
             'rawdata_dir': 'data/raw/',
             'cleandata_dir': 'data/cleaned/',
             'chunkdata_dir': 'data/chunked/',
+            'pipeline_mode': 'staged',
+            'keep_cleaned': '0',
+            'html_parser': 'auto',
+            'preprocess_workers': '0',
+            'chunk_tokens': '256',
+            'chunk_overlap': '30',
+            'boilerplate_share': '0.5',
+            'dedup_threshold': '0.8',
+            'embedding_cache_dir': 'data/embedding_cache/',
+            'embedding_backend': 'auto',
+            'embedding_device': 'auto',
+            'embedding_quantize': '0',
+            'embed_batch_tokens': '8192',
+            'embed_workers': '1',
+            'vector_mode': 'float16',
             'anthropic_model': "claude-3-haiku-20240307",
             'anthropic_api_key': '',
             'openai_model': 'gpt-3.5-turbo',
@@ -81,6 +96,11 @@ class Manager:
         config['Scrapper Settings'] = {
             'sitemap': 'https://international.northeastern.edu/ogs',
             'workers': '30',
+            'crawl_mode': 'async',
+            'rate_limit': '5',
+            'discovery': 'sitemap+links',
+            'raw_storage': 'files',
+            'archive_compression': 'gzip',
             'env_status': '0',
         }
 
@@ -0,0 +1,121 @@
+import os
+from functools import lru_cache
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    import lxml.etree
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Fastest first; 'auto' picks the first one that is installed
+BACKENDS = ('selectolax', 'lxml', 'html.parser')
+
+# Elements whose text BeautifulSoup's get_text leaves out
+NON_TEXT_TAGS = ('script', 'style', 'template')
+
+
+class HtmlParserBackend:
+    """
+    BeautifulSoup with Python's built-in html.parser: always available, slowest.
+
+    Every backend offers the same read-only helpers used across the pipeline,
+    plus soup() for code that edits the tree (clean_html).
+    """
+    name = 'html.parser'
+    soup_features = 'html.parser'
+
+    def soup(self, html):
+        return BeautifulSoup(html, self.soup_features)
+
+    def hrefs(self, html):
+        """href of every <a> tag, in document order"""
+        return [a_tag['href'] for a_tag in self.soup(html).find_all('a', href=True)]
+
+    def text(self, html):
+        """Same as BeautifulSoup's get_text(separator=" ", strip=True)"""
+        return self.soup(html).get_text(separator=" ", strip=True)
+
+
+class LxmlBackend(HtmlParserBackend):
+    """libxml2 through lxml; soup() uses BeautifulSoup's lxml tree builder"""
+    name = 'lxml'
+    soup_features = 'lxml'
+
+    @staticmethod
+    def _document(html):
+        doc = lxml.html.document_fromstring(html or '<html></html>')
+        lxml.etree.strip_elements(doc, *NON_TEXT_TAGS, lxml.etree.Comment, with_tail=False)
+        return doc
+
+    def hrefs(self, html):
+        if not html.strip():
+            return []
+        return [a_tag.get('href') for a_tag in lxml.html.document_fromstring(html).iter('a')
+                if a_tag.get('href') is not None]
+
+    def text(self, html):
+        pieces = (piece.strip() for piece in self._document(html).itertext()) if html.strip() else ()
+        return " ".join(piece for piece in pieces if piece)
+
+
+class SelectolaxBackend(HtmlParserBackend):
+    """
+    lexbor through selectolax, the fastest read-only parser. Editing the tree
+    is not supported, so soup() falls back to the lxml or html.parser builder.
+    """
+    name = 'selectolax'
+    soup_features = 'lxml' if lxml is not None else 'html.parser'
+
+    @staticmethod
+    def _tree(html):
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(list(NON_TEXT_TAGS))
+        return tree
+
+    @staticmethod
+    def _strings(node):
+        for child in node.traverse(include_text=True):
+            if child.tag == '-text':
+                yield child.text_content
+
+    def hrefs(self, html):
+        return [a_tag.attributes['href'] for a_tag in LexborHTMLParser(html).css('a[href]')
+                if a_tag.attributes['href'] is not None]
+
+    def text(self, html):
+        root = self._tree(html).root
+        pieces = (piece.strip() for piece in self._strings(root)) if root else ()
+        return " ".join(piece for piece in pieces if piece)
+
+
+BACKEND_CLASSES = {
+    'html.parser': HtmlParserBackend,
+    'lxml': LxmlBackend,
+    'selectolax': SelectolaxBackend,
+}
+
+
+def available_backends():
+    """Installed backends, fastest first"""
+    installed = {'html.parser': True, 'lxml': lxml is not None, 'selectolax': LexborHTMLParser is not None}
+    return [name for name in BACKENDS if installed[name]]
+
+
+@lru_cache(maxsize=None)
+def get_parser(name=None):
+    """
+    HTML parser backend by name, defaulting to the HTML_PARSER setting.
+    'auto' picks the fastest installed backend.
+    """
+    name = name or os.getenv('HTML_PARSER', 'auto')
+    if name == 'auto':
+        name = available_backends()[0]
+    if name not in available_backends():
+        raise ValueError(f"HTML parser backend '{name}' is not installed (available: {available_backends()})")
+    return BACKEND_CLASSES[name]()